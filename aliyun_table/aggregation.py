@@ -0,0 +1,102 @@
+"""
+多元索引的统计聚合.
+
+聚合条件为二元组或三元组 (agg_type, column_name[, name]):
+    count:          列存在的行数
+    sum/avg/max/min: 求和/平均值/最大值/最小值
+    distinct_count: 去重后的数量
+不指定name时, 结果的名称为'{agg_type}_{column_name}', 例如('sum', 'like_count')的结果为'sum_like_count'.
+"""
+
+from tablestore import (Avg, Count, DistinctCount, GroupByField, GroupKeySort, Max, Min, RowCountSort, SortOrder,
+                        SubAggSort, Sum)
+
+from aliyun_table.my_logger import logger
+from aliyun_table.query_plan import QuerySyntaxError, QueryTypeNotExistError
+
+
+AGG_TYPES = {
+    'count': Count,
+    'sum': Sum,
+    'avg': Avg,
+    'max': Max,
+    'min': Min,
+    'distinct_count': DistinctCount,
+}
+
+# 单次分组最多返回的组数.
+GROUP_BY_MAX_SIZE = 2000
+
+
+def agg_name(agg):
+    """聚合条件对应的结果名称"""
+    if len(agg) not in (2, 3):
+        raise QuerySyntaxError(agg)
+    if len(agg) == 3:
+        return agg[2]
+    return f'{agg[0]}_{agg[1]}'
+
+
+def build_agg(agg):
+    """根据用户的聚合条件构造阿里云聚合对象."""
+    name = agg_name(agg)
+    agg_type, column_name = agg[0], agg[1]
+    if agg_type not in AGG_TYPES:
+        logger.error('聚合类型 {} 出错,请输入正确的聚合类型'.format(agg_type))
+        raise QueryTypeNotExistError(agg_type)
+    return AGG_TYPES[agg_type](column_name, name=name)
+
+
+def build_agg_list(aggs):
+    """构造聚合对象列表, 结果名称不能重复"""
+    names = [agg_name(agg) for agg in aggs or []]
+    if len(set(names)) != len(names):
+        raise QuerySyntaxError(f'duplicate aggregation names {names}')
+    return [build_agg(agg) for agg in aggs or []]
+
+
+def build_group_by_sort(sort_list):
+    """
+    构造分组的排序, 格式同``query``的sort_list, 列名为'_count'时按行数排序, 为'_key'时按分组的值排序,
+    否则按同名的聚合结果排序. 不指定时返回None, 即按行数倒序.
+    """
+    if not sort_list:
+        return None
+    sorters = []
+    for sort_item in sort_list:
+        if len(sort_item) != 2:
+            raise QuerySyntaxError(sort_item)
+        sort_col, sort_num = sort_item
+        sort_order = SortOrder.DESC if sort_num < 0 else SortOrder.ASC
+        if sort_col == '_count':
+            sorters.append(RowCountSort(sort_order))
+        elif sort_col == '_key':
+            sorters.append(GroupKeySort(sort_order))
+        else:
+            sorters.append(SubAggSort(sort_order, sort_col))
+    return sorters
+
+
+def build_group_by(column_name, aggs=None, size=10, sort_list=None):
+    """构造按列分组的阿里云分组对象, 名称为列名"""
+    if size > GROUP_BY_MAX_SIZE:
+        raise QuerySyntaxError(f'group by size should be no more than {GROUP_BY_MAX_SIZE}')
+    return GroupByField(column_name, size=size, group_by_sort=build_group_by_sort(sort_list),
+                        sub_aggs=build_agg_list(aggs), name=column_name)
+
+
+def agg_results_to_dict(agg_results):
+    """把聚合结果转换为名称到值的字典"""
+    return {result.name: result.value for result in agg_results or []}
+
+
+def group_by_items(group_by_result):
+    """
+    把分组结果转换为字典列表, 每组为{'key': 分组的值, 'count': 行数, 聚合名称: 聚合结果...}.
+    """
+    groups = []
+    for item in group_by_result.items:
+        group = {'key': item.key, 'count': item.row_count}
+        group.update(agg_results_to_dict(item.sub_aggs))
+        groups.append(group)
+    return groups
@@ -0,0 +1,139 @@
+"""
+asyncio版本的TableClient.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor, wait
+from functools import partial
+
+from aliyun_table import TableClient
+
+
+def _take(gen, n):
+    """从生成器中最多取出n条数据"""
+    chunk = []
+    for item in gen:
+        chunk.append(item)
+        if len(chunk) >= n:
+            break
+    return chunk
+
+
+def _close_after(gen, future):
+    """等待正在执行的next(gen)结束后关闭生成器, 避免'generator already executing'"""
+    if future is not None:
+        wait([future])
+    gen.close()
+
+
+class AsyncTableClient(object):
+    """
+    asyncio版本的TableClient.
+
+    所有操作都在线程池中执行, 不会阻塞事件循环. 同时在途的请求数由``concurrency``限制,
+    超出限制的调用会等待空闲的槽位(背压). 多个AsyncTableClient可以通过``table_client``
+    共享同一个TableClient, 从而共享底层OTSClient的连接池.
+    底层仍然是同步的OTSClient, 不是非阻塞的网络请求: 每个在途的请求占用线程池中的一个线程,
+    concurrency同时也是线程数, 并发数很高时需要考虑线程的内存和切换开销.
+
+    示例:
+        client = AsyncTableClient(instance_name='nm-sea', concurrency=200)
+        pk_dict = await client.put_row('all_news', ['medium_id', 'id'], data)
+        async for row in client.query_all('all_news', primary_key='id'):
+            ...
+    """
+    def __init__(self,
+                 instance_name=None,
+                 end_point=None,
+                 access_key_id=None,
+                 access_key_secret=None,
+                 table_client=None,
+                 concurrency=64,
+                 chunk_size=100):
+        """
+        :param table_client [TableClient]: 已有的TableClient, 不指定则根据其它参数创建.
+        :param concurrency [int]: 最大并发请求数.
+        :param chunk_size [int]: 异步生成器每次从线程池中取回的数据条数.
+        """
+        if table_client is None:
+            table_client = TableClient(instance_name, end_point, access_key_id, access_key_secret)
+        self.table_client = table_client
+        self.concurrency = concurrency
+        self.chunk_size = chunk_size
+        self._executor = ThreadPoolExecutor(max_workers=concurrency)
+        # Semaphore需要在事件循环中创建.
+        self._semaphore = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.aclose()
+
+    def close(self):
+        """关闭线程池, 等待在途请求结束. 会阻塞当前线程, 在事件循环中请使用``aclose``."""
+        self._executor.shutdown(wait=True)
+
+    async def aclose(self):
+        """关闭线程池, 在事件循环的默认线程池中等待在途请求结束, 不阻塞事件循环."""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._executor.shutdown, True)
+
+    async def _run(self, func, *args, **kwargs):
+        """在线程池中执行同步调用, 并发数超过限制时等待."""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        async with self._semaphore:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, partial(func, *args, **kwargs))
+
+    async def _iterate(self, gen):
+        """
+        将同步生成器转换为异步生成器, 每次在线程池中取回chunk_size条数据.
+        提前结束或者被取消时, 等线程池中正在执行的取数结束后再在线程池中关闭生成器.
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        future = None
+        try:
+            while True:
+                async with self._semaphore:
+                    future = self._executor.submit(_take, gen, self.chunk_size)
+                    chunk = await asyncio.wrap_future(future)
+                for item in chunk:
+                    yield item
+                if len(chunk) < self.chunk_size:
+                    return
+        finally:
+            try:
+                self._executor.submit(_close_after, gen, future)
+            except RuntimeError:
+                # 线程池已经关闭.
+                _close_after(gen, future)
+
+    async def put_row(self, table_name, pk_list, data):
+        return await self._run(self.table_client.put_row, table_name, pk_list, data)
+
+    async def update_row(self, table_name, pk_list, data):
+        return await self._run(self.table_client.update_row, table_name, pk_list, data)
+
+    async def put_rows(self, table_name, pk_list, data_list, **kwargs):
+        return await self._run(self.table_client.put_rows, table_name, pk_list, list(data_list), **kwargs)
+
+    async def update_rows(self, table_name, pk_list, data_list, **kwargs):
+        return await self._run(self.table_client.update_rows, table_name, pk_list, list(data_list), **kwargs)
+
+    async def get_table_list(self):
+        return await self._run(self.table_client.get_table_list)
+
+    def query(self, table_name, *args, **kwargs):
+        """``TableClient.query``的异步生成器版本, 参数相同."""
+        return self._iterate(self.table_client.query(table_name, *args, **kwargs))
+
+    def query_all(self, table_name, *args, **kwargs):
+        """``TableClient.query_all``的异步生成器版本, 参数相同."""
+        return self._iterate(self.table_client.query_all(table_name, *args, **kwargs))
+
+    def scan_index(self, table_name, *args, **kwargs):
+        """``TableClient.scan_index``的异步生成器版本, 参数相同."""
+        return self._iterate(self.table_client.scan_index(table_name, *args, **kwargs))
@@ -0,0 +1,195 @@
+"""
+延迟批量写入.
+
+``BufferedWriter``把写入操作缓存在内存中, 同一主键的多次写入会被合并为一次,
+后台线程按行数和时间阈值通过BatchWriteRow批量写入.
+"""
+
+import itertools
+import threading
+
+from tablestore import PutRowItem, ReturnType, Row, UpdateRowItem
+
+from aliyun_table.my_logger import logger
+
+
+class BufferedWriter(object):
+    """
+    合并同一主键的写入并在后台批量写入, 通过``TableClient.buffered_writer``获取.
+
+    合并规则:
+        update + update: 合并为一次update, 后写入的列覆盖先写入的列.
+        put + update: 合并为一次put, 包含两次写入的全部列.
+        任意操作 + put: 只保留最后一次put.
+    自增主键(主键值为None)的行不会被合并.
+
+    e.g.
+        with table_cli.buffered_writer('table_name', ['pk1'], on_error=handle_error) as writer:
+            for i in range(10000):
+                writer.update_row({'pk1': 'counter', 'count': i})
+
+    :param client [TableClient]: 用于写入的客户端.
+    :param table_name [str]: 表名.
+    :param pk_list [list]: primary key name list. e.g. ['pk1', 'pk2']
+    :param max_rows [int]: 缓存的行数达到max_rows时立即写入.
+    :param flush_interval [float]: 最长的写入间隔, 单位为秒.
+    :param max_buffer [int]: 缓存的最大行数, 包括正在写入的行, 缓存满时写入操作会阻塞, 直到正在进行的写入完成.
+    :param on_error [callable]: 写入失败时的回调函数, 参数为(op, data, error), op为'put'或'update',
+        data为合并后的数据字典, error为错误信息. 不指定时只记录日志.
+    :param max_retry [int]: 失败行的最大重试次数.
+    """
+
+    def __init__(self, client, table_name, pk_list, max_rows=200, flush_interval=1.0,
+                 max_buffer=10000, on_error=None, max_retry=3):
+        self.client = client
+        self.table_name = table_name
+        self.pk_list = list(pk_list)
+        self.max_rows = max_rows
+        self.flush_interval = flush_interval
+        self.max_buffer = max(max_buffer, max_rows)
+        self.on_error = on_error
+        self.max_retry = max_retry
+        # 写入次数, 合并掉的次数, 写入成功和失败的行数, 以及flush的次数.
+        self.submitted = 0
+        self.coalesced = 0
+        self.written = 0
+        self.failed = 0
+        self.flushes = 0
+        # 主键 -> (op, data), 保持写入顺序.
+        self._pending = {}
+        # 已从缓存中取出、正在写入的行数, 与缓存的行数一起受max_buffer限制.
+        self._in_flight = 0
+        self._closed = False
+        self._auto_increment_ids = itertools.count()
+        self._cond = threading.Condition()
+        # 保证各次flush按顺序执行.
+        self._flush_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name=f'BufferedWriter-{table_name}', daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self):
+        return len(self._pending)
+
+    def put_row(self, data):
+        """缓存一次put_row, 会覆盖同一主键尚未写入的数据"""
+        self._submit('put', data)
+
+    def update_row(self, data):
+        """缓存一次update_row, 会与同一主键尚未写入的数据合并"""
+        self._submit('update', data)
+
+    def _submit(self, op, data):
+        pk_values = tuple(data[pk_name] for pk_name in self.pk_list)
+        if any(value is None for value in pk_values):
+            key = ('auto_increment', next(self._auto_increment_ids))
+        else:
+            key = pk_values
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError('BufferedWriter is closed.')
+                if key in self._pending or len(self._pending) + self._in_flight < self.max_buffer:
+                    break
+                # 缓存已满, 等待后台线程写入数据.
+                self._cond.notify_all()
+                self._cond.wait()
+            self.submitted += 1
+            previous = self._pending.pop(key, None)
+            if previous is None:
+                self._pending[key] = (op, dict(data))
+            else:
+                self.coalesced += 1
+                previous_op, previous_data = previous
+                if op == 'put':
+                    self._pending[key] = (op, dict(data))
+                else:
+                    self._pending[key] = (previous_op, {**previous_data, **data})
+            if len(self._pending) >= self.max_rows:
+                self._cond.notify_all()
+
+    def flush(self):
+        """立即写入全部缓存的数据"""
+        with self._flush_lock:
+            with self._cond:
+                pending, self._pending = self._pending, {}
+                self._in_flight = len(pending)
+            try:
+                if pending:
+                    self._write(list(pending.values()))
+            finally:
+                with self._cond:
+                    self._in_flight = 0
+                    self._cond.notify_all()
+
+    def _write(self, items):
+        codec = self.client._codec(self.table_name)
+        row_items = []
+        hashes = []
+        # 内容没有变化(skip_unchanged)的行不写入.
+        written_items = []
+        for op, data in items:
+            primary_key, attribute_columns = self.client._construct_row(self.pk_list, data, codec)
+            content_hash, attribute_columns, condition = self.client._dedup_row(self.table_name, op, primary_key,
+                                                                                attribute_columns)
+            if attribute_columns is None:
+                continue
+            if op == 'put':
+                row_items.append(PutRowItem(Row(primary_key, attribute_columns), condition,
+                                            return_type=ReturnType.RT_PK))
+            else:
+                row_items.append(UpdateRowItem(Row(primary_key, {'PUT': attribute_columns}), condition,
+                                               return_type=ReturnType.RT_PK))
+            hashes.append(content_hash)
+            written_items.append((op, data))
+        self.written += len(items) - len(written_items)
+        items = written_items
+        errors = {}
+        try:
+            self.client._batch_write_row(self.table_name, row_items, self.max_retry, errors)
+        except Exception as e:
+            logger.error(f'Buffered write error, {e}')
+            errors = dict.fromkeys(range(len(items)), e)
+        for ind, content_hash in enumerate(hashes):
+            if ind not in errors:
+                self.client._remember_hash(content_hash)
+        self.flushes += 1
+        self.written += len(items) - len(errors)
+        self.failed += len(errors)
+        for ind, error in sorted(errors.items()):
+            op, data = items[ind]
+            if self.on_error is None:
+                logger.error(f'Buffered {op} failed, {error}')
+                continue
+            try:
+                self.on_error(op, data, error)
+            except Exception as e:
+                logger.error(f'Error callback failed, {e}')
+
+    def _run(self):
+        """后台线程, 按行数和时间阈值写入"""
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._closed or len(self._pending) >= self.max_rows,
+                                    timeout=self.flush_interval)
+                closed = self._closed
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f'Buffered flush error, {e}')
+            if closed:
+                return
+
+    def close(self):
+        """写入全部缓存的数据并停止后台线程"""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
@@ -0,0 +1,235 @@
+"""
+进程内缓存、磁盘缓存和持久化的键值存储.
+
+缓存对象都提供``get``/``set``/``delete``/``clear``方法和``hits``/``misses``计数,
+可以互相替换, 例如作为``TableClient``的``query_cache``或``hash_store``.
+"""
+
+import hashlib
+import os
+import pickle
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+
+def _sizeof(value):
+    """估算缓存数据占用的字节数"""
+    return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+class LRUCache(object):
+    """
+    线程安全的LRU缓存, 支持过期时间.
+
+    :param maxsize [int]: 最多缓存的条数, 超过后淘汰最久未使用的数据.
+    :param ttl [float]: 数据的过期时间, 单位为秒, 为None时不过期.
+    :param maxbytes [int]: 缓存数据的最大字节数(按pickle后的大小估算), 为None时不限制.
+    """
+    def __init__(self, maxsize=10000, ttl=60, maxbytes=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.maxbytes = maxbytes
+        self.hits = 0
+        self.misses = 0
+        self.currbytes = 0
+        # key -> (value, expire_at, size)
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None:
+                value, expire_at, _ = item
+                if expire_at is None or expire_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                self._pop(key)
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        expire_at = None if self.ttl is None else time.monotonic() + self.ttl
+        size = _sizeof(value) if self.maxbytes is not None else 0
+        if self.maxbytes is not None and size > self.maxbytes:
+            return
+        with self._lock:
+            self._pop(key)
+            self._data[key] = (value, expire_at, size)
+            self.currbytes += size
+            while len(self._data) > self.maxsize or (
+                    self.maxbytes is not None and self.currbytes > self.maxbytes):
+                self._pop(next(iter(self._data)))
+
+    def delete(self, key):
+        with self._lock:
+            self._pop(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.currbytes = 0
+
+    def _pop(self, key):
+        item = self._data.pop(key, None)
+        if item is not None:
+            self.currbytes -= item[2]
+
+
+class DiskCache(object):
+    """
+    基于本地目录的缓存, 每条数据pickle后保存为一个文件, 可以在进程间共享.
+    淘汰需要遍历整个目录, 因此每写入maxsize的1/10条数据才检查一次, 条数和字节数可能暂时超出限制.
+    适合缓存数量不多的大数据(例如查询结果页), 大量的小数据请使用``HashStore``.
+
+    :param path [str]: 缓存目录.
+    :param maxsize [int]: 最多缓存的条数, 超过后删除最早写入的数据.
+    :param ttl [float]: 数据的过期时间, 单位为秒, 为None时不过期.
+    :param maxbytes [int]: 缓存文件的最大总字节数, 为None时不限制.
+    """
+    def __init__(self, path, maxsize=10000, ttl=60, maxbytes=None):
+        self.path = path
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.maxbytes = maxbytes
+        self.hits = 0
+        self.misses = 0
+        # 每写入evict_interval条数据检查一次是否需要淘汰.
+        self.evict_interval = max(1, maxsize // 10)
+        self._writes = 0
+        self._lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+
+    def _file(self, key):
+        name = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+        return os.path.join(self.path, name + '.cache')
+
+    def get(self, key, default=None):
+        file_path = self._file(key)
+        try:
+            if self.ttl is not None and os.path.getmtime(file_path) + self.ttl < time.time():
+                os.remove(file_path)
+                raise FileNotFoundError(file_path)
+            with open(file_path, 'rb') as f:
+                stored_key, value = pickle.load(f)
+            if stored_key != key:
+                raise FileNotFoundError(file_path)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            self.misses += 1
+            return default
+        self.hits += 1
+        return value
+
+    def set(self, key, value):
+        fd, tmp_path = tempfile.mkstemp(dir=self.path, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump((key, value), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self._file(key))
+        with self._lock:
+            self._writes += 1
+            if self._writes < self.evict_interval:
+                return
+            self._writes = 0
+        self._evict()
+
+    def delete(self, key):
+        try:
+            os.remove(self._file(key))
+        except FileNotFoundError:
+            pass
+
+    def clear(self):
+        for entry in os.scandir(self.path):
+            if entry.name.endswith('.cache'):
+                os.remove(entry.path)
+
+    def _evict(self):
+        """删除超出条数或者字节数限制的最早写入的数据"""
+        with self._lock:
+            entries = []
+            for entry in os.scandir(self.path):
+                if entry.name.endswith('.cache'):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+            entries.sort()
+            total_bytes = sum(size for _, size, _ in entries)
+            while entries and (len(entries) > self.maxsize or (
+                    self.maxbytes is not None and total_bytes > self.maxbytes)):
+                _, size, file_path = entries.pop(0)
+                total_bytes -= size
+                try:
+                    os.remove(file_path)
+                except FileNotFoundError:
+                    pass
+
+
+class HashStore(object):
+    """
+    基于SQLite的持久化键值存储, 按键读写都只需要一次索引查找, 可以在多次运行和多个进程之间共享.
+    数据不会过期也不会被淘汰, 需要时调用``delete``或``clear``.
+    适合保存大量的小数据, 例如``TableClient``的``hash_store``(每个主键一条哈希).
+
+    e.g.
+        table_cli = TableClient(instance_name='实例名', skip_unchanged={'all_news': '_hash'},
+                                hash_store=HashStore('/data/all_news_hash.db'))
+
+    :param path [str]: SQLite文件路径, 已存在时继续使用其中的数据.
+    """
+    # 键和值的pickle协议, 固定版本使同一个键在不同的Python版本中得到相同的数据.
+    PICKLE_PROTOCOL = 4
+
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute('CREATE TABLE IF NOT EXISTS store (key BLOB PRIMARY KEY, value BLOB) WITHOUT ROWID')
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM store').fetchone()[0]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _key(self, key):
+        return pickle.dumps(key, protocol=self.PICKLE_PROTOCOL)
+
+    def get(self, key, default=None):
+        with self._lock:
+            row = self._conn.execute('SELECT value FROM store WHERE key = ?', (self._key(key),)).fetchone()
+            if row is None:
+                self.misses += 1
+                return default
+            self.hits += 1
+        return pickle.loads(row[0])
+
+    def set(self, key, value):
+        value = pickle.dumps(value, protocol=self.PICKLE_PROTOCOL)
+        with self._lock:
+            self._conn.execute('INSERT OR REPLACE INTO store (key, value) VALUES (?, ?)', (self._key(key), value))
+
+    def delete(self, key):
+        with self._lock:
+            self._conn.execute('DELETE FROM store WHERE key = ?', (self._key(key),))
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute('DELETE FROM store')
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
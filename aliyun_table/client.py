@@ -0,0 +1,1899 @@
+"""
+TableClient and helpers, imported lazily by ``aliyun_table``.
+"""
+
+import hashlib
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+from tablestore import *
+from tablestore import Row, Condition
+from tablestore.metadata import RowExistenceExpectation
+from tablestore.retry import NoRetryPolicy
+
+from aliyun_table.aggregation import agg_results_to_dict, build_agg_list, build_group_by, group_by_items
+from aliyun_table.buffered import BufferedWriter
+from aliyun_table.cache import LRUCache, DiskCache, HashStore
+from aliyun_table.codec import encode_columns, get_codec, page_decoder
+from aliyun_table.columnar import columns_to_dataframe, rows_to_columns
+from aliyun_table.export import (check_state as check_export_state, decode_cursor,
+                                 load_checkpoint, new_state as new_export_state, write_pages)
+from aliyun_table.metrics import NULL_SPAN, Metrics, Span
+from aliyun_table.mirror import LocalMirror
+from aliyun_table.my_logger import logger
+from aliyun_table.paging import READ_CU_BYTES, RANGE_PAGE_SIZE, SEARCH_PAGE_SIZE, page_sizer
+from aliyun_table.pool import DEFAULT_MAX_CONNECTION, DEFAULT_SOCKET_TIMEOUT, client_registry, new_client
+from aliyun_table.records import ROW_FORMATS, RowRecord, RowTuple, _split_row, page_records
+from aliyun_table.ratelimit import THROTTLING_ERRORS, CapacityLimiter
+from aliyun_table.query_plan import (QueryPlan, QuerySyntaxError, QueryTypeNotExistError,
+                                     build_query, build_query_list, compile_query)
+
+
+# 工作线程通过队列传递的消息类型.
+_ITEM = object()
+_ERROR = object()
+_DONE = object()
+
+# BatchWriteRow 单次请求的行数和数据大小上限.
+BATCH_WRITE_MAX_ROWS = 200
+BATCH_WRITE_MAX_BYTES = 4 * 1024 * 1024
+# BatchGetRow 单次请求的行数上限.
+BATCH_GET_MAX_ROWS = 100
+# 批量写入时可以重试的错误码, 其它错误(例如参数错误)重试也不会成功.
+RETRYABLE_ERRORS = THROTTLING_ERRORS | frozenset(('OTSRowOperationConflict', 'OTSOperationConflict',
+                                                   'OTSTableNotReady', 'OTSPartitionUnavailable', 'OTSTimeout',
+                                                   'OTSInternalServerError', 'OTSServerUnavailable'))
+
+
+def _get_md5(s):
+    """ 获取md5 """
+    s = str(s)
+    return hashlib.md5(f'{s}'.encode('utf-8')).hexdigest()
+
+
+def _is_retryable(error_code, http_status=None):
+    """批量写入的错误是否可以重试"""
+    return error_code in RETRYABLE_ERRORS or http_status in (500, 502, 503)
+
+
+def _batch_key(primary_key):
+    """批次内判断主键重复的键, 自增主键每次生成新值, 不会重复, 返回None"""
+    values = []
+    for name, value in primary_key:
+        if value is PK_AUTO_INCR:
+            return None
+        values.append((name, bytes(value) if isinstance(value, bytearray) else value))
+    return tuple(values)
+
+
+def _estimate_row_size(row):
+    """估算单行数据序列化后的字节数, 用于控制批量写入的请求大小"""
+    columns = list(row.primary_key)
+    attribute_columns = row.attribute_columns
+    if isinstance(attribute_columns, dict):
+        for value in attribute_columns.values():
+            columns.extend(value)
+    elif attribute_columns:
+        columns.extend(attribute_columns)
+    size = 0
+    for column in columns:
+        name, value = column[0], column[1]
+        size += len(name.encode('utf-8'))
+        if isinstance(value, str):
+            size += len(value.encode('utf-8'))
+        elif isinstance(value, (bytes, bytearray)):
+            size += len(value)
+        else:
+            size += 8
+    return size
+
+
+def _page_bytes(rows, consumed=None, sample_size=10):
+    """
+    估算一页数据的字节数, 有读服务能力单元时按CU计算, 否则按前sample_size行的平均大小估算.
+    """
+    if not rows:
+        return 0
+    if consumed is not None and getattr(consumed, 'read', None):
+        return consumed.read * READ_CU_BYTES
+    sample = rows[:sample_size]
+    size = 0
+    for row in sample:
+        pkvs, ckvs = _split_row(row)
+        size += _estimate_row_size(Row(pkvs, ckvs))
+    return size * len(rows) // len(sample)
+
+
+def _put_until_stopped(q, item, stop):
+    """向有界队列中放入数据, 队列满时阻塞直到有空位或者stop被设置. 成功放入返回True"""
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _parallel_iter(generators, max_workers, ordered=False, queue_size=1000):
+    """
+    在线程池中并发消费多个生成器, 将结果合并后逐条返回.
+
+    :param generators [list]: 生成器列表, 每个生成器在一个工作线程中被遍历.
+    :param max_workers [int]: 最大线程数.
+    :param ordered [bool]: 为True时按generators的顺序依次返回各生成器的全部结果,
+        否则按到达顺序返回.
+    :param queue_size [int]: 每个队列缓冲的最大数据量, 消费者来不及处理时工作线程会阻塞.
+    工作线程中的异常会在消费者中重新抛出; 关闭返回的生成器会通知工作线程停止,
+    正在运行的生成器最多再取一条数据, 尚未开始的生成器不会再被遍历.
+    """
+    stop = threading.Event()
+    queue_count = len(generators) if ordered else 1
+    queues = [queue.Queue(queue_size) for _ in range(queue_count)]
+
+    def worker(q, gen):
+        try:
+            # 每次取数据之前检查是否已停止, 避免停止后继续请求.
+            while not stop.is_set():
+                try:
+                    item = next(gen)
+                except StopIteration:
+                    break
+                if not _put_until_stopped(q, (_ITEM, item), stop):
+                    return
+        except Exception as e:
+            _put_until_stopped(q, (_ERROR, e), stop)
+        finally:
+            gen.close()
+            _put_until_stopped(q, (_DONE, None), stop)
+
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    futures = []
+    try:
+        for i, gen in enumerate(generators):
+            futures.append((executor.submit(worker, queues[i if ordered else 0], gen), gen))
+        if ordered:
+            pending = [(q, 1) for q in queues]
+        else:
+            pending = [(queues[0], len(generators))]
+        for q, running in pending:
+            while running:
+                kind, payload = q.get()
+                if kind is _ITEM:
+                    yield payload
+                elif kind is _ERROR:
+                    raise payload
+                else:
+                    running -= 1
+    finally:
+        stop.set()
+        # 取消还在排队的生成器, python3.9之前shutdown不能取消排队的任务.
+        for future, gen in futures:
+            if future.cancel():
+                gen.close()
+        executor.shutdown(wait=False)
+
+
+def _prefetch_iter(gen, depth):
+    """
+    在后台线程中提前遍历生成器, 最多缓存depth个结果.
+    用于在调用方处理当前页时提前请求后续的页.
+    """
+    return _parallel_iter([gen], max_workers=1, queue_size=depth)
+
+
+def _process_iter(func, items, processes=None, ordered=True, max_in_flight=None, mp_context=None):
+    """
+    在进程池中对items的每个元素(参数元组)调用func, 逐个返回结果.
+    items在当前进程中遍历(例如按页请求数据), 进程池中最多同时处理max_in_flight个元素,
+    来不及处理时暂停遍历items. func和参数都需要可以pickle.
+
+    :param processes [int]: 进程数, 默认为CPU核数.
+    :param ordered [bool]: 为True时按items的顺序返回, 否则按完成的顺序返回.
+    :param max_in_flight [int]: 同时处理的最大元素数, 默认为进程数的2倍.
+    :param mp_context: ``multiprocessing.get_context()``返回的上下文, 默认使用平台的默认方式启动进程.
+    子进程中的异常会在消费者中重新抛出; 关闭返回的生成器会取消尚未开始的任务.
+    """
+    processes = processes or os.cpu_count() or 1
+    max_in_flight = max_in_flight or 2 * processes
+    pending = deque() if ordered else set()
+
+    def completed():
+        if ordered:
+            yield pending.popleft().result()
+            return
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            pending.discard(future)
+            yield future.result()
+
+    executor = ProcessPoolExecutor(processes, mp_context=mp_context)
+    try:
+        for args in items:
+            future = executor.submit(func, *args)
+            if ordered:
+                pending.append(future)
+            else:
+                pending.add(future)
+            while len(pending) >= max_in_flight:
+                yield from completed()
+        while pending:
+            yield from completed()
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
+
+
+def _process_page(rows, row_format='dict', decoder=None, func=None, tag=None):
+    """
+    ``_process_iter``的任务, 在子进程中转换一页数据, 对每条记录调用func, 返回(结果列表, tag).
+    tag原样返回, 例如该页之后的扫描位置.
+    """
+    records = _convert_page(rows, row_format, decoder)
+    if func is not None:
+        records = [func(record) for record in records]
+    return records, tag
+
+
+def _row_cache_key(table_name, primary_key):
+    """读缓存的键, primary_key为(列名, 值)的序列"""
+    return (table_name, tuple(sorted(primary_key)))
+
+
+# 查询结果缓存的键的格式版本, 键的格式变化时增加, 不读取旧版本写入DiskCache的结果.
+QUERY_CACHE_KEY_VERSION = 3
+
+
+def _query_cache_key(table_name, index_name, plan):
+    """
+    查询结果缓存的键.
+    plan.stable_key中的值带有类型, 对1、True和1.0的查询不会读到彼此的结果; 它的repr在不同进程中相同.
+    """
+    return (QUERY_CACHE_KEY_VERSION, table_name, index_name, plan.stable_key)
+
+
+def _record_pages(cache, key, pages):
+    """
+    返回pages中的每一页, 同时把已返回的页写入缓存.
+    全部返回后缓存标记为完整; 提前关闭时缓存已返回的部分; 出错时不缓存.
+    """
+    fetched = []
+    try:
+        for page in pages:
+            fetched.append(page)
+            yield page
+    except GeneratorExit:
+        cache.set(key, (fetched, False))
+        raise
+    else:
+        cache.set(key, (fetched, True))
+    finally:
+        pages.close()
+
+
+def _get_end_point() -> str:
+    """获取相应的endpoint"""
+    endpoint = END_POINT
+    return endpoint
+
+
+def item2dict(l):
+    """将aliyun table查询中返回的数据变成字典
+    示例：
+        源数据: ([('primary_key': 12345)], [('col1','value1'), ('col2', 'value2')...])
+        转换后的数据:
+            {
+                'primary_key': 12345,
+                'col1': 'value1',
+                'col2': 'value2',
+                ...
+            }  
+    """
+    res = {}
+    # primary key-values and column key-values.
+    pkvs, ckvs = l
+    # 主键的键值对.
+    for pk, pv in pkvs:
+        res[pk] = pv
+    # 存放最终结果的字典.
+    for ck, cv, _ in ckvs:
+        res[ck] = cv
+    return res
+
+
+def _fill_key(pk_list, values, fill):
+    """
+    把主键值的列表或字典补全为(列名, 值)的列表, 没有指定的列使用fill.
+    """
+    if values is None:
+        values = []
+    elif isinstance(values, dict):
+        names = pk_list[:len(values)]
+        if set(values) != set(names):
+            raise ValueError(f'primary key columns should be a prefix of {pk_list}, not {list(values)}')
+        values = [values[name] for name in names]
+    else:
+        values = list(values)
+    if len(values) > len(pk_list):
+        raise ValueError(f'too many primary key values {values} for {pk_list}')
+    return list(zip(pk_list, values)) + [(name, fill) for name in pk_list[len(values):]]
+
+
+def _range_keys(pk_list, start=None, end=None, prefix=None, direction='FORWARD'):
+    """
+    构造get_range的起止主键, 参数见``TableClient.scan_range``.
+    :return: (inclusive_start_primary_key, exclusive_end_primary_key)
+    """
+    pk_list = list(pk_list)
+    if direction not in ('FORWARD', 'BACKWARD'):
+        raise ValueError(f"direction should be 'FORWARD' or 'BACKWARD', not {direction!r}")
+    # 正序时小的一端补INF_MIN, 倒序时相反.
+    low, high = (INF_MIN, INF_MAX) if direction == 'FORWARD' else (INF_MAX, INF_MIN)
+    if prefix is not None:
+        if start is not None or end is not None:
+            raise ValueError('prefix cannot be used together with start or end')
+        if len(prefix) >= len(pk_list):
+            raise ValueError(f'prefix should have fewer columns than {pk_list}, use get_rows to read a single row')
+        return _fill_key(pk_list, prefix, low), _fill_key(pk_list, prefix, high)
+    start_primary_key = _fill_key(pk_list, start, low)
+    end_primary_key = _fill_key(pk_list, end, low if end is not None else high)
+    return start_primary_key, end_primary_key
+
+
+def _convert_page(rows, row_format='dict', decoder=None):
+    """
+    将一页数据转换为row_format格式的记录列表, 格式见``aliyun_table.records``.
+    rows的元素可以是Row对象或者search返回的(主键, 属性)元组.
+    decoder为``TableClient._page_decoder``返回的嵌套列解码函数.
+    """
+    if decoder is not None:
+        rows = decoder(rows)
+    if row_format == 'dict':
+        return [item2dict(_split_row(row)) for row in rows]
+    if row_format == 'raw':
+        return [_split_row(row) for row in rows]
+    if row_format not in ROW_FORMATS:
+        raise ValueError(f'row_format should be one of {ROW_FORMATS}, not {row_format!r}')
+    return page_records(rows, row_format)
+
+
+class TableClient(object):
+    """
+    Realization of some database operations in Aliyun OTSclient.
+
+    """
+    def __init__(
+                 self,
+                 instance_name,
+                 end_point=None,
+                 access_key_id=None, 
+                 access_key_secret=None,
+                 row_cache_size=None,
+                 row_cache_ttl=60,
+                 query_cache=None,
+                 codec='json',
+                 table_codecs=None,
+                 nested_columns=None,
+                 metrics=None,
+                 rate_limiter=None,
+                 metadata_ttl=300,
+                 max_connection=DEFAULT_MAX_CONNECTION,
+                 socket_timeout=DEFAULT_SOCKET_TIMEOUT,
+                 share_client=True,
+                 skip_unchanged=None,
+                 hash_store=None):
+        """
+        初始化``OTSClient``实例。
+        ``end_point``是表格存储服务的地址（例如 'https://instance.cn-hangzhou.ots.aliyun.com:80'），必须以'https://'开头。
+        ``access_key_id``是访问表格存储服务的 AccessKeyID，通过官方网站申请或通过管理员获取。
+        ``access_key_secret``是访问表格存储服务的AccessKeySecret，通过官方网站申请或通过管理员获取。
+        ``instance_name``是要访问的实例名，通过官方网站控制台创建或通过管理员获取。
+    ``sts_token``是访问表格存储服务的STS token，从阿里云STS服务获取，具有有效期，过期后需要重新获取。
+        ``encoding``请求参数的字符串编码类型，默认是 utf8。
+        ``socket_timeout``是连接池中每个连接的 Socket 超时，单位为秒，可以为 int 或 float。默认值为 50。
+        ``max_connection``是连接池的最大连接数。默认为 50。
+        ``logger_name``用来在请求中打 DEBUG 日志，或者在出错时打 ERROR 日志。
+        ``retry_policy``定义了重试策略，默认的重试策略为 DefaultRetryPolicy。你可以继承 RetryPolicy 来实现自己的重试策略，请参考 DefaultRetryPolicy 的代码。
+        ``row_cache_size``是``get_rows``读缓存的最大行数，默认不开启缓存。
+        ``row_cache_ttl``是读缓存的过期时间，单位为秒。
+        ``query_cache``是``query``的结果缓存，可以是``LRUCache``或者``DiskCache``，默认不缓存。
+        ``codec``是dict和list类型的列的编解码器，'json'、'orjson'或者'msgpack'，见``aliyun_table.codec``。
+        ``table_codecs``是表名到编解码器的字典，用于单独指定某些表的编解码器。
+        ``nested_columns``是表名到嵌套列列表的字典，读取时会解码这些列，默认不解码。
+        ``metrics``是``Metrics``实例，记录每次请求的耗时、行数、字节数、CU、重试和异常，默认不记录。
+        ``rate_limiter``是``CapacityLimiter``实例，按读写CU限速，可以在多个客户端之间共享，默认不限速。
+        ``metadata_ttl``是表列表、表结构和索引结构的缓存时间，单位为秒，为None时不过期。初始化时不会请求服务端。
+        ``max_connection``是连接池的最大连接数，默认为300。
+        ``socket_timeout``是连接的Socket超时，单位为秒，默认为2。
+        ``share_client``为True时，参数相同的客户端通过``aliyun_table.pool.client_registry``共享同一个OTSClient和连接池。
+        ``skip_unchanged``是表名到哈希列名的字典，这些表写入时计算属性列的哈希，内容没有变化的行不再写入。
+        哈希列为None时只使用本地的``hash_store``判断；否则把哈希保存在该列中，由服务端的条件检查跳过没有变化的行。
+        开启后这些表的全部写入都需要经过开启了skip_unchanged的客户端，否则哈希会与实际数据不一致。
+        ``hash_store``是保存已写入的行的哈希的缓存，默认为进程内的``LRUCache``；使用``HashStore``时哈希保存在SQLite文件中，可以在多次运行之间复用。
+        """
+        # Get endpoint.
+        if end_point is None:
+            end_point = os.environ.get('OTS_END_POINT')
+        if end_point is None:
+            raise Exception('OTS_END_POINT not set, you can set it in ENV.')
+        # Get access_key_id.
+        if access_key_id is None:
+            access_key_id = os.environ.get('OTS_ACCESS_KEY_ID')
+        if access_key_id is None:
+            raise Exception('OTS_ACCESS_KEY_ID not set, you can set it in ENV.')
+        # Get access_key_secret
+        if access_key_secret is None:
+            access_key_secret = os.environ.get('OTS_ACCESS_KEY_SECRET')
+        if access_key_secret is None:
+            raise Exception('OTS_ACCESS_KEY_SECRET not set, you can set it in ENV.')
+
+        # Link to OTSclient, 第一次请求时才创建, fork之后重新创建.
+        self.client_options = {'end_point': end_point,
+                               'access_key_id': access_key_id,
+                               'access_key_secret': access_key_secret,
+                               'instance_name': instance_name,
+                               'max_connection': max_connection,
+                               'socket_timeout': socket_timeout}
+        self.share_client = share_client
+        self._otsclient = None
+        self._otsclient_pid = None
+
+        self.instance_name = instance_name 
+        # get_rows 的读缓存, put_row/update_row 会使对应主键的缓存失效.
+        self.row_cache = LRUCache(row_cache_size, row_cache_ttl) if row_cache_size else None
+        # query 的结果缓存, 命中情况见 query_cache.hits 和 query_cache.misses.
+        self.query_cache = query_cache
+        # 嵌套列的编解码器.
+        self.codec = get_codec(codec)
+        self.table_codecs = {table: get_codec(c) for table, c in (table_codecs or {}).items()}
+        self.nested_columns = dict(nested_columns or {})
+        # 请求的指标统计.
+        self.metrics = metrics
+        # 按CU限速, 所有线程共享.
+        self.rate_limiter = rate_limiter
+        # 跳过内容没有变化的写入, 表名 -> 哈希列.
+        self.skip_unchanged = dict(skip_unchanged or {})
+        if hash_store is None and self.skip_unchanged:
+            hash_store = LRUCache(maxsize=1000000, ttl=None)
+        self.hash_store = hash_store
+        # 因内容没有变化而跳过的行数, 多个线程写入时由_unchanged_lock保护.
+        self.unchanged_rows = 0
+        self._unchanged_lock = threading.Lock()
+        # 表列表、表结构和索引结构的缓存, 第一次使用时才请求服务端.
+        self.metadata_cache = LRUCache(maxsize=1024, ttl=metadata_ttl)
+
+
+    @property
+    def otsclient(self):
+        """底层的OTSClient, 共享时从``client_registry``获取"""
+        if self._otsclient is None or self._otsclient_pid != os.getpid():
+            if self.share_client:
+                self._otsclient = client_registry.get(**self.client_options)
+            else:
+                self._otsclient = new_client(**self.client_options)
+            self._otsclient_pid = os.getpid()
+        return self._otsclient
+
+    @otsclient.setter
+    def otsclient(self, client):
+        self._otsclient = client
+        self._otsclient_pid = os.getpid()
+
+    def query_all(self,
+                  table_name,
+                  primary_key='_id',
+                  start_primary_key=None,
+                  limit=None,
+                  parallel=None,
+                  split_points=None,
+                  ordered=False,
+                  prefetch=None,
+                  row_format='dict',
+                  columns_to_get=None,
+                  column_filter=None,
+                  page_size=None):
+        """
+        使用get_range遍历全表数据.
+
+        :param primary_key [str]: 主键名称.
+        :param start_primary_key: 起始主键, 默认从INF_MIN开始.
+        :param limit [int]: 最多返回多少数量的数据.
+        :param parallel [int]: 并行扫描的线程数, 不指定则顺序扫描.
+        :param split_points [list]: 主键切分点, 例如[1000, 2000], 会把全表切成
+            [start, 1000), [1000, 2000), [2000, INF_MAX) 三段并行扫描.
+            不指定时由``compute_split_points``根据主键范围计算.
+        :param ordered [bool]: 并行扫描时是否按主键顺序返回, 默认谁先返回就先输出(最快).
+        :param prefetch [int]: 顺序扫描时在后台线程预取的页数, 不指定则不预取.
+        :param row_format [str]: 返回数据的格式, 'dict', 'tuple', 'slots'或'raw', 见``aliyun_table.records``.
+        :param columns_to_get [list]: 需要返回的属性列, 不指定则返回全部列. 只有指定的列会从服务端返回.
+        :param column_filter: 服务端过滤条件, ``SingleColumnCondition``或``CompositeColumnCondition``.
+            e.g. SingleColumnCondition('status', 1, ComparatorType.EQUAL)
+        :param page_size: 每页的行数, 整数表示固定的行数; (min, max)元组表示根据行大小和耗时在该范围内自适应,
+            默认在[100, 5000]内自适应.
+        """
+        start_key = start_primary_key if start_primary_key else INF_MIN
+        scan_options = {'columns_to_get': columns_to_get, 'column_filter': column_filter, 'page_size': page_size}
+        pages = None
+        if not parallel and not split_points:
+            pages = self._range_pages(table_name, primary_key, start_key, INF_MAX, **scan_options)
+            if prefetch:
+                pages = _prefetch_iter(pages, prefetch)
+            decoder = self._page_decoder(table_name)
+            rows = (record for row_list, _ in pages for record in _convert_page(row_list, row_format, decoder))
+        else:
+            parallel, bounds = self._shard_bounds(table_name, primary_key, start_primary_key, parallel, split_points)
+            shards = [self._range_scan(table_name, primary_key, bounds[i], bounds[i + 1], row_format, **scan_options)
+                      for i in range(len(bounds) - 1)]
+            rows = _parallel_iter(shards, max_workers=parallel, ordered=ordered)
+
+        yield_data_count = 0
+        try:
+            for d in rows:
+                yield d
+                yield_data_count += 1
+                if (limit is not None) and (yield_data_count >= limit):
+                    return
+        finally:
+            rows.close()
+            if pages is not None:
+                pages.close()
+
+    def _shard_bounds(self, table_name, primary_key, start_primary_key, parallel, split_points):
+        """
+        并行扫描的主键区间, 返回(线程数, 区间边界列表), 参数见``query_all``.
+        """
+        parallel = parallel or len(split_points) + 1
+        if split_points is None:
+            split_points = self.compute_split_points(table_name, primary_key, parallel)
+        if start_primary_key:
+            split_points = [point for point in split_points if point > start_primary_key]
+        start_key = start_primary_key if start_primary_key else INF_MIN
+        return parallel, [start_key] + sorted(split_points) + [INF_MAX]
+
+    def map_rows(self,
+                 table_name,
+                 func=None,
+                 processes=None,
+                 ordered=True,
+                 max_in_flight=None,
+                 row_format='dict',
+                 primary_key='_id',
+                 parallel=None,
+                 split_points=None,
+                 prefetch=2,
+                 columns_to_get=None,
+                 column_filter=None,
+                 page_size=None,
+                 use_index=False,
+                 index_name='filter',
+                 plan=None,
+                 mp_context=None,
+                 **query_kwargs):
+        """
+        遍历全表(或多元索引的查询结果), 在进程池中转换每页数据并对每条记录调用func, 返回func的结果.
+        请求数据在当前进程的线程中执行, 转换记录、解码嵌套列和func在子进程中执行, 可以利用多个CPU核.
+        子进程之间需要pickle传递数据, 只有转换和func的计算量较大时才比``query_all``快.
+
+        e.g.
+            # func需要定义在模块级别, 以便pickle
+            def transform(row):
+                return row['id'], len(row['content'])
+
+            for result in table_cli.map_rows('all_news', transform, processes=8, primary_key='id', parallel=8):
+                ...
+
+        :param func: 对每条记录调用的函数, 为None时返回转换后的记录.
+        :param processes [int]: 进程数, 默认为CPU核数.
+        :param ordered [bool]: 为True时按页的读取顺序返回, 否则谁先处理完先返回.
+        :param max_in_flight [int]: 进程池中同时处理的最大页数, 默认为进程数的2倍.
+        :param row_format [str]: 传给func的记录格式, 见``aliyun_table.records``.
+        :param primary_key, parallel, split_points, columns_to_get, column_filter, page_size: 同``query_all``.
+        :param prefetch [int]: 顺序扫描时在后台线程预取的页数.
+        :param use_index [bool]: 为True时通过多元索引查询, 查询条件同``query``, 否则按主键遍历全表.
+        :param plan [QueryPlan]: ``compile_query``生成的查询计划, 指定后忽略查询条件.
+        :param mp_context: ``multiprocessing.get_context()``返回的上下文, 默认使用平台的默认方式.
+        :param query_kwargs: use_index为True时的查询条件, 包括must_query_list、must_not_query_list、should_query_list和sort_list.
+        """
+        if use_index:
+            if plan is None:
+                plan = compile_query(column_to_get=columns_to_get, **query_kwargs)
+            pages = self._search_pages(table_name, index_name, plan.bool_query, plan.sort, plan.columns_to_get,
+                                       page_size=page_size)
+        else:
+            scan_options = {'columns_to_get': columns_to_get, 'column_filter': column_filter, 'page_size': page_size}
+            if parallel or split_points:
+                parallel, bounds = self._shard_bounds(table_name, primary_key, None, parallel, split_points)
+                shards = [self._range_pages(table_name, primary_key, bounds[i], bounds[i + 1], **scan_options)
+                          for i in range(len(bounds) - 1)]
+                pages = _parallel_iter(shards, max_workers=parallel, ordered=ordered, queue_size=prefetch or 1)
+                prefetch = None
+            else:
+                pages = self._range_pages(table_name, primary_key, INF_MIN, INF_MAX, **scan_options)
+        if prefetch:
+            pages = _prefetch_iter(pages, prefetch)
+        decoder = self._page_decoder(table_name)
+        tasks = ((page[0], row_format, decoder, func) for page in pages)
+        results = _process_iter(_process_page, tasks, processes, ordered, max_in_flight, mp_context)
+        try:
+            for records, _ in results:
+                yield from records
+        finally:
+            results.close()
+            pages.close()
+
+    def _range_scan(self, table_name, primary_key, start_key, end_key, row_format='dict', **scan_options):
+        """
+        扫描主键区间[start_key, end_key)内的数据, scan_options见``_range_pages``.
+        """
+        decoder = self._page_decoder(table_name)
+        for row_list, _ in self._range_pages(table_name, primary_key, start_key, end_key, **scan_options):
+            yield from _convert_page(row_list, row_format, decoder)
+
+    def _range_pages(self, table_name, primary_key, start_key, end_key,
+                     columns_to_get=None, column_filter=None, page_size=None, time_range=None):
+        """
+        按页扫描主键区间[start_key, end_key)内的数据, 每页的行数由page_size决定, 见``query_all``.
+        primary_key为主键列表时, start_key和end_key是第一个主键列的值, 其余主键列不限制.
+        time_range为(开始, 结束)的毫秒时间戳时只返回该范围内写入的列.
+        每页返回(Row列表, next_start_primary_key), 后者是下一页的起始主键, 扫描结束时为None.
+        """
+        pk_names = [primary_key] if isinstance(primary_key, str) else list(primary_key)
+        start_primary_key = [(pk_names[0], start_key)] + [(name, INF_MIN) for name in pk_names[1:]]
+        end_primary_key = [(pk_names[0], end_key)] + [(name, INF_MIN) for name in pk_names[1:]]
+        return self._scan_pages(table_name, start_primary_key, end_primary_key, columns_to_get=columns_to_get,
+                                column_filter=column_filter, page_size=page_size, time_range=time_range)
+
+    def _scan_pages(self, table_name, start_primary_key, end_primary_key, direction='FORWARD', columns_to_get=None,
+                    column_filter=None, page_size=None, max_version=1, time_range=None, limit=None):
+        """
+        按页扫描[start_primary_key, end_primary_key)内的数据, 主键为完整的(列名, 值)列表, BACKWARD时start大于end.
+        每页的行数由page_size决定, 最多返回limit行.
+        每页返回(Row列表, next_start_primary_key), 后者是下一页的起始主键, 扫描结束时为None.
+        """
+        sizer = page_sizer(page_size, RANGE_PAGE_SIZE)
+        next_start_primary_key = start_primary_key
+        remaining = limit
+        while next_start_primary_key:
+            start = time.monotonic()
+            with self._span('get_range', table_name) as span:
+                consumed, next_start_primary_key, row_list, next_token = self.otsclient.get_range(
+                        table_name,
+                        direction,
+                        next_start_primary_key,
+                        end_primary_key,
+                        columns_to_get=columns_to_get,
+                        limit=sizer.size if remaining is None else min(sizer.size, remaining),
+                        column_filter=column_filter,
+                        max_version=max_version,
+                        time_range=time_range,
+                )
+                nbytes = _page_bytes(row_list, consumed)
+                span.record(rows=len(row_list), nbytes=nbytes, consumed=consumed)
+            sizer.observe(len(row_list), nbytes, time.monotonic() - start)
+            yield row_list, next_start_primary_key
+            if remaining is not None:
+                remaining -= len(row_list)
+                if remaining <= 0:
+                    return
+
+    def scan_range(self,
+                   table_name,
+                   pk_list,
+                   start=None,
+                   end=None,
+                   prefix=None,
+                   direction='FORWARD',
+                   limit=None,
+                   max_versions=None,
+                   time_range=None,
+                   columns_to_get=None,
+                   column_filter=None,
+                   page_size=None,
+                   row_format='dict',
+                   prefetch=None):
+        """
+        按主键范围读取数据, 支持多列主键、前缀和倒序, 只读取范围内的数据.
+        start、end和prefix是主键值的列表(按pk_list的顺序, 可以只包含前几列)或者{主键名: 值}的字典.
+        只指定前几列时按前缀比较: start包含该前缀的全部行, end不包含该前缀的任何行.
+
+        e.g.
+            # medium_id为2222222的全部文章, 按id倒序
+            table_cli.scan_range('all_news', ['medium_id', 'id'], prefix=[2222222], direction='BACKWARD')
+            # medium_id在[1000, 2000)内的文章
+            table_cli.scan_range('all_news', ['medium_id', 'id'], start={'medium_id': 1000}, end={'medium_id': 2000})
+
+        :param pk_list [list]: primary key name list. e.g. ['pk1', 'pk2']
+        :param start: 起始主键(包含), 不指定则从表的开头(BACKWARD时为结尾)开始.
+        :param end: 结束主键(不包含), 不指定则到表的结尾(BACKWARD时为开头)结束.
+        :param prefix: 主键前缀, 返回以该前缀开头的全部行, 不能与start和end同时使用, 列数需要少于主键的列数.
+        :param direction [str]: 'FORWARD'按主键正序, 'BACKWARD'按主键倒序, 倒序时start大于end.
+        :param limit [int]: 最多返回的行数, 不会多读取.
+        :param max_versions [int]: 每列最多返回的版本数, 默认为1. 多个版本时请使用row_format='raw'.
+        :param time_range: 只返回该时间范围内写入的版本, (开始, 结束)的毫秒时间戳, 或者单个时间戳.
+        :param columns_to_get, column_filter, page_size, row_format, prefetch: 同``query_all``.
+        """
+        start_primary_key, end_primary_key = _range_keys(pk_list, start, end, prefix, direction)
+        pages = self._scan_pages(table_name, start_primary_key, end_primary_key, direction,
+                                 columns_to_get=columns_to_get, column_filter=column_filter, page_size=page_size,
+                                 max_version=max_versions or 1, time_range=time_range, limit=limit)
+        if prefetch:
+            pages = _prefetch_iter(pages, prefetch)
+        decoder = self._page_decoder(table_name)
+        try:
+            for row_list, _ in pages:
+                yield from _convert_page(row_list, row_format, decoder)
+        finally:
+            pages.close()
+
+    def compute_split_points(self, table_name, primary_key='_id', shard_count=8):
+        """
+        计算全表并行扫描的主键切分点.
+        分别正序和倒序读取一行得到最小和最大主键, 然后把主键区间等分为shard_count段.
+        只支持整型主键, 其它类型的主键返回空列表(不切分), 可以在query_all中通过split_points手动指定.
+
+        :param primary_key [str]: 主键名称.
+        :param shard_count [int]: 切分的段数.
+        :return: 升序的切分点列表.
+        """
+        with self._span('get_range', table_name) as span:
+            consumed, _, first_rows, _ = self.otsclient.get_range(
+                    table_name, 'FORWARD', [(primary_key, INF_MIN)], [(primary_key, INF_MAX)],
+                    columns_to_get=[primary_key], limit=1,
+            )
+            span.record(rows=len(first_rows), consumed=consumed)
+        with self._span('get_range', table_name) as span:
+            consumed, _, last_rows, _ = self.otsclient.get_range(
+                    table_name, 'BACKWARD', [(primary_key, INF_MAX)], [(primary_key, INF_MIN)],
+                    columns_to_get=[primary_key], limit=1,
+            )
+            span.record(rows=len(last_rows), consumed=consumed)
+        if not first_rows or not last_rows:
+            return []
+        lower = first_rows[0].primary_key[0][1]
+        upper = last_rows[0].primary_key[0][1]
+        if not isinstance(lower, int) or not isinstance(upper, int):
+            logger.warning(f'Can not compute split points for primary key {primary_key} of type {type(lower).__name__}.')
+            return []
+        step = (upper - lower) / shard_count
+        split_points = {lower + int(step * i) for i in range(1, shard_count)}
+        return sorted(point for point in split_points if lower < point <= upper)
+
+    def _construct_query_object(self, query_type, column_name, query_content):
+        """
+        根据用户输入的查询条件构造单个简单阿里云查询.
+        user_query 为三元组, 
+            (query_type, column_name, query_content)
+            (查询类型，列名称，查询内容)
+        查询条件为字符或者列表(只有terms时用到列表).
+        支持的查询方式:
+            term: 精准查询
+                功能：查询`column_name`列, 值为query_content的数据
+                e.g. 
+                    user_query = ('term', 'user', '用户9523')
+                    query = _construct_query_object(user_query)
+            terms: 精准查询
+                功能：查询 `column_name`列的值在query_content列表 的数据
+                e.g. 
+                    user_query = ('terms', 'user', ['用户9523', '用户9524'])
+                    query = _construct_query_object(user_query)
+            range: 范围查询
+                功能：查询 `column_name`列的值在给定范围的数据, 范围由query_content指定,
+                      格式为字符串，写成区间的格式, 支持开闭区间, 上限或下限留空表示不限制
+                e.g.
+                    # 构造点赞量在(100, 200]区间内的范围查询
+                    user_query = ('range', 'like_count', '(100, 200]')
+                    query = _construct_query_object(user_query)
+            phrase: 短语匹配查询
+                功能：查询 `column_name`列的值中出现query_content的数据
+                e.g.
+                    # 构造标题包含关键词`王者荣耀`的查询
+                    user_query = ('phrase', 'title', '王者荣耀')
+            prefix: 前缀匹配查询
+                功能：查询 `column_name`列的值以query_content开头的数据
+                    user_query = ('prefix', 'title', '王者')
+            matchall: 
+                功能：查询全部数据
+                    user_query = ('matchall', '', '')
+        """
+
+        return build_query(query_type, column_name, query_content)
+
+    def construct_query_list(self, user_query_list):
+        """
+        将用户的输入的查询列表构造为阿里云查询对象列表.
+        """
+        return build_query_list(user_query_list)
+
+
+    def query(self, 
+              table_name,
+              must_query_list=[], 
+              must_not_query_list=[], 
+              should_query_list=[], 
+              get_total_count=False, 
+              sort_list=None, 
+              index_name='filter', 
+              column_to_get=None, 
+              limit=None,
+              parallel=None,
+              prefetch=None,
+              use_cache=True,
+              plan=None,
+              row_format='dict',
+              page_size=None):
+        """
+        第一个版本的and查询.
+        根据用户输入的查询条件构造阿里云查询.
+        :param must_query_list: 需要满足的查询条件列表, 不指定则默认为查询全部数据
+        :param must_not_query_list: 不查询的条件列表（满足这些条件的数据不查询）
+        :param should_query_list: 不查询的条件列表（满足这些条件的数据不查询）
+        :param get_total_count: 是否需要获取查询到的总数量
+        :param sort_list: 列的排序列表，格式为list. 默认不排序
+            e.g.
+                # 根据时间正序，如果时间相同就根据点赞数倒序
+                table_cli = TableClient(table_name='toutiaoAccount', instance_name='account')
+                query_list = [
+                    ('range', 'fans_count', '[10000, 100000000000)'),
+                    ('range', 'datetime', '[1570778199000, 1571778199111]'),
+                ]
+                sort_list = [
+                    ('datetime', 1),
+                    ('like_count', -1),
+                ]
+                for total in table_cli.query(query_list=query_list, sort_list=sort_list, get_total_count=True):
+                    print(total)
+                    
+        :param index_name:
+        :param column_to_get:
+        :param parallel: 并行扫描的线程数, 指定后使用``scan_index``并行读取全部结果, 此时忽略sort_list.
+        :param prefetch: 在后台线程预取的页数, 不指定则不预取.
+        :param use_cache: 设置了query_cache时是否使用结果缓存, 相同的查询条件会直接返回缓存中的页.
+        :param plan: ``compile_query``生成的查询计划, 指定后忽略查询条件, 排序和返回列参数.
+        :param row_format: 返回数据的格式, 'dict', 'tuple', 'slots'或'raw', 见``aliyun_table.records``.
+        :param page_size: 每页的行数, 整数表示固定的行数; (min, max)元组表示根据行大小和耗时在该范围内自适应,
+            默认在[10, 100]内自适应.
+        用户指定的查询应为三元组, 
+            (query_type, column_name, query_content)
+            (查询类型，查询那一列，查询内容)
+        查询条件为字符或者列表(只有terms时用到列表).
+        """
+
+        # 相同的查询条件会直接使用已编译的查询计划.
+        if plan is None:
+            plan = compile_query(must_query_list, must_not_query_list, should_query_list,
+                                 sort_list, column_to_get)
+        if parallel:
+            yield from self._query_parallel(table_name, plan, get_total_count, index_name, limit,
+                                            parallel, row_format)
+            return
+
+        # 已返回的数据量.
+        yield_data_count = 0
+        bool_query, sort, column = plan.bool_query, plan.sort, plan.columns_to_get
+        decoder = self._page_decoder(table_name)
+        # 开始查询
+        pages = None
+        if use_cache and self.query_cache is not None:
+            cache_key = _query_cache_key(table_name, index_name, plan)
+            cached = self.query_cache.get(cache_key)
+            # 缓存中是完整的结果, 或者已缓存的数据量足够本次返回.
+            if cached is not None:
+                cached_pages, complete = cached
+                if complete or (limit is not None
+                                and sum(len(page[0]) for page in cached_pages) >= limit):
+                    pages = (page for page in cached_pages)
+            if pages is None:
+                pages = _record_pages(self.query_cache, cache_key,
+                                      self._search_pages(table_name, index_name, bool_query, sort, column,
+                                                        page_size=page_size))
+        else:
+            pages = self._search_pages(table_name, index_name, bool_query, sort, column, page_size=page_size)
+        if prefetch:
+            pages = _prefetch_iter(pages, prefetch)
+        try:
+            for rows, total_count, _ in pages:
+                # 返回数据
+                for d in _convert_page(rows, row_format, decoder):
+                    # 根据是否需要总数准备返回数据
+                    prepared_data = (total_count, d) if get_total_count else d
+                    yield prepared_data
+                    yield_data_count += 1
+                    if (limit is not None) and (yield_data_count >= limit):
+                        return
+        finally:
+            pages.close()
+
+    def iter_batches(self,
+                     table_name,
+                     batch_size=10000,
+                     columns=None,
+                     dtypes=None,
+                     fill_values=None,
+                     as_dataframe=False,
+                     use_index=False,
+                     **kwargs):
+        """
+        按列批量返回数据, 每批是列名到numpy数组的字典(或pandas.DataFrame), 适合向量化计算.
+        需要安装numpy, as_dataframe为True时需要安装pandas.
+
+        e.g.
+            for batch in table_cli.iter_batches('all_news', batch_size=50000,
+                                                columns=['id', 'like_count'],
+                                                dtypes={'like_count': 'int64'},
+                                                fill_values={'like_count': 0},
+                                                primary_key='id', parallel=8):
+                total += batch['like_count'].sum()
+
+        :param batch_size [int]: 每批的最大行数.
+        :param columns [list]: 返回的列, 只从服务端读取这些列, 不存在的列用缺失值填充; 不指定则为每批中出现的全部列.
+        :param dtypes [dict]: 列名到numpy类型的映射, 未指定的列自动推断类型.
+        :param fill_values [dict]: 列名到缺失值填充值的映射, 浮点数列默认填充nan.
+        :param as_dataframe [bool]: 是否返回pandas.DataFrame.
+        :param use_index [bool]: 为True时通过``query``(多元索引)读取, 否则通过``query_all``遍历全表.
+        :param kwargs: 透传给``query``或``query_all``的参数.
+        """
+        if use_index:
+            kwargs['get_total_count'] = False
+        # 只从服务端读取需要的列.
+        if columns is not None:
+            kwargs.setdefault('column_to_get' if use_index else 'columns_to_get', list(columns))
+        source = self.query if use_index else self.query_all
+        rows = source(table_name, row_format='raw', **kwargs)
+
+        def to_batch(batch):
+            arrays = rows_to_columns(batch, columns, dtypes, fill_values)
+            return columns_to_dataframe(arrays) if as_dataframe else arrays
+
+        batch = []
+        try:
+            for row in rows:
+                batch.append(row)
+                if len(batch) >= batch_size:
+                    yield to_batch(batch)
+                    batch = []
+            if batch:
+                yield to_batch(batch)
+        finally:
+            rows.close()
+
+    def export_table(self,
+                     table_name,
+                     path,
+                     format='jsonl',
+                     checkpoint=None,
+                     chunk_size=10000,
+                     compression=None,
+                     primary_key='_id',
+                     columns=None,
+                     use_index=False,
+                     index_name='filter',
+                     plan=None,
+                     prefetch=2,
+                     processes=None,
+                     column_filter=None,
+                     page_size=None,
+                     **query_kwargs):
+        """
+        把表中的数据导出为JSONL、CSV或Parquet文件, 支持断点续传.
+        每写入chunk_size行后把扫描位置原子地保存到checkpoint文件, 中断后使用相同的参数重新运行会从上次的位置继续.
+
+        e.g.
+            table_cli.export_table('all_news', 'all_news.jsonl.gz', compression='gzip',
+                                   checkpoint='all_news.ckpt', primary_key='id')
+
+        :param path [str]: 输出文件, parquet格式为输出目录(每块一个part-NNNNN.parquet文件).
+        :param format [str]: 'jsonl', 'csv'或'parquet', parquet需要安装pyarrow.
+        :param checkpoint [str]: checkpoint文件路径, 不指定则不支持断点续传.
+        :param chunk_size [int]: 每块的行数, 也是内存中最多缓存的行数.
+        :param compression [str]: 'gzip'或None; parquet格式为parquet的压缩算法, 默认为'snappy'.
+        :param primary_key: 主键名称, 多列主键为主键名称列表, 按主键遍历全表时使用.
+        :param columns [list]: 导出的列, csv不指定时使用第一块数据中出现的列作为表头.
+        :param use_index [bool]: 为True时通过多元索引查询导出, 查询条件同``query``, 否则按主键遍历全表.
+        :param plan [QueryPlan]: ``compile_query``生成的查询计划, 指定后忽略查询条件.
+        :param prefetch [int]: 后台预取的页数, 写文件的同时读取后续数据, 为0时不预取.
+        :param processes [int]: 在多个进程中转换数据和解码嵌套列的进程数, 不指定则在当前进程中转换.
+        :param column_filter: 按主键遍历时的服务端过滤条件, 见``query_all``.
+        :param page_size: 每页的行数, 见``query``和``query_all``.
+        :param query_kwargs: use_index为True时的查询条件, 包括must_query_list、must_not_query_list、should_query_list和sort_list.
+        :return: 导出状态, 包括导出的行数'rows'和块数'chunks'.
+        """
+        if query_kwargs and not use_index:
+            raise TypeError(f'export_table() got unexpected keyword arguments {sorted(query_kwargs)}, '
+                            f'query conditions need use_index=True')
+        source = f'{table_name}/{index_name}' if use_index else table_name
+        state = load_checkpoint(checkpoint) if checkpoint else None
+        if state is None:
+            state = new_export_state(source, path, format, columns)
+        else:
+            check_export_state(state, source, path, format)
+            if state['done']:
+                return state
+        cursor = decode_cursor(state['cursor'])
+        decoder = self._page_decoder(table_name)
+
+        # 每页为(数据, 该页之后的扫描位置)
+        if use_index:
+            if plan is None:
+                plan = compile_query(column_to_get=columns, **query_kwargs)
+            raw_pages = ((rows, next_token) for rows, _, next_token in self._search_pages(
+                    table_name, index_name, plan.bool_query, plan.sort, plan.columns_to_get, cursor,
+                    page_size=page_size))
+        elif cursor:
+            # 从保存的完整主键继续, 多列主键的其余列也从该位置开始.
+            pk_names = [primary_key] if isinstance(primary_key, str) else list(primary_key)
+            start_primary_key = [(name, value) for name, value in cursor]
+            start_primary_key += [(name, INF_MIN) for name in pk_names if name not in dict(cursor)]
+            end_primary_key = [(name, INF_MAX) for name, _ in start_primary_key]
+            raw_pages = self._scan_pages(table_name, start_primary_key, end_primary_key, columns_to_get=columns,
+                                         column_filter=column_filter, page_size=page_size)
+        else:
+            raw_pages = self._range_pages(table_name, primary_key, INF_MIN, INF_MAX, columns_to_get=columns,
+                                          column_filter=column_filter, page_size=page_size)
+        if processes:
+            if prefetch:
+                raw_pages = _prefetch_iter(raw_pages, prefetch)
+            # 按顺序返回, 保证checkpoint中的扫描位置之前的数据都已写入.
+            tasks = ((rows, 'dict', decoder, None, next_cursor) for rows, next_cursor in raw_pages)
+            pages = _process_iter(_process_page, tasks, processes)
+        else:
+            pages = ((_convert_page(rows, decoder=decoder), next_cursor) for rows, next_cursor in raw_pages)
+            if prefetch:
+                pages = _prefetch_iter(pages, prefetch)
+        try:
+            return write_pages(pages, path, state, checkpoint, chunk_size, compression)
+        finally:
+            pages.close()
+            raw_pages.close()
+
+    def _search_pages(self, table_name, index_name, bool_query, sort, column, next_token=None, page_size=None):
+        """
+        按页读取多元索引的查询结果, 每页返回(rows, total_count, next_token).
+        指定next_token时从该位置继续读取. page_size见``query``.
+        """
+        sizer = page_sizer(page_size, SEARCH_PAGE_SIZE)
+        if next_token:
+            search_query = SearchQuery(bool_query, next_token=next_token, limit=sizer.size, get_total_count=True)
+        else:
+            search_query = SearchQuery(bool_query, sort=sort, limit=sizer.size, get_total_count=True)
+        while True:
+            start = time.monotonic()
+            with self._span('search', table_name) as span:
+                response = self.otsclient.search(table_name, index_name, search_query, column)
+                rows, next_token, total_count = response.rows, response.next_token, response.total_count
+                nbytes = _page_bytes(rows)
+                span.record(rows=len(rows), nbytes=nbytes)
+            sizer.observe(len(rows), nbytes, time.monotonic() - start)
+            yield rows, total_count, next_token
+
+            # 如果没有数据就跳出循环
+            if not next_token: # data all returned
+                break
+            # 后续循环不需要排序了.
+            search_query = SearchQuery(bool_query, next_token=next_token, limit=sizer.size, get_total_count=True)
+
+    def count(self,
+              table_name,
+              must_query_list=[],
+              must_not_query_list=[],
+              should_query_list=[],
+              index_name='filter',
+              plan=None):
+        """
+        返回满足查询条件的行数, 只请求总数(limit=0), 不返回数据.
+        查询条件的格式同``query``.
+
+        e.g.
+            n = table_cli.count('all_news', must_query_list=[('range', 'like_count', '(100, )')])
+        """
+        return self._search_stats(table_name, must_query_list, must_not_query_list, should_query_list,
+                                  index_name, plan)[0]
+
+    def aggregate(self,
+                  table_name,
+                  aggs,
+                  must_query_list=[],
+                  must_not_query_list=[],
+                  should_query_list=[],
+                  index_name='filter',
+                  plan=None):
+        """
+        使用多元索引的统计聚合计算满足查询条件的数据的统计值, 只需要一次请求.
+        查询条件的格式同``query``, 聚合的列需要在索引中开启enable_sort_and_agg.
+
+        e.g.
+            stats = table_cli.aggregate('all_news', [('sum', 'like_count'), ('max', 'like_count', 'top')],
+                                        must_query_list=[('term', 'user', '用户9523')])
+            # {'sum_like_count': 12345, 'top': 999, '_count': 100}
+
+        :param aggs [list]: 聚合条件列表, 格式为(agg_type, column_name[, name]), 见``aliyun_table.aggregation``.
+        :return: 结果名称到值的字典, '_count'为满足查询条件的行数.
+        """
+        total_count, agg_results, _ = self._search_stats(table_name, must_query_list, must_not_query_list,
+                                                         should_query_list, index_name, plan,
+                                                         aggs=build_agg_list(aggs))
+        result = agg_results_to_dict(agg_results)
+        result['_count'] = total_count
+        return result
+
+    def group_by(self,
+                 table_name,
+                 column_name,
+                 aggs=None,
+                 size=10,
+                 sort_list=None,
+                 must_query_list=[],
+                 must_not_query_list=[],
+                 should_query_list=[],
+                 index_name='filter',
+                 plan=None):
+        """
+        按列的值分组, 返回每组的行数和统计值, 只需要一次请求.
+
+        e.g.
+            # 点赞数最多的10个用户
+            for group in table_cli.group_by('all_news', 'user', aggs=[('sum', 'like_count', 'likes')],
+                                            sort_list=[('likes', -1)]):
+                print(group['key'], group['count'], group['likes'])
+
+        :param column_name [str]: 分组的列, 需要在索引中开启enable_sort_and_agg.
+        :param aggs [list]: 每组的聚合条件列表, 格式同``aggregate``.
+        :param size [int]: 最多返回的组数, 不超过2000.
+        :param sort_list [list]: 分组的排序, 格式同``query``, 列名为'_count'时按行数排序, 为'_key'时按分组的值排序,
+            否则按同名的聚合结果排序. 默认按行数倒序.
+        :return: 分组的列表, 每组为{'key': 分组的值, 'count': 行数, 聚合名称: 聚合结果...}.
+        """
+        group_by = build_group_by(column_name, aggs, size, sort_list)
+        _, _, group_by_results = self._search_stats(table_name, must_query_list, must_not_query_list,
+                                                    should_query_list, index_name, plan, group_bys=[group_by])
+        for group_by_result in group_by_results or []:
+            if group_by_result.name == column_name:
+                return group_by_items(group_by_result)
+        return []
+
+    def _search_stats(self, table_name, must_query_list, must_not_query_list, should_query_list, index_name,
+                      plan, aggs=None, group_bys=None):
+        """
+        发送只获取总数和统计结果的查询(limit=0).
+        :return: (total_count, agg_results, group_by_results)
+        """
+        if plan is None:
+            plan = compile_query(must_query_list, must_not_query_list, should_query_list)
+        search_query = SearchQuery(plan.bool_query, limit=0, get_total_count=True, aggs=aggs, group_bys=group_bys)
+        with self._span('search', table_name):
+            response = self.otsclient.search(
+                    table_name, index_name, search_query, ColumnsToGet(return_type=ColumnReturnType.NONE)
+            )
+        return response.total_count, response.agg_results, response.group_by_results
+
+    def _query_parallel(self, table_name, plan, get_total_count, index_name, limit, parallel, row_format):
+        """
+        ``query``的并行版本, 基于``scan_index``.
+        """
+        if plan.sort is not None:
+            logger.warning('sort_list is ignored in parallel query.')
+        total_count = None
+        if get_total_count:
+            # limit=0 只获取总数, 不返回数据.
+            search_query = SearchQuery(plan.bool_query, limit=0, get_total_count=True)
+            with self._span('search', table_name):
+                total_count = self.otsclient.search(
+                        table_name, index_name, search_query, ColumnsToGet(return_type=ColumnReturnType.NONE)
+                ).total_count
+        rows = self.scan_index(table_name, index_name=index_name, limit=limit,
+                               parallel=parallel, plan=plan, row_format=row_format)
+        for d in rows:
+            yield (total_count, d) if get_total_count else d
+
+    def scan_index(self,
+                   table_name,
+                   must_query_list=[],
+                   must_not_query_list=[],
+                   should_query_list=[],
+                   index_name='filter',
+                   column_to_get=None,
+                   limit=None,
+                   parallel=None,
+                   plan=None,
+                   row_format='dict'):
+        """
+        使用多元索引的并行扫描(ComputeSplits + ParallelScan)读取全部满足条件的数据.
+        每个split由一个线程扫描, 结果按到达顺序返回, 不保证顺序.
+
+        :param must_query_list [list]: 需要满足的查询条件列表, 格式同``query``
+        :param must_not_query_list [list]: 不查询的条件列表
+        :param should_query_list [list]: 满足其一的条件列表
+        :param column_to_get [list]: 返回的列, 不指定则返回索引中存储的全部列
+        :param limit [int]: 最多返回多少数量的数据
+        :param parallel [int]: 最大线程数, 默认为split的数量
+        :param plan [QueryPlan]: ``compile_query``生成的查询计划, 指定后忽略查询条件和返回列参数
+        :param row_format [str]: 返回数据的格式, 'dict', 'tuple', 'slots'或'raw'
+        """
+        if plan is None:
+            plan = compile_query(must_query_list, must_not_query_list, should_query_list,
+                                 column_to_get=column_to_get)
+        bool_query = plan.bool_query
+        # 并行扫描只支持返回索引中的列.
+        if plan.column_to_get is None:
+            column = ColumnsToGet(return_type=ColumnReturnType.ALL_FROM_INDEX)
+        else:
+            column = plan.columns_to_get
+        with self._span('compute_splits', table_name):
+            session_id, splits_size = self.otsclient.compute_splits(table_name, index_name)
+        scanners = [self._parallel_scan(table_name, index_name, bool_query, column,
+                                        session_id, parallel_id, splits_size, row_format)
+                    for parallel_id in range(splits_size)]
+        rows = _parallel_iter(scanners, max_workers=min(parallel or splits_size, splits_size))
+
+        yield_data_count = 0
+        try:
+            for d in rows:
+                yield d
+                yield_data_count += 1
+                if (limit is not None) and (yield_data_count >= limit):
+                    return
+        finally:
+            rows.close()
+
+    def _parallel_scan(self, table_name, index_name, query, column, session_id, parallel_id, max_parallel,
+                       row_format='dict'):
+        """
+        扫描单个split的全部数据, 每次请求最多2000条.
+        """
+        decoder = self._page_decoder(table_name)
+        next_token = None
+        while True:
+            scan_query = ScanQuery(query, limit=2000, next_token=next_token,
+                                   current_parallel_id=parallel_id, max_parallel=max_parallel)
+            with self._span('parallel_scan', table_name) as span:
+                rows, next_token = self.otsclient.parallel_scan(
+                        table_name, index_name, scan_query, session_id, columns_to_get=column
+                )
+                span.record(rows=len(rows), nbytes=_page_bytes(rows) if self.metrics is not None else 0)
+            yield from _convert_page(rows, row_format, decoder)
+            if not next_token:
+                break
+
+    def list_index(self, table_name, index_name):
+        """
+        List all search indexes, or indexes under one table.
+        Example usage:
+            index_list = table_cli.list_index('table1', 'filter')
+            print(index_list)
+        """
+        self.otsclient.delete_search_index(table_name, index_name)
+        return self._request_helper('ListSearchIndex', table_name)
+
+    def delete_index(self, table_name, index_name):
+        """
+        Delete the search index.
+        Example usage:
+            table_cli.list_index('table1', 'index1')
+        """
+        self.otsclient.delete_search_index(table_name, index_name)
+        self.refresh_metadata()
+
+    def show_index(self, table_name, index_name='filter', refresh=False):
+        """
+        输出索引信息.
+
+        :param refresh [bool]: 是否忽略缓存, 重新获取索引结构和同步状态.
+        """
+        from prettytable import PrettyTable
+
+        index_meta, sync_stat = self.describe_index(table_name, index_name, refresh=refresh)
+        print ('sync stat: %s, %d' % (str(sync_stat.sync_phase), sync_stat.current_sync_timestamp))
+        print ('index name: %s' % index_name)
+        print ('index fields:')
+        header = ['字段名', '字段类型', '是否索引', '是否数组', '允许排序', '附加存储']
+        table = PrettyTable(header)
+        for field in index_meta.fields:
+            l = []
+            l.append(field.field_name)
+            l.append(str(field.field_type))
+            l.append(field.index)
+            l.append(field.is_array)
+            l.append(field.enable_sort_and_agg)
+            l.append(field.store)
+            table.add_row(l)
+        print(table)
+
+    def create_index(self, table_name, index_name, index_meta):
+        """
+        Create search index.
+        :type table_name: str
+        :param table_name: The name of table.
+        :type index_name: str
+        :param index_name: The name of index.
+        :type index_meta: tablestore.metadata.SearchIndexMeta
+        :param index_meta: The definition of index, includes fields' schema, index setting and index pre-sorting configuration.
+        Example usage:
+            field_a = FieldSchema('k', FieldType.KEYWORD, index=True, enable_sort_and_agg=True, store=True)
+            field_b = FieldSchema('t', FieldType.TEXT, index=True, store=True, analyzer=AnalyzerType.SINGLEWORD)
+            field_c = FieldSchema('g', FieldType.GEOPOINT, index=True, store=True)
+            field_d = FieldSchema('ka', FieldType.KEYWORD, index=True, is_array=True, store=True)
+            nested_field = FieldSchema('n', FieldType.NESTED, sub_field_schemas=
+                [
+                    FieldSchema('nk', FieldType.KEYWORD, index=True, enable_sort_and_agg=True, store=True),
+                    FieldSchema('nt', FieldType.TEXT, index=True, store=True, analyzer=AnalyzerType.SINGLEWORD),
+                    FieldSchema('ng', FieldType.GEOPOINT, index=True, store=True, enable_sort_and_agg=True)
+                ])
+           fields = [field_a, field_b, field_c, field_d, nested_field]
+           index_meta = SearchIndexMeta(fields, index_setting=None, index_sort=None)
+           table_client.create_search_index('table_1', 'index_1', index_meta)
+        """
+        self.otsclient.create_search_index(self, table_name, index_name, index_meta)
+        self.refresh_metadata()
+
+
+    def _construct_row(self, pk_list, data, codec=None):
+        """
+        将数据字典拆分为主键列和属性列, dict和list类型的值使用codec编码.
+        不会复制或修改data, 只构造需要发送的列.
+
+        :param pk_list [list]: primary key name list. e.g. ['pk1', 'pk2']
+        :param data [dict]: 包括主键在内的数据字典.
+        :param codec: 嵌套列的编解码器, 默认为客户端的编解码器.
+        :return: (primary_key, attribute_columns)
+        """
+        primary_key, attribute_columns = encode_columns(data, pk_list, codec or self.codec)
+        # Detect auto increase column.
+        primary_key = [(pk_name, PK_AUTO_INCR if pk_value is None else pk_value)
+                       for pk_name, pk_value in primary_key]
+        return primary_key, attribute_columns
+
+    def _span(self, op, table_name):
+        """
+        开始记录一次请求, 未开启统计和限速时返回空的Span.
+        开启限速时会先等待限速器中有剩余的CU.
+        """
+        limiter = self.rate_limiter
+        if limiter is not None:
+            limiter.acquire(op)
+        elif self.metrics is None:
+            return NULL_SPAN
+        return Span(self.metrics, op, table_name, limiter)
+
+    def _codec(self, table_name):
+        """获取表对应的编解码器"""
+        return self.table_codecs.get(table_name, self.codec)
+
+    def _page_decoder(self, table_name):
+        """获取表的嵌套列解码函数, 没有配置nested_columns时返回None"""
+        columns = self.nested_columns.get(table_name)
+        if not columns:
+            return None
+        return page_decoder(self._codec(table_name), columns)
+
+    def put_row(self, table_name, pk_list, data):
+        """
+        写入数据,写入成功返回消耗cu.
+
+        :param pk_list [list]: primary key name list. e.g. ['pk1', 'pk2']
+        :param data [dict]: 包括主键在内的数据字典.
+        """
+        primary_key, attribute_columns = self._construct_row(pk_list, data, self._codec(table_name))
+        content_hash, attribute_columns, condition = self._dedup_row(table_name, 'put', primary_key, attribute_columns)
+        if attribute_columns is None:
+            return dict(primary_key)
+        self._invalidate_row(table_name, primary_key)
+        # Generate Row object.
+        row = Row(primary_key, attribute_columns)
+
+        # 表示只有此行不存在时，才会插入数据，否则不执行(报错)
+        #condition = Condition(RowExistenceExpectation.EXPECT_NOT_EXIST)
+        # 表示不管此行是否已经存在，都会插入新数据，如果之前有会被覆盖。
+        # condition = Condition(RowExistenceExpectation.IGNORE)
+
+        # 插入数据
+        try:
+            #cu, _ = self.otsclient.put_row(table_name, row, condition)
+            with self._span('put_row', table_name) as span:
+                try:
+                    cu, return_row = self.otsclient.put_row(table_name, row, condition,
+                                                            return_type=ReturnType.RT_PK)
+                finally:
+                    # 请求期间并发的get_rows可能缓存了旧数据, 请求结束后再次失效.
+                    self._invalidate_row(table_name, primary_key)
+                span.record(rows=1, consumed=cu)
+            self._remember_hash(content_hash)
+            pk_row = return_row.primary_key
+            pk_dict = {k:v for k,v in pk_row}
+            return pk_dict
+        except OTSServiceError as e:
+            if self._is_unchanged(content_hash, e.code):
+                return dict(primary_key)
+            logger.error(e)
+        except Exception as e:
+            logger.error(e)
+            #pass
+
+    def update_row(self, table_name, pk_list, data):
+        """
+        Update row
+
+        :param pk_list [list]: primary key name list. e.g. ['pk1', 'pk2']
+        :param data [dict]: 包括主键在内的数据字典.
+        """
+        primary_key, attribute_columns = self._construct_row(pk_list, data, self._codec(table_name))
+        content_hash, attribute_columns, condition = self._dedup_row(table_name, 'update', primary_key,
+                                                                     attribute_columns)
+        if attribute_columns is None:
+            return dict(primary_key)
+        self._invalidate_row(table_name, primary_key)
+        # Generate Row object.
+        row = Row(primary_key, {'PUT':attribute_columns})
+
+        try:
+            with self._span('update_row', table_name) as span:
+                try:
+                    consumed, return_row = self.otsclient.update_row(table_name, row, condition,
+                                                                     return_type=ReturnType.RT_PK)
+                finally:
+                    # 请求期间并发的get_rows可能缓存了旧数据, 请求结束后再次失效.
+                    self._invalidate_row(table_name, primary_key)
+                span.record(rows=1, consumed=consumed)
+            self._remember_hash(content_hash)
+            #return consumed.write, return_row
+            pk_row = return_row.primary_key
+            pk_dict = {k:v for k,v in pk_row}
+            return pk_dict
+        # 客户端异常，一般为参数错误或者网络异常。
+        except OTSClientError as e:
+            logger.error(f'Client error, {e}')
+        # 服务端异常，一般为参数错误或者流控错误。
+        except OTSServiceError as e:
+            if self._is_unchanged(content_hash, e.code):
+                return dict(primary_key)
+            logger.error(f'Server error, {e}')
+
+    def put_rows(self, table_name, pk_list, data_list, max_retry=3):
+        """
+        批量写入数据, 使用BatchWriteRow, 自动按照200行/4MB拆分批次.
+        批次中写入失败的行会单独重试, 成功的行不会重复写入.
+
+        :param pk_list [list]: primary key name list. e.g. ['pk1', 'pk2']
+        :param data_list [iterable]: 包括主键在内的数据字典的可迭代对象.
+        :param max_retry [int]: 失败行的最大重试次数.
+        :return: 与输入顺序一致的主键字典列表, 最终写入失败的行为None.
+        """
+        def rows():
+            for data in data_list:
+                primary_key, attribute_columns = self._construct_row(pk_list, data, self._codec(table_name))
+                content_hash, attribute_columns, condition = self._dedup_row(table_name, 'put', primary_key,
+                                                                             attribute_columns)
+                if attribute_columns is None:
+                    yield dict(primary_key), None, None
+                    continue
+                row = Row(primary_key, attribute_columns)
+                yield None, PutRowItem(row, condition, return_type=ReturnType.RT_PK), content_hash
+
+        return self._write_rows(table_name, rows(), max_retry)
+
+    def update_rows(self, table_name, pk_list, data_list, max_retry=3):
+        """
+        批量更新数据, 使用BatchWriteRow, 自动按照200行/4MB拆分批次.
+        批次中更新失败的行会单独重试, 成功的行不会重复写入.
+
+        :param pk_list [list]: primary key name list. e.g. ['pk1', 'pk2']
+        :param data_list [iterable]: 包括主键在内的数据字典的可迭代对象.
+        :param max_retry [int]: 失败行的最大重试次数.
+        :return: 与输入顺序一致的主键字典列表, 最终更新失败的行为None.
+        """
+        def rows():
+            for data in data_list:
+                primary_key, attribute_columns = self._construct_row(pk_list, data, self._codec(table_name))
+                content_hash, attribute_columns, condition = self._dedup_row(table_name, 'update', primary_key,
+                                                                             attribute_columns)
+                if attribute_columns is None:
+                    yield dict(primary_key), None, None
+                    continue
+                row = Row(primary_key, {'PUT':attribute_columns})
+                yield None, UpdateRowItem(row, condition, return_type=ReturnType.RT_PK), content_hash
+
+        return self._write_rows(table_name, rows(), max_retry)
+
+    def _write_rows(self, table_name, rows, max_retry):
+        """
+        批量写入, rows为(结果, row_item, 哈希)的可迭代对象, row_item为None的行跳过写入, 直接使用其结果.
+        按需读取rows, 每凑满一批就写入, 内存中只保留一个批次的行. 记录写入成功的行的哈希.
+        :return: 与rows顺序一致的结果列表.
+        """
+        results = []
+        # 已读取但还没有写入完成的行在results中的下标和哈希.
+        written = deque()
+
+        def row_items():
+            for result, row_item, content_hash in rows:
+                results.append(result)
+                if row_item is not None:
+                    written.append((len(results) - 1, content_hash))
+                    yield row_item
+
+        for pk_dict_list in self._iter_batch_write(table_name, row_items(), max_retry):
+            for pk_dict in pk_dict_list:
+                ind, content_hash = written.popleft()
+                results[ind] = pk_dict
+                if pk_dict is not None:
+                    self._remember_hash(content_hash)
+        return results
+
+    def _dedup_row(self, table_name, op, primary_key, attribute_columns):
+        """
+        skip_unchanged的处理, 返回(哈希, attribute_columns, condition), 没有开启或者主键自增时哈希为None.
+        本地保存的哈希与新的哈希相同时attribute_columns为None, 表示跳过写入.
+        配置了哈希列时在属性列中加入哈希列, 并且只在服务端的哈希列与新的哈希不同(或者不存在)时写入.
+        """
+        condition = Condition(RowExistenceExpectation.IGNORE)
+        if table_name not in self.skip_unchanged or any(value is PK_AUTO_INCR for _, value in primary_key):
+            return None, attribute_columns, condition
+        hash_column = self.skip_unchanged[table_name]
+        columns = sorted(column for column in attribute_columns if column[0] != hash_column)
+        content_hash = ((table_name, tuple(primary_key)), _get_md5((op, columns)))
+        if self.hash_store.get(content_hash[0]) == content_hash[1]:
+            self._count_unchanged()
+            return content_hash, None, condition
+        if hash_column is not None:
+            columns.append((hash_column, content_hash[1]))
+            condition = Condition(RowExistenceExpectation.IGNORE, SingleColumnCondition(
+                hash_column, content_hash[1], ComparatorType.NOT_EQUAL, pass_if_missing=True))
+        return content_hash, columns, condition
+
+    def _count_unchanged(self):
+        """记录一行因内容没有变化而跳过的写入"""
+        with self._unchanged_lock:
+            self.unchanged_rows += 1
+
+    def _remember_hash(self, content_hash):
+        """记录写入成功的行的哈希"""
+        if content_hash is not None:
+            self.hash_store.set(*content_hash)
+
+    def _is_unchanged(self, content_hash, error_code):
+        """哈希列的条件检查失败, 说明服务端的内容没有变化"""
+        if content_hash is None or error_code != 'OTSConditionCheckFail':
+            return False
+        self._count_unchanged()
+        self._remember_hash(content_hash)
+        return True
+
+    def buffered_writer(self, table_name, pk_list, max_rows=200, flush_interval=1.0, max_buffer=10000,
+                        on_error=None, max_retry=3):
+        """
+        获取延迟批量写入的``BufferedWriter``, 同一主键的多次写入会被合并, 后台线程批量写入.
+        退出with语句或者调用close时写入剩余的数据.
+
+        e.g.
+            with table_cli.buffered_writer('table_name', ['pk1'], flush_interval=0.5) as writer:
+                writer.update_row({'pk1': 'counter', 'count': 1})
+
+        :param pk_list [list]: primary key name list. e.g. ['pk1', 'pk2']
+        :param max_rows [int]: 缓存的行数达到max_rows时立即写入.
+        :param flush_interval [float]: 最长的写入间隔, 单位为秒.
+        :param max_buffer [int]: 缓存的最大行数, 缓存满时写入操作会阻塞.
+        :param on_error [callable]: 写入失败时的回调函数, 参数为(op, data, error).
+        :param max_retry [int]: 失败行的最大重试次数.
+        """
+        return BufferedWriter(self, table_name, pk_list, max_rows=max_rows, flush_interval=flush_interval,
+                              max_buffer=max_buffer, on_error=on_error, max_retry=max_retry)
+
+    def local_mirror(self, table_name, path, pk_list, updated_column=None, overlap=0, columns_to_get=None,
+                     page_size=None):
+        """
+        获取表的本地镜像``LocalMirror``, 数据保存在本地的SQLite文件中, 通过``refresh``增量同步.
+
+        e.g.
+            mirror = table_cli.local_mirror('city', 'city.db', ['city_id'], updated_column='updated_at')
+            mirror.refresh()
+            city = mirror.get(1001)
+
+        :param path [str]: SQLite文件路径, 已存在时继续使用其中的数据.
+        :param pk_list [list]: primary key name list. e.g. ['pk1', 'pk2']
+        :param updated_column [str]: 行的更新时间(或版本号)列, 不指定则按数据版本增量同步.
+        :param overlap: 增量同步时向前多读取的范围, 单位与updated_column相同, 不指定updated_column时为毫秒.
+        :param columns_to_get [list]: 只保存这些属性列, 不指定则保存全部列.
+        :param page_size: 每页的行数, 见``query_all``.
+        """
+        return LocalMirror(self, table_name, path, pk_list, updated_column=updated_column, overlap=overlap,
+                           columns_to_get=columns_to_get, page_size=page_size)
+
+    def _batch_write_row(self, table_name, row_items, max_retry, errors=None):
+        """
+        将行操作按照服务端限制分批, 逐批写入.
+        指定errors字典时, 最终写入失败的行在row_items中的下标和错误信息会写入errors.
+        :return: 与row_items顺序一致的主键字典列表, 写入失败的行为None.
+        """
+        return [pk_dict for pk_dict_list in self._iter_batch_write(table_name, row_items, max_retry, errors)
+                for pk_dict in pk_dict_list]
+
+    def _iter_batch_write(self, table_name, row_items, max_retry, errors=None):
+        """
+        按需读取row_items(可迭代对象), 按照服务端限制分批写入, 每写完一批返回该批的主键字典列表.
+        同一批次中不能有重复的主键, 遇到重复的主键时先写入当前批次, 保证按顺序生效.
+        """
+        offset = 0
+        batch = []
+        batch_size = 0
+        batch_keys = set()
+        for row_item in row_items:
+            self._invalidate_row(table_name, row_item.row.primary_key)
+            row_size = _estimate_row_size(row_item.row)
+            key = _batch_key(row_item.row.primary_key)
+            if batch and (len(batch) >= BATCH_WRITE_MAX_ROWS
+                          or batch_size + row_size > BATCH_WRITE_MAX_BYTES
+                          or key in batch_keys):
+                yield self._write_batch(table_name, batch, max_retry, errors, offset)
+                offset += len(batch)
+                batch = []
+                batch_size = 0
+                batch_keys = set()
+            batch.append(row_item)
+            batch_size += row_size
+            if key is not None:
+                batch_keys.add(key)
+        if batch:
+            yield self._write_batch(table_name, batch, max_retry, errors, offset)
+
+    def _write_batch(self, table_name, batch, max_retry, errors=None, offset=0):
+        """
+        写入单个批次, 只重试因为限流等可以重试的错误而失败的行, 参数错误等不会重试.
+        :param errors [dict]: 记录最终写入失败的行的下标(加上offset)和错误信息.
+        :return: 与batch顺序一致的主键字典列表, 写入失败的行为None.
+        """
+        pk_dict_list = [None] * len(batch)
+        # 尚未写入成功的行在batch中的下标.
+        pending = list(range(len(batch)))
+        # 不能重试的失败行在batch中的下标.
+        given_up = []
+        # 每行最近一次的错误信息.
+        row_errors = {}
+        for retry_times in range(max_retry + 1):
+            if retry_times:
+                time.sleep(min(0.1 * 2 ** retry_times, 3))
+            request = BatchWriteRowRequest()
+            request.add(TableInBatchWriteRowItem(table_name, [batch[i] for i in pending]))
+            try:
+                with self._span('batch_write_row', table_name) as span:
+                    span.record(retries=1 if retry_times else 0)
+                    response = self.otsclient.batch_write_row(request)
+                    result_items = (response.table_of_put.get(table_name, [])
+                                    + response.table_of_update.get(table_name, []))
+                    failed = []
+                    error = None
+                    for result_item in result_items:
+                        ind = pending[result_item.index]
+                        if result_item.is_ok:
+                            pk_row = result_item.row.primary_key or batch[ind].row.primary_key
+                            pk_dict_list[ind] = {k:v for k,v in pk_row}
+                        elif result_item.error_code == 'OTSConditionCheckFail':
+                            # 只有skip_unchanged的哈希条件会检查失败, 表示内容没有变化.
+                            pk_dict_list[ind] = {k:v for k,v in batch[ind].row.primary_key}
+                            self._count_unchanged()
+                        else:
+                            error = f'{result_item.error_code}: {result_item.error_message}'
+                            row_errors[ind] = error
+                            if _is_retryable(result_item.error_code):
+                                failed.append(ind)
+                            else:
+                                given_up.append(ind)
+                            span.record_error(result_item.error_code)
+                    span.record(rows=len(result_items) - len(failed),
+                                consumed=[result_item.consumed for result_item in result_items])
+            # 整个请求失败, 可以重试时所有行都需要重试.
+            # 客户端异常一般为参数错误, 只有网关返回5xx(没有错误码)时重试.
+            except OTSClientError as e:
+                logger.error(f'Client error, {e}')
+                row_errors.update(dict.fromkeys(pending, f'Client error, {e}'))
+                if _is_retryable(None, e.http_status):
+                    continue
+                given_up.extend(pending)
+                pending = []
+                break
+            except OTSServiceError as e:
+                logger.error(f'Server error, {e}')
+                row_errors.update(dict.fromkeys(pending, f'Server error, {e}'))
+                if _is_retryable(e.code, e.http_status):
+                    continue
+                given_up.extend(pending)
+                pending = []
+                break
+            pending = sorted(failed)
+            if not pending:
+                break
+            logger.warning(f'Batch write error, {len(pending)} rows failed, {error}')
+        # 写入期间并发的get_rows可能缓存了旧数据, 写入结束后再次失效.
+        for row_item in batch:
+            self._invalidate_row(table_name, row_item.row.primary_key)
+        if pending:
+            logger.error(f'{len(pending)} rows failed to write after {max_retry} retries.')
+        if given_up:
+            logger.error(f'{len(given_up)} rows failed to write with non-retryable errors.')
+        if errors is not None:
+            for ind in pending + given_up:
+                errors[offset + ind] = row_errors.get(ind)
+        return pk_dict_list
+
+    def get_rows(self, table_name, pk_dict_list, columns=None, parallel=4):
+        """
+        根据主键批量读取数据, 使用BatchGetRow, 每批最多100个主键, 多个批次并发请求.
+        开启读缓存(row_cache_size)时, 优先从缓存中读取.
+
+        :param pk_dict_list [list]: 主键字典列表. e.g. [{'pk1': 1, 'pk2': 'a'}, ...]
+        :param columns [list]: 需要返回的属性列, 不指定则返回全部列.
+        :param parallel [int]: 并发请求的批次数.
+        :return: 与输入顺序一致的数据字典列表, 行不存在或读取失败时为None.
+        """
+        results = [None] * len(pk_dict_list)
+        # 需要请求服务端的行在pk_dict_list中的下标.
+        missing = []
+        for ind, pk_dict in enumerate(pk_dict_list):
+            cached = self._get_cached_row(table_name, pk_dict, columns)
+            if cached is None:
+                missing.append(ind)
+            else:
+                results[ind] = cached
+
+        chunks = [missing[i:i + BATCH_GET_MAX_ROWS] for i in range(0, len(missing), BATCH_GET_MAX_ROWS)]
+        if len(chunks) > 1 and parallel > 1:
+            with ThreadPoolExecutor(max_workers=min(parallel, len(chunks))) as executor:
+                chunk_results = list(executor.map(
+                        lambda chunk: self._get_batch(table_name, [pk_dict_list[i] for i in chunk], columns),
+                        chunks))
+        else:
+            chunk_results = [self._get_batch(table_name, [pk_dict_list[i] for i in chunk], columns)
+                             for chunk in chunks]
+        for chunk, rows in zip(chunks, chunk_results):
+            for ind, d in zip(chunk, rows):
+                results[ind] = d
+                # 只缓存完整的行.
+                if d is not None and columns is None and self.row_cache is not None:
+                    self.row_cache.set(_row_cache_key(table_name, pk_dict_list[ind].items()), dict(d))
+        return results
+
+    def _get_batch(self, table_name, pk_dict_batch, columns):
+        """
+        读取单个批次.
+        :return: 与pk_dict_batch顺序一致的数据字典列表, 行不存在或读取失败时为None.
+        """
+        primary_keys = [list(pk_dict.items()) for pk_dict in pk_dict_batch]
+        decoder = self._page_decoder(table_name)
+        request = BatchGetRowRequest()
+        request.add(TableInBatchGetRowItem(table_name, primary_keys, columns, max_version=1))
+        try:
+            with self._span('batch_get_row', table_name) as span:
+                response = self.otsclient.batch_get_row(request)
+                result_items = response.get_result_by_table(table_name)
+                span.record(rows=sum(1 for item in result_items if item.is_ok and item.row is not None),
+                            consumed=[item.consumed for item in result_items])
+                for item in result_items:
+                    if not item.is_ok:
+                        span.record_error(item.error_code)
+        # 客户端异常，一般为参数错误或者网络异常。
+        except OTSClientError as e:
+            logger.error(f'Client error, {e}')
+            return [None] * len(pk_dict_batch)
+        # 服务端异常，一般为参数错误或者流控错误。
+        except OTSServiceError as e:
+            logger.error(f'Server error, {e}')
+            return [None] * len(pk_dict_batch)
+        rows = []
+        for item in result_items:
+            if not item.is_ok:
+                logger.error(f'Batch get error, {item.error_code}: {item.error_message}')
+                rows.append(None)
+            elif item.row is None:
+                rows.append(None)
+            else:
+                row = (item.row.primary_key, item.row.attribute_columns)
+                if decoder is not None:
+                    row = decoder([row])[0]
+                rows.append(item2dict(row))
+        return rows
+
+    def _get_cached_row(self, table_name, pk_dict, columns):
+        """
+        从读缓存中获取数据, 指定columns时只返回对应的列.
+        返回缓存的副本, 调用方修改返回的字典不影响缓存.
+        """
+        if self.row_cache is None:
+            return None
+        d = self.row_cache.get(_row_cache_key(table_name, pk_dict.items()))
+        if d is None:
+            return None
+        if columns is None:
+            return dict(d)
+        return {k: v for k, v in d.items() if k in columns or k in pk_dict}
+
+    def _invalidate_row(self, table_name, primary_key):
+        """写入数据时使对应主键的读缓存失效."""
+        if self.row_cache is not None:
+            self.row_cache.delete(_row_cache_key(table_name, primary_key))
+
+    def get_table_list(self, refresh=False):
+        """
+        Get table name list.
+        :param refresh [bool]: 是否忽略缓存, 重新请求服务端.
+        :return: tuple of table name
+        """
+        return self._cached_metadata(('list_table',), self.otsclient.list_table, refresh)
+
+    @property
+    def table_list(self):
+        """全部的数据表, 第一次访问时才请求服务端"""
+        return list(self.get_table_list())
+
+    def describe_table(self, table_name, refresh=False):
+        """
+        获取表的结构和配置, 结果会缓存``metadata_ttl``秒.
+
+        :param table_name [str]: 表名.
+        :param refresh [bool]: 是否忽略缓存, 重新请求服务端.
+        :return: tablestore.metadata.DescribeTableResponse
+        """
+        return self._cached_metadata(('describe_table', table_name),
+                                     lambda: self.otsclient.describe_table(table_name), refresh)
+
+    def describe_index(self, table_name, index_name='filter', refresh=False):
+        """
+        获取多元索引的结构和同步状态, 结果会缓存``metadata_ttl``秒.
+
+        :param table_name [str]: 表名.
+        :param index_name [str]: 索引名.
+        :param refresh [bool]: 是否忽略缓存, 重新请求服务端.
+        :return: (index_meta, sync_stat)
+        """
+        return self._cached_metadata(('describe_index', table_name, index_name),
+                                     lambda: self.otsclient.describe_search_index(table_name, index_name), refresh)
+
+    def refresh_metadata(self):
+        """清空表列表、表结构和索引结构的缓存, 下次使用时重新请求服务端"""
+        self.metadata_cache.clear()
+
+    def _cached_metadata(self, key, fetch, refresh=False):
+        if not refresh:
+            value = self.metadata_cache.get(key)
+            if value is not None:
+                return value
+        value = fetch()
+        self.metadata_cache.set(key, value)
+        return value
+
+
+class Test():
+    def test_put_row(self):
+        table_cli = TableClient(instance_name='nm-sea')
+        d = {'medium_id': 2222222, 'id':None, 'content':'test article '}
+        l = table_cli.put_row('all_news', ['medium_id', 'id'], d)
+        print(l)
+
+    def test_query(self):
+        table_cli = TableClient(instance_name='nm-sea')
+        must_query = [
+            ('term', 'medium_id', 2222222),
+        ]
+        a = table_cli.query(table_name='all_news',
+                            must_query_list=must_query, 
+                            get_total_count=False, 
+                            index_name='test',)
+        for i in a:
+            return i.get('id')
+
+
+    def test_update_row(self):
+        table_cli = TableClient(instance_name='nm-sea')
+        _id = self.test_query()
+        d = {'medium_id': 2222222, 'id':_id, 'content':'222222 article '}
+        l = table_cli.update_row('all_news', ['medium_id', 'id'], d)
+        print(l)
+
+    def test_delete_index(self):
+        table_cli = TableClient(instance_name='nm-sea')
+        table_cli.otsclient.delete_search_index('all_news', 'test')
+
+
+
+
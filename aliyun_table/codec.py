@@ -0,0 +1,188 @@
+"""
+嵌套列(dict/list)的编解码.
+
+写入时dict和list类型的值会经过编码器转换为字符串或二进制后再写入, 读取时按``nested_columns``配置的列解码:
+    'json':    标准库json, 保存为字符串(默认, 与之前的版本兼容).
+    'orjson':  orjson, 保存为字符串, 与'json'写入的数据互相兼容, 需要安装orjson.
+    'msgpack': msgpack, 保存为二进制列, 体积更小, 需要安装msgpack. 读取时字符串仍按json解码, 方便从json迁移.
+解码失败(例如列中保存的是普通字符串)时原样返回.
+"""
+
+import json
+import time
+
+from aliyun_table.records import _split_row
+
+
+def _decode_json(value):
+    try:
+        return json.loads(value)
+    except ValueError:
+        return value
+
+
+class JsonCodec(object):
+    """标准库json编解码器"""
+    name = 'json'
+
+    def encode(self, value):
+        return json.dumps(value)
+
+    def decode(self, value):
+        return _decode_json(value)
+
+
+class OrjsonCodec(object):
+    """orjson编解码器, 编码为字符串"""
+    name = 'orjson'
+
+    def __init__(self):
+        try:
+            import orjson
+        except ImportError:
+            raise ImportError('orjson is required for the orjson codec, run `pip install orjson`.')
+        self._orjson = orjson
+
+    def __reduce__(self):
+        # 模块不能pickle, 在子进程中重新创建.
+        return (OrjsonCodec, ())
+
+    def encode(self, value):
+        return self._orjson.dumps(value).decode('utf-8')
+
+    def decode(self, value):
+        try:
+            return self._orjson.loads(value)
+        except ValueError:
+            return value
+
+
+class MsgpackCodec(object):
+    """msgpack编解码器, 编码为二进制"""
+    name = 'msgpack'
+
+    def __init__(self):
+        try:
+            import msgpack
+        except ImportError:
+            raise ImportError('msgpack is required for the msgpack codec, run `pip install msgpack`.')
+        self._msgpack = msgpack
+
+    def __reduce__(self):
+        return (MsgpackCodec, ())
+
+    def encode(self, value):
+        return bytearray(self._msgpack.packb(value, use_bin_type=True))
+
+    def decode(self, value):
+        if isinstance(value, str):
+            return _decode_json(value)
+        try:
+            return self._msgpack.unpackb(bytes(value), raw=False)
+        except Exception:
+            return value
+
+
+CODECS = {
+    'json': JsonCodec,
+    'orjson': OrjsonCodec,
+    'msgpack': MsgpackCodec,
+}
+
+
+def get_codec(codec):
+    """
+    根据名称获取编解码器.
+
+    :param codec [str]: 'json', 'orjson'或'msgpack', 也可以直接传入实现了encode/decode方法的对象.
+    """
+    if not isinstance(codec, str):
+        return codec
+    if codec not in CODECS:
+        raise ValueError(f'codec should be one of {tuple(CODECS)}, not {codec!r}')
+    return CODECS[codec]()
+
+
+def encode_columns(data, pk_list, codec):
+    """
+    把数据字典拆分为主键列和属性列, dict和list类型的值使用codec编码.
+    不会修改data, 也不复制其它的值.
+
+    :return: (primary_key, attribute_columns), 主键为None表示自增列, 由调用方处理.
+    """
+    primary_key = [(pk_name, data[pk_name]) for pk_name in pk_list]
+    encode = codec.encode
+    attribute_columns = []
+    for key, value in data.items():
+        if key in pk_list:
+            continue
+        if isinstance(value, (dict, list)):
+            value = encode(value)
+        attribute_columns.append((key, value))
+    return primary_key, attribute_columns
+
+
+class PageDecoder(object):
+    """
+    解码一页数据, 结果为(主键列, 属性列)元组的列表, 只解码columns中的列.
+    可以pickle, 因此也可以在子进程中使用, 见``TableClient.map_rows``.
+    """
+
+    def __init__(self, codec, columns):
+        self.codec = codec
+        self.columns = frozenset(columns)
+
+    def __call__(self, rows):
+        columns = self.columns
+        decode = self.codec.decode
+        page = []
+        for row in rows:
+            pkvs, ckvs = _split_row(row)
+            page.append((pkvs, [(c[0], decode(c[1]), c[2])
+                                if c[0] in columns and isinstance(c[1], (str, bytes, bytearray)) else c
+                                for c in ckvs]))
+        return page
+
+
+def page_decoder(codec, columns):
+    """
+    返回解码一页数据的函数(``PageDecoder``), 结果为(主键列, 属性列)元组的列表, 只解码columns中的列.
+    """
+    return PageDecoder(codec, columns)
+
+
+def benchmark(data, codecs=('json', 'orjson', 'msgpack'), number=10000):
+    """
+    测试各编解码器处理单行数据的耗时.
+
+    e.g.
+        from aliyun_table.codec import benchmark
+        print(benchmark({'id': 1, 'payload': {'tags': ['a'] * 50, 'scores': list(range(100))}}))
+
+    :param data [dict]: 一行数据.
+    :param codecs [tuple]: 需要测试的编解码器, 没有安装的会被跳过.
+    :param number [int]: 重复次数.
+    :return: 编解码器名称到(编码耗时, 解码耗时)的字典, 单位为微秒/行.
+    """
+    results = {}
+    for name in codecs:
+        try:
+            codec = get_codec(name)
+        except ImportError:
+            continue
+        _, attribute_columns = encode_columns(data, [], codec)
+        columns = [key for key, value in data.items() if isinstance(value, (dict, list))]
+        row = ([], [(key, value, 0) for key, value in attribute_columns])
+        decode_page = page_decoder(codec, columns)
+
+        start = time.perf_counter()
+        for _ in range(number):
+            encode_columns(data, [], codec)
+        encode_cost = (time.perf_counter() - start) / number * 1e6
+        start = time.perf_counter()
+        for _ in range(number):
+            decode_page([row])
+        decode_cost = (time.perf_counter() - start) / number * 1e6
+        results[name] = (encode_cost, decode_cost)
+    return results
+
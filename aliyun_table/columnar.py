@@ -0,0 +1,94 @@
+"""
+按列组织的批量数据, 用于向量化计算.
+
+需要安装numpy, 返回DataFrame时需要安装pandas.
+"""
+
+from aliyun_table.records import page_fields
+
+
+def _require_numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError('numpy is required for columnar batches, run `pip install numpy`.')
+    return numpy
+
+
+def _infer_array(np, values):
+    """
+    根据列中的数据推断类型并构造数组.
+    整数列有缺失值时转为float64并用nan填充; 字符串和混合类型使用object数组.
+    """
+    kinds = {type(v) for v in values if v is not None}
+    has_missing = len(kinds) == 0 or any(v is None for v in values)
+    if kinds == {bool} and not has_missing:
+        return np.array(values, dtype=bool)
+    if kinds == {int} and not has_missing:
+        try:
+            return np.array(values, dtype=np.int64)
+        except OverflowError:
+            return np.array(values, dtype=object)
+    if kinds and kinds <= {int, float}:
+        return np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+    return np.array(values, dtype=object)
+
+
+def _declared_array(np, name, values, dtype, fill_value):
+    """使用指定的类型构造数组, 缺失值使用fill_value填充, 浮点数默认填充nan"""
+    dtype = np.dtype(dtype)
+    if fill_value is None:
+        if dtype.kind == 'f':
+            fill_value = np.nan
+        elif dtype.kind != 'O' and any(v is None for v in values):
+            raise ValueError(f'Column {name} has missing values, set fill_values for dtype {dtype}.')
+    if fill_value is not None:
+        values = [fill_value if v is None else v for v in values]
+    return np.array(values, dtype=dtype)
+
+
+def rows_to_columns(rows, columns=None, dtypes=None, fill_values=None):
+    """
+    将tablestore返回的行转换为按列组织的numpy数组.
+
+    :param rows [list]: (主键列, 属性列)元组的列表.
+    :param columns [list]: 需要的列, 不存在的列全部为缺失值; 不指定则为本批数据中出现的全部列.
+    :param dtypes [dict]: 列名到numpy类型的映射, 未指定的列自动推断类型.
+    :param fill_values [dict]: 列名到缺失值填充值的映射.
+    :return: 列名到numpy数组的字典, 保持列的顺序.
+    """
+    np = _require_numpy()
+    dtypes = dtypes or {}
+    fill_values = fill_values or {}
+    fields = tuple(columns) if columns is not None else page_fields(rows)
+    index = {name: i for i, name in enumerate(fields)}
+    row_count = len(rows)
+    data = [[None] * row_count for _ in fields]
+    for r, (pkvs, ckvs) in enumerate(rows):
+        for pk, pv in pkvs:
+            j = index.get(pk)
+            if j is not None:
+                data[j][r] = pv
+        for ck, cv, _ in ckvs:
+            j = index.get(ck)
+            if j is not None:
+                data[j][r] = cv
+
+    arrays = {}
+    for name, values in zip(fields, data):
+        if name in dtypes:
+            arrays[name] = _declared_array(np, name, values, dtypes[name], fill_values.get(name))
+        elif name in fill_values:
+            arrays[name] = _infer_array(np, [fill_values[name] if v is None else v for v in values])
+        else:
+            arrays[name] = _infer_array(np, values)
+    return arrays
+
+
+def columns_to_dataframe(arrays):
+    """将列数组转换为pandas.DataFrame"""
+    try:
+        import pandas
+    except ImportError:
+        raise ImportError('pandas is required for DataFrame batches, run `pip install pandas`.')
+    return pandas.DataFrame(arrays, columns=list(arrays))
@@ -0,0 +1,276 @@
+"""
+把表中的数据按块导出为JSONL、CSV或Parquet文件, 支持断点续传.
+
+导出时每次把chunk_size行数据写入文件, 写入并fsync后再把扫描位置(范围扫描的下一个起始主键,
+或者多元索引查询的next_token)、文件偏移量和行数原子地写入checkpoint文件.
+重新运行时从checkpoint记录的位置继续扫描, 并把文件截断到记录的偏移量, 不会重复或丢失数据.
+内存中最多只保存一个块的数据.
+"""
+
+import base64
+import csv
+import gzip
+import io
+import json
+import os
+import tempfile
+
+from tablestore import INF_MAX, INF_MIN
+
+from aliyun_table.my_logger import logger
+
+
+EXPORT_FORMATS = ('jsonl', 'csv', 'parquet')
+
+
+def _json_default(obj):
+    """json无法序列化的值, bytes使用base64编码, 其它转换为字符串"""
+    if isinstance(obj, (bytes, bytearray)):
+        return base64.b64encode(bytes(obj)).decode('ascii')
+    return str(obj)
+
+
+def _encode_value(value):
+    """把主键值编码为可以写入json的形式, 保留类型"""
+    if value is INF_MIN or value is INF_MAX:
+        return {'inf': 'min' if value is INF_MIN else 'max'}
+    if isinstance(value, (bytes, bytearray)):
+        return {'bytes': base64.b64encode(bytes(value)).decode('ascii')}
+    return {'value': value}
+
+
+def _decode_value(data):
+    if 'inf' in data:
+        return INF_MIN if data['inf'] == 'min' else INF_MAX
+    if 'bytes' in data:
+        return bytearray(base64.b64decode(data['bytes']))
+    return data['value']
+
+
+def encode_cursor(cursor):
+    """
+    编码扫描位置.
+    范围扫描的位置是主键列表[(name, value), ...], 多元索引查询的位置是next_token(bytes).
+    """
+    if cursor is None:
+        return None
+    if isinstance(cursor, (bytes, bytearray)):
+        return {'token': base64.b64encode(bytes(cursor)).decode('ascii')}
+    return {'primary_key': [[name, _encode_value(value)] for name, value in cursor]}
+
+
+def decode_cursor(data):
+    """解码``encode_cursor``编码的扫描位置"""
+    if data is None:
+        return None
+    if 'token' in data:
+        return base64.b64decode(data['token'])
+    return [(name, _decode_value(value)) for name, value in data['primary_key']]
+
+
+def load_checkpoint(checkpoint):
+    """读取checkpoint文件, 文件不存在时返回None"""
+    try:
+        with open(checkpoint, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def save_checkpoint(checkpoint, state):
+    """原子地写入checkpoint文件: 先写入临时文件, fsync后替换原文件"""
+    dir_name = os.path.dirname(os.path.abspath(checkpoint))
+    fd, tmp_path = tempfile.mkstemp(dir=dir_name, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, checkpoint)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class _FileWriter(object):
+    """按块追加写入单个文件, 每块写入后fsync, 断点续传时截断到已确认的偏移量."""
+
+    def __init__(self, path, state, compression):
+        self.path = path
+        self.state = state
+        self.compression = compression
+        mode = 'r+b' if os.path.exists(path) and state['offset'] else 'wb'
+        self.f = open(path, mode)
+        self.f.truncate(state['offset'])
+        self.f.seek(state['offset'])
+
+    def write(self, rows):
+        data = self.encode(rows)
+        if self.compression == 'gzip':
+            # 每块作为一个独立的gzip member, 拼接后仍然是合法的gzip文件.
+            data = gzip.compress(data)
+        self.f.write(data)
+        self.f.flush()
+        os.fsync(self.f.fileno())
+        self.state['offset'] = self.f.tell()
+
+    def close(self):
+        self.f.close()
+
+
+class _JsonlWriter(_FileWriter):
+    def encode(self, rows):
+        columns = self.state['columns']
+        lines = []
+        for row in rows:
+            if columns is not None:
+                row = {c: row.get(c) for c in columns}
+            lines.append(json.dumps(row, ensure_ascii=False, default=_json_default))
+            lines.append('\n')
+        return ''.join(lines).encode('utf-8')
+
+
+class _CsvWriter(_FileWriter):
+    def encode(self, rows):
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        columns = self.state['columns']
+        if columns is None:
+            # 未指定列时使用第一块数据中出现的全部列作为表头, 后续块中新出现的列会被忽略.
+            fields = {}
+            for row in rows:
+                fields.update(dict.fromkeys(row))
+            columns = self.state['columns'] = list(fields)
+            writer.writerow(columns)
+        elif self.state['chunks'] == 0:
+            writer.writerow(columns)
+        for row in rows:
+            if not self.state.get('warned') and any(k not in columns for k in row):
+                logger.warning(f'Columns not in csv header are ignored: {[k for k in row if k not in columns]}')
+                self.state['warned'] = True
+            writer.writerow([_csv_value(row.get(c)) for c in columns])
+        return buf.getvalue().encode('utf-8')
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, (bytes, bytearray)):
+        return _json_default(value)
+    return value
+
+
+class _ParquetWriter(object):
+    """
+    写入Parquet文件, path为目录, 每块保存为一个part-NNNNN.parquet文件.
+    需要安装pyarrow.
+    """
+
+    def __init__(self, path, state, compression):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ImportError('pyarrow is required for parquet export, run `pip install pyarrow`.')
+        self.pa = pyarrow
+        self.pq = pyarrow.parquet
+        self.path = path
+        self.state = state
+        self.compression = compression or 'snappy'
+        os.makedirs(path, exist_ok=True)
+        # 删除上次中断时写入但未记录到checkpoint的文件.
+        for entry in os.scandir(path):
+            if entry.name.startswith('part-') and entry.name.endswith('.parquet'):
+                if int(entry.name[5:-8]) >= state['chunks']:
+                    os.remove(entry.path)
+
+    def write(self, rows):
+        columns = self.state['columns']
+        if columns is not None:
+            rows = [{c: row.get(c) for c in columns} for row in rows]
+        table = self.pa.Table.from_pylist(rows)
+        file_path = os.path.join(self.path, 'part-%05d.parquet' % self.state['chunks'])
+        tmp_path = file_path + '.tmp'
+        self.pq.write_table(table, tmp_path, compression=self.compression)
+        os.replace(tmp_path, file_path)
+
+    def close(self):
+        pass
+
+
+_WRITERS = {
+    'jsonl': _JsonlWriter,
+    'csv': _CsvWriter,
+    'parquet': _ParquetWriter,
+}
+
+
+def new_state(source, path, format, columns):
+    """初始的导出状态"""
+    return {
+        'source': source,
+        'path': os.path.abspath(path),
+        'format': format,
+        'columns': list(columns) if columns is not None else None,
+        'cursor': None,
+        'offset': 0,
+        'rows': 0,
+        'chunks': 0,
+        'done': False,
+    }
+
+
+def check_state(state, source, path, format):
+    """检查checkpoint是否属于同一个导出任务"""
+    expected = {'source': source, 'path': os.path.abspath(path), 'format': format}
+    for key, value in expected.items():
+        if state.get(key) != value:
+            raise ValueError(f'Checkpoint does not match the export: {key} is {state.get(key)!r}, expected {value!r}')
+
+
+def write_pages(pages, path, state, checkpoint=None, chunk_size=10000, compression=None):
+    """
+    把pages中的数据按块写入文件.
+
+    :param pages [iterable]: (字典列表, 下一页的扫描位置)的迭代器, 扫描位置为None表示结束.
+    :param path [str]: 输出文件, parquet格式为输出目录.
+    :param state [dict]: ``new_state``或者checkpoint中的导出状态, 写入过程中会被更新.
+    :param checkpoint [str]: checkpoint文件路径, 每写入一块后保存一次导出状态.
+    :param chunk_size [int]: 每块的行数, 每一块的数据都在整页的边界结束.
+    :param compression [str]: 'gzip'或None, parquet格式为parquet的压缩算法, 默认为'snappy'.
+    :return: 导出状态.
+    """
+    if state['format'] not in _WRITERS:
+        raise ValueError(f'format should be one of {EXPORT_FORMATS}, not {state["format"]!r}')
+    if compression not in (None, 'gzip') and state['format'] != 'parquet':
+        raise ValueError(f'compression should be None or "gzip", not {compression!r}')
+    writer = _WRITERS[state['format']](path, state, compression)
+    try:
+        chunk = []
+        cursor = state['cursor']
+        for rows, cursor in pages:
+            chunk.extend(rows)
+            if len(chunk) >= chunk_size or not cursor:
+                _flush(writer, chunk, state, cursor, checkpoint)
+                chunk = []
+            if not cursor:
+                break
+        if chunk:
+            _flush(writer, chunk, state, cursor, checkpoint)
+        state['done'] = True
+        if checkpoint:
+            save_checkpoint(checkpoint, state)
+    finally:
+        writer.close()
+    return state
+
+
+def _flush(writer, chunk, state, cursor, checkpoint):
+    if chunk:
+        writer.write(chunk)
+        state['rows'] += len(chunk)
+        state['chunks'] += 1
+    state['cursor'] = encode_cursor(cursor)
+    if checkpoint:
+        save_checkpoint(checkpoint, state)
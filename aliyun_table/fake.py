@@ -0,0 +1,703 @@
+"""
+内存中的表格存储, 用于性能测试和离线调试.
+
+``FakeOTSClient``实现了``TableClient``用到的OTSClient接口:
+    get_range, put_row, update_row, delete_row, batch_get_row, batch_write_row,
+    search(包括统计聚合), compute_splits, parallel_scan,
+    list_table, create_table, delete_table, describe_table, 以及多元索引的创建、删除和描述.
+数据按主键有序保存在内存中, 返回tablestore SDK的数据结构. 写入时表不存在会自动创建,
+任意索引名都可以查询, 索引包含全部的列.
+可以注入延迟、限流和错误, 随机数使用固定的种子, 结果可以重复:
+    latency: 每次请求的延迟(秒), 或者以操作名为参数返回延迟的函数.
+    throttle_rate: 请求被限流(OTSServerBusy)的概率.
+    error_rate: 请求失败(OTSInternalServerError)的概率.
+    row_error_rate: 批量读写中单行失败(OTSServerBusy)的概率.
+与OTSClient相同, 注入的请求错误先按retry_policy在内部重试(包括重试的等待时间), 不再重试时才抛给调用方;
+批量读写中单行的失败不会在内部重试.
+
+e.g.
+    from aliyun_table.fake import FakeOTSClient, fake_table_client
+
+    table_cli = fake_table_client(FakeOTSClient(latency=0.002, throttle_rate=0.01))
+    table_cli.put_rows('all_news', ['id'], ({'id': i, 'title': f'news {i}'} for i in range(1000)))
+    print(sum(1 for _ in table_cli.query_all('all_news', primary_key='id')))
+"""
+
+import bisect
+import fnmatch
+import itertools
+import math
+import random
+import threading
+import time
+from collections import Counter
+
+from tablestore import (INF_MAX, INF_MIN, PK_AUTO_INCR, Avg, BoolQuery, CapacityUnit, ColumnReturnType,
+                        CompositeColumnCondition, Count, DistinctCount, ExistsQuery, FieldSort, GroupByField,
+                        GroupKeySort, MatchAllQuery, MatchPhraseQuery, MatchQuery, Max, Min, OTSServiceError,
+                        PrefixQuery, PrimaryKeySort, RangeQuery, ReturnType, Row, RowCountSort, SingleColumnCondition,
+                        SortOrder, SubAggSort, Sum, TermQuery, TermsQuery, WildcardQuery)
+from tablestore.aggregation import AggResult
+from tablestore.group_by import GroupByFieldResultItem, GroupByResult
+from tablestore.metadata import (BatchGetRowResponse, BatchWriteRowResponse, BatchWriteRowResponseItem,
+                                 ComparatorType, ComputeSplitsResponse, DescribeTableResponse, LogicalOperator,
+                                 ParallelScanResponse, ReservedThroughputDetails, RowDataItem, SearchIndexMeta,
+                                 SearchResponse, SyncPhase, SyncStat, TableMeta, TableOptions)
+
+from aliyun_table.pool import ObservedRetryPolicy
+
+
+# get_range 单次最多返回的行数.
+GET_RANGE_MAX_ROWS = 5000
+# search 单次最多返回的行数.
+SEARCH_MAX_ROWS = 100
+# 每个读写服务能力单元对应的数据量.
+CU_BYTES = 4 * 1024
+
+
+def _cell_size(name, value):
+    if isinstance(value, (str, bytes, bytearray)):
+        return len(name) + len(value)
+    return len(name) + 8
+
+
+def _capacity(size):
+    return max(1, math.ceil(size / CU_BYTES))
+
+
+def _pk_type(value):
+    if isinstance(value, int):
+        return 'INTEGER'
+    if isinstance(value, (bytes, bytearray)):
+        return 'BINARY'
+    return 'STRING'
+
+
+class _Bound(object):
+    """get_range的边界主键, 可以和保存的主键元组比较, 支持INF_MIN和INF_MAX"""
+    __slots__ = ('values',)
+
+    def __init__(self, primary_key):
+        self.values = [value for _, value in primary_key]
+
+    def _compare(self, key):
+        for value, other in zip(self.values, key):
+            if value is INF_MIN:
+                return -1
+            if value is INF_MAX:
+                return 1
+            if value != other:
+                return -1 if value < other else 1
+        return 0
+
+    def __lt__(self, key):
+        return self._compare(key) < 0
+
+    def __gt__(self, key):
+        return self._compare(key) > 0
+
+
+class _Table(object):
+    """一张表, keys为有序的主键元组, rows为主键元组到{列名: [(值, 时间戳), ...]}的字典, 新版本在前"""
+
+    def __init__(self, name, schema, max_version=1):
+        self.name = name
+        self.schema = list(schema)
+        self.pk_names = [pk_name for pk_name, _ in self.schema]
+        self.max_version = max_version
+        self.keys = []
+        self.rows = {}
+        # 索引名 -> SearchIndexMeta
+        self.indexes = {}
+
+
+class FakeOTSClient(object):
+    """
+    内存中的OTSClient, 线程安全.
+
+    :param latency: 每次请求的延迟(秒), 或者以操作名为参数返回延迟的函数.
+    :param throttle_rate [float]: 请求被限流的概率.
+    :param error_rate [float]: 请求失败的概率.
+    :param row_error_rate [float]: 批量读写中单行失败的概率.
+    :param parallel_splits [int]: compute_splits返回的并行数.
+    :param seed: 随机数种子.
+    :param retry_policy: 请求失败时的重试策略, 默认与``aliyun_table.pool.new_client``相同.
+        不需要重试时使用``tablestore.retry.NoRetryPolicy()``.
+    """
+
+    def __init__(self, latency=0, throttle_rate=0.0, error_rate=0.0, row_error_rate=0.0, parallel_splits=4,
+                 seed=0, retry_policy=None):
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+        self.error_rate = error_rate
+        self.row_error_rate = row_error_rate
+        self.parallel_splits = parallel_splits
+        self.retry_policy = retry_policy if retry_policy is not None else ObservedRetryPolicy()
+        # 各操作的请求次数, 包括重试.
+        self.requests = Counter()
+        self._random = random.Random(seed)
+        self._tables = {}
+        self._lock = threading.RLock()
+        self._auto_increment = itertools.count(int(time.time() * 1000000))
+        self._tokens = itertools.count(1)
+        # search和parallel_scan的分页状态: token -> 有序的主键列表.
+        self._sessions = {}
+
+    # 表管理
+
+    def _table(self, table_name, primary_key=None):
+        """获取表, 写入时(指定primary_key)表不存在则按该主键创建"""
+        table = self._tables.get(table_name)
+        if table is None:
+            if primary_key is None:
+                raise OTSServiceError(404, 'OTSObjectNotExist', 'Requested table does not exist.')
+            schema = [(pk_name, _pk_type(value)) for pk_name, value in primary_key]
+            table = self._tables[table_name] = _Table(table_name, schema)
+        return table
+
+    def list_table(self):
+        self._request('list_table')
+        with self._lock:
+            return tuple(self._tables)
+
+    def create_table(self, table_meta, table_options=None, reserved_throughput=None, secondary_indexes=None,
+                     sse_spec=None):
+        self._request('create_table')
+        with self._lock:
+            if table_meta.table_name in self._tables:
+                raise OTSServiceError(409, 'OTSObjectAlreadyExist', 'Requested table already exists.')
+            max_version = table_options.max_version if table_options is not None else 1
+            self._tables[table_meta.table_name] = _Table(table_meta.table_name, table_meta.schema_of_primary_key,
+                                                         max_version or 1)
+
+    def delete_table(self, table_name):
+        self._request('delete_table')
+        with self._lock:
+            self._table(table_name)
+            del self._tables[table_name]
+
+    def describe_table(self, table_name):
+        self._request('describe_table')
+        with self._lock:
+            table = self._table(table_name)
+            return DescribeTableResponse(TableMeta(table_name, table.schema),
+                                         TableOptions(max_version=table.max_version),
+                                         ReservedThroughputDetails(CapacityUnit(0, 0), None, None))
+
+    def create_search_index(self, table_name, index_name, index_meta):
+        self._request('create_search_index')
+        with self._lock:
+            self._table(table_name).indexes[index_name] = index_meta
+
+    def delete_search_index(self, table_name, index_name):
+        self._request('delete_search_index')
+        with self._lock:
+            self._table(table_name).indexes.pop(index_name, None)
+
+    def list_search_index(self, table_name=None):
+        self._request('list_search_index')
+        with self._lock:
+            return [(name, index_name) for name, table in self._tables.items()
+                    if table_name in (None, name) for index_name in table.indexes]
+
+    def describe_search_index(self, table_name, index_name, include_sync_stat=True):
+        self._request('describe_search_index')
+        with self._lock:
+            index_meta = self._table(table_name).indexes.get(index_name) or SearchIndexMeta([])
+        return index_meta, SyncStat(SyncPhase.INCR, int(time.time() * 1000000))
+
+    def load(self, table_name, pk_list, rows):
+        """
+        批量导入数据, 不计入请求次数, 也不注入延迟和错误, 用于准备测试数据.
+
+        :param pk_list [list]: primary key name list. e.g. ['pk1', 'pk2']
+        :param rows [iterable]: 包括主键在内的数据字典.
+        """
+        now = int(time.time() * 1000)
+        with self._lock:
+            table = None
+            for data in rows:
+                primary_key = [(pk_name, data[pk_name]) for pk_name in pk_list]
+                table = table or self._table(table_name, primary_key)
+                key = tuple(value for _, value in primary_key)
+                table.rows[key] = {name: [(value, now)] for name, value in data.items() if name not in pk_list}
+            if table is not None:
+                table.keys = sorted(table.rows)
+
+    # 故障注入
+
+    def _request(self, op):
+        """发送请求, 注入的错误按retry_policy重试, 与OTSClient._request_helper相同"""
+        api_name = ''.join(part.title() for part in op.split('_'))
+        retry_times = 0
+        while True:
+            try:
+                return self._attempt(op)
+            except OTSServiceError as e:
+                if not self.retry_policy.should_retry(retry_times, e, api_name):
+                    raise
+                time.sleep(self.retry_policy.get_retry_delay(retry_times, e, api_name))
+                retry_times += 1
+
+    def _attempt(self, op):
+        """记录请求次数, 并注入延迟、限流和错误"""
+        self.requests[op] += 1
+        latency = self.latency(op) if callable(self.latency) else self.latency
+        if latency:
+            time.sleep(latency)
+        if self.throttle_rate or self.error_rate:
+            with self._lock:
+                value = self._random.random()
+            if value < self.throttle_rate:
+                raise OTSServiceError(503, 'OTSServerBusy', 'Server is busy.')
+            if value < self.throttle_rate + self.error_rate:
+                raise OTSServiceError(500, 'OTSInternalServerError', 'Internal server error.')
+
+    def _row_failed(self):
+        return self.row_error_rate and self._random.random() < self.row_error_rate
+
+    # 单行读写
+
+    def _key(self, table, primary_key):
+        names = [pk_name for pk_name, _ in primary_key]
+        if names != table.pk_names:
+            raise OTSServiceError(400, 'OTSParameterInvalid',
+                                  f'Primary key {names} does not match the schema {table.pk_names}.')
+        return tuple(next(self._auto_increment) if value is PK_AUTO_INCR else value for _, value in primary_key)
+
+    def _check_condition(self, table, key, condition):
+        if condition is None:
+            return
+        exists = key in table.rows
+        expectation = condition.row_existence_expectation
+        if (expectation == 'EXPECT_EXIST' and not exists) or (expectation == 'EXPECT_NOT_EXIST' and exists):
+            raise OTSServiceError(403, 'OTSConditionCheckFail', 'Condition check failed.')
+        if condition.column_condition is not None and not _match_filter(condition.column_condition,
+                                                                         table.rows.get(key, {})):
+            raise OTSServiceError(403, 'OTSConditionCheckFail', 'Condition check failed.')
+
+    def _put(self, table, key, attribute_columns):
+        now = int(time.time() * 1000)
+        if key not in table.rows:
+            bisect.insort(table.keys, key)
+        table.rows[key] = {column[0]: [(column[1], column[2] if len(column) > 2 else now)]
+                           for column in attribute_columns}
+        return sum(_cell_size(column[0], column[1]) for column in attribute_columns)
+
+    def _update(self, table, key, update_of_attribute_columns):
+        now = int(time.time() * 1000)
+        if key not in table.rows:
+            bisect.insort(table.keys, key)
+            table.rows[key] = {}
+        columns = table.rows[key]
+        size = 0
+        for op, items in update_of_attribute_columns.items():
+            op = op.upper()
+            for item in items:
+                if op == 'PUT':
+                    cells = [(item[1], item[2] if len(item) > 2 else now)] + columns.get(item[0], [])
+                    columns[item[0]] = sorted(cells, key=lambda cell: -cell[1])[:table.max_version]
+                    size += _cell_size(item[0], item[1])
+                elif op == 'DELETE_ALL':
+                    columns.pop(item, None)
+                elif op == 'DELETE':
+                    name, timestamp = item
+                    columns[name] = [cell for cell in columns.get(name, []) if cell[1] != timestamp]
+                    if not columns[name]:
+                        del columns[name]
+                elif op == 'INCREMENT':
+                    current = columns.get(item[0], [(0, now)])[0][0]
+                    columns[item[0]] = [(current + item[1], now)]
+                    size += _cell_size(item[0], item[1])
+        return size
+
+    def _delete(self, table, key):
+        if table.rows.pop(key, None) is not None:
+            table.keys.pop(bisect.bisect_left(table.keys, key))
+
+    def _return_row(self, table, key, return_type):
+        if return_type != ReturnType.RT_PK:
+            return None
+        return Row(list(zip(table.pk_names, key)))
+
+    def put_row(self, table_name, row, condition=None, return_type=None, transaction_id=None):
+        self._request('put_row')
+        with self._lock:
+            table = self._table(table_name, row.primary_key)
+            key = self._key(table, row.primary_key)
+            self._check_condition(table, key, condition)
+            size = self._put(table, key, row.attribute_columns)
+            return CapacityUnit(0, _capacity(size)), self._return_row(table, key, return_type)
+
+    def update_row(self, table_name, row, condition, return_type=None, transaction_id=None):
+        self._request('update_row')
+        with self._lock:
+            table = self._table(table_name, row.primary_key)
+            key = self._key(table, row.primary_key)
+            self._check_condition(table, key, condition)
+            size = self._update(table, key, row.attribute_columns)
+            return CapacityUnit(0, _capacity(size)), self._return_row(table, key, return_type)
+
+    def delete_row(self, table_name, row=None, condition=None, return_type=None, transaction_id=None, **kwargs):
+        self._request('delete_row')
+        primary_key = row.primary_key if isinstance(row, Row) else kwargs.get('primary_key', row)
+        with self._lock:
+            table = self._table(table_name)
+            key = self._key(table, primary_key)
+            self._check_condition(table, key, condition)
+            self._delete(table, key)
+            return CapacityUnit(0, 1), self._return_row(table, key, return_type)
+
+    # 范围读取
+
+    def _cells(self, table, key, columns_to_get=None, max_version=1, time_range=None):
+        """返回行的属性列[(列名, 值, 时间戳), ...], 按列名排序"""
+        cells = []
+        for name, versions in sorted(table.rows[key].items()):
+            if columns_to_get and name not in columns_to_get:
+                continue
+            if time_range is not None:
+                if isinstance(time_range, tuple):
+                    versions = [cell for cell in versions if time_range[0] <= cell[1] < time_range[1]]
+                else:
+                    versions = [cell for cell in versions if cell[1] == time_range]
+            for value, timestamp in versions[:max_version or len(versions)]:
+                cells.append((name, value, timestamp))
+        return cells
+
+    def get_range(self, table_name, direction, inclusive_start_primary_key, exclusive_end_primary_key,
+                  columns_to_get=None, limit=None, column_filter=None, max_version=1, time_range=None,
+                  start_column=None, end_column=None, token=None, transaction_id=None):
+        self._request('get_range')
+        limit = min(limit or GET_RANGE_MAX_ROWS, GET_RANGE_MAX_ROWS)
+        with self._lock:
+            table = self._table(table_name)
+            keys = table.keys
+            start, end = _Bound(inclusive_start_primary_key), _Bound(exclusive_end_primary_key)
+            if direction == 'FORWARD':
+                positions = range(bisect.bisect_left(keys, start), bisect.bisect_left(keys, end))
+            else:
+                positions = range(bisect.bisect_right(keys, start) - 1, bisect.bisect_right(keys, end) - 1, -1)
+            row_list = []
+            size = 0
+            next_start_primary_key = None
+            for position in positions:
+                key = keys[position]
+                if len(row_list) >= limit:
+                    next_start_primary_key = list(zip(table.pk_names, key))
+                    break
+                if column_filter is not None and not _match_filter(column_filter, table.rows[key]):
+                    continue
+                cells = self._cells(table, key, columns_to_get, max_version, time_range)
+                # 指定的列都不存在时不返回该行, 只读取主键列时返回只有主键的行.
+                if not cells and (time_range is not None or (
+                        columns_to_get and not set(columns_to_get) & set(table.pk_names))):
+                    continue
+                row_list.append(Row(list(zip(table.pk_names, key)), cells))
+                size += sum(_cell_size(cell[0], cell[1]) for cell in cells)
+        return CapacityUnit(_capacity(size), 0), next_start_primary_key, row_list, None
+
+    # 批量读写
+
+    def batch_get_row(self, request):
+        self._request('batch_get_row')
+        result = {}
+        with self._lock:
+            for table_name, item in request.items.items():
+                table = self._table(table_name)
+                rows = result[table_name] = []
+                for primary_key in item.primary_keys:
+                    if self._row_failed():
+                        rows.append(RowDataItem(False, 'OTSServerBusy', 'Server is busy.', table_name, None,
+                                                None, None))
+                        continue
+                    key = self._key(table, primary_key)
+                    if key not in table.rows or (item.column_filter is not None and
+                                                 not _match_filter(item.column_filter, table.rows[key])):
+                        rows.append(RowDataItem(True, None, None, table_name, CapacityUnit(1, 0), None, None))
+                        continue
+                    cells = self._cells(table, key, item.columns_to_get, item.max_version or 1, item.time_range)
+                    size = sum(_cell_size(cell[0], cell[1]) for cell in cells)
+                    rows.append(RowDataItem(True, None, None, table_name, CapacityUnit(_capacity(size), 0),
+                                            list(zip(table.pk_names, key)), cells))
+        return BatchGetRowResponse(result)
+
+    def batch_write_row(self, request):
+        self._request('batch_write_row')
+        result = {}
+        with self._lock:
+            for table_name, item in request.items.items():
+                keys = [tuple(value for _, value in row_item.row.primary_key) for row_item in item.row_items
+                        if not any(value is PK_AUTO_INCR for _, value in row_item.row.primary_key)]
+                if len(set(keys)) != len(keys):
+                    raise OTSServiceError(400, 'OTSParameterInvalid', 'The input parameter is invalid.')
+            for table_name, item in request.items.items():
+                rows = result[table_name] = []
+                for row_item in item.row_items:
+                    primary_key = row_item.row.primary_key
+                    if self._row_failed():
+                        rows.append(BatchWriteRowResponseItem(False, 'OTSServerBusy', 'Server is busy.', None,
+                                                              None))
+                        continue
+                    try:
+                        table = self._table(table_name, primary_key)
+                        key = self._key(table, primary_key)
+                        self._check_condition(table, key, row_item.condition)
+                    except OTSServiceError as e:
+                        rows.append(BatchWriteRowResponseItem(False, e.code, e.message, CapacityUnit(1, 0), None))
+                        continue
+                    if row_item.type == 'put':
+                        size = self._put(table, key, row_item.row.attribute_columns)
+                    elif row_item.type == 'update':
+                        size = self._update(table, key, row_item.row.attribute_columns)
+                    else:
+                        self._delete(table, key)
+                        size = 0
+                    return_row = self._return_row(table, key, row_item.return_type)
+                    rows.append(BatchWriteRowResponseItem(True, None, None, CapacityUnit(0, _capacity(size)),
+                                                          return_row.primary_key if return_row else None))
+        return BatchWriteRowResponse(request, result)
+
+    # 多元索引
+
+    def _search_keys(self, table, query, sort=None):
+        """返回满足查询条件的主键列表, 按sort排序, 默认按主键排序"""
+        keys = [key for key in table.keys if _match_query(query, _fields(table, key))]
+        for sorter in reversed(sort.sorters if sort is not None else []):
+            reverse = sorter.sort_order == SortOrder.DESC
+            if isinstance(sorter, PrimaryKeySort):
+                keys.sort(reverse=reverse)
+            elif isinstance(sorter, FieldSort):
+                present = [key for key in keys if sorter.field_name in table.rows[key]]
+                missing = [key for key in keys if sorter.field_name not in table.rows[key]]
+                present.sort(key=lambda key: table.rows[key][sorter.field_name][0][0], reverse=reverse)
+                keys = present + missing
+        return keys
+
+    def _search_row(self, table, key, columns_to_get):
+        return_type = columns_to_get.return_type if columns_to_get is not None else ColumnReturnType.NONE
+        if return_type == ColumnReturnType.NONE:
+            cells = []
+        elif return_type == ColumnReturnType.SPECIFIED:
+            cells = self._cells(table, key, columns_to_get.column_names)
+        else:
+            cells = self._cells(table, key)
+        return list(zip(table.pk_names, key)), cells
+
+    def _page(self, session_keys, next_token, offset, limit):
+        """从分页状态中取出一页主键, 返回(主键列表, next_token, 满足条件的总行数)"""
+        if next_token:
+            session, offset = next_token.decode('utf-8').split(':')
+            keys = self._sessions.get(session)
+            if keys is None:
+                raise OTSServiceError(400, 'OTSParameterInvalid', 'Invalid next_token.')
+            offset = int(offset)
+        else:
+            keys, session = session_keys(), str(next(self._tokens))
+            self._sessions[session] = keys
+        page = keys[offset:offset + limit]
+        if limit and offset + limit < len(keys):
+            return page, f'{session}:{offset + limit}'.encode('utf-8'), len(keys)
+        self._sessions.pop(session, None)
+        return page, None, len(keys)
+
+    def search(self, table_name, index_name, search_query, columns_to_get=None, routing_keys=None,
+               timeout_s=None):
+        self._request('search')
+        limit = 10 if search_query.limit is None else search_query.limit
+        if limit > SEARCH_MAX_ROWS:
+            raise OTSServiceError(400, 'OTSParameterInvalid', f'limit should be no more than {SEARCH_MAX_ROWS}.')
+        with self._lock:
+            table = self._table(table_name)
+            keys, next_token, total_count = self._page(
+                    lambda: self._search_keys(table, search_query.query, search_query.sort),
+                    search_query.next_token, search_query.offset or 0, limit)
+            rows = [self._search_row(table, key, columns_to_get) for key in keys]
+            matched = None
+            if search_query.aggs or search_query.group_bys:
+                matched = self._search_keys(table, search_query.query)
+            if not search_query.get_total_count:
+                total_count = -1
+            agg_results = [_aggregate(agg, table, matched) for agg in search_query.aggs or []]
+            group_by_results = [_group_by(group_by, table, matched) for group_by in search_query.group_bys or []]
+        return SearchResponse(rows, agg_results, group_by_results, next_token, True, total_count, [])
+
+    def compute_splits(self, table_name, index_name):
+        self._request('compute_splits')
+        with self._lock:
+            self._table(table_name)
+        return ComputeSplitsResponse(f'session-{next(self._tokens)}'.encode('utf-8'), self.parallel_splits)
+
+    def parallel_scan(self, table_name, index_name, scan_query, session_id, columns_to_get=None, timeout_s=None):
+        self._request('parallel_scan')
+        with self._lock:
+            table = self._table(table_name)
+
+            def session_keys():
+                keys = self._search_keys(table, scan_query.query)
+                return keys[scan_query.current_parallel_id::scan_query.max_parallel]
+
+            keys, next_token, _ = self._page(session_keys, scan_query.next_token, 0, scan_query.limit)
+            rows = [self._search_row(table, key, columns_to_get) for key in keys]
+        return ParallelScanResponse(rows, next_token)
+
+
+def _latest(columns, name):
+    versions = columns.get(name)
+    return versions[0][0] if versions else None
+
+
+def _compare(value, other, comparator):
+    if comparator == ComparatorType.EQUAL:
+        return value == other
+    if comparator == ComparatorType.NOT_EQUAL:
+        return value != other
+    if comparator == ComparatorType.GREATER_THAN:
+        return value > other
+    if comparator == ComparatorType.GREATER_EQUAL:
+        return value >= other
+    if comparator == ComparatorType.LESS_THAN:
+        return value < other
+    if comparator == ComparatorType.LESS_EQUAL:
+        return value <= other
+    raise OTSServiceError(400, 'OTSParameterInvalid', f'Unsupported comparator {comparator}.')
+
+
+def _match_filter(condition, columns):
+    """判断行是否满足SingleColumnCondition或CompositeColumnCondition"""
+    if isinstance(condition, SingleColumnCondition):
+        value = _latest(columns, condition.column_name)
+        if value is None:
+            return condition.pass_if_missing
+        return _compare(value, condition.column_value, condition.comparator)
+    if isinstance(condition, CompositeColumnCondition):
+        results = [_match_filter(sub_condition, columns) for sub_condition in condition.sub_conditions]
+        if condition.combinator == LogicalOperator.NOT:
+            return not results[0]
+        if condition.combinator == LogicalOperator.AND:
+            return all(results)
+        return any(results)
+    raise OTSServiceError(400, 'OTSParameterInvalid', f'Unsupported column filter {type(condition).__name__}.')
+
+
+def _same_value(value, other):
+    """多元索引中的值按类型比较, 1、True和1.0是不同的值"""
+    if isinstance(value, bytearray):
+        value = bytes(value)
+    if isinstance(other, bytearray):
+        other = bytes(other)
+    return type(value) is type(other) and value == other
+
+
+def _fields(table, key):
+    """多元索引中一行的字段, 包括主键和属性列的最新值"""
+    fields = dict(zip(table.pk_names, key))
+    for name, versions in table.rows[key].items():
+        fields[name] = versions[0][0]
+    return fields
+
+
+def _match_query(query, fields):
+    """判断一行是否满足多元索引的查询条件"""
+    if query is None or isinstance(query, MatchAllQuery):
+        return True
+    if isinstance(query, BoolQuery):
+        if not all(_match_query(sub_query, fields) for sub_query in query.must_queries + query.filter_queries):
+            return False
+        if any(_match_query(sub_query, fields) for sub_query in query.must_not_queries):
+            return False
+        if query.should_queries:
+            minimum = query.minimum_should_match
+            if minimum is None:
+                minimum = 0 if query.must_queries or query.filter_queries else 1
+            return sum(_match_query(sub_query, fields) for sub_query in query.should_queries) >= minimum
+        return True
+    if isinstance(query, ExistsQuery):
+        return query.field_name in fields
+    value = fields.get(getattr(query, 'field_name', None))
+    if value is None:
+        return False
+    if isinstance(query, TermQuery):
+        return _same_value(value, query.column_value)
+    if isinstance(query, TermsQuery):
+        return any(_same_value(value, other) for other in query.column_values)
+    if isinstance(query, RangeQuery):
+        if query.range_from is not None:
+            if value < query.range_from or (value == query.range_from and not query.include_lower):
+                return False
+        if query.range_to is not None:
+            if value > query.range_to or (value == query.range_to and not query.include_upper):
+                return False
+        return True
+    if isinstance(query, PrefixQuery):
+        return isinstance(value, str) and value.startswith(query.prefix)
+    if isinstance(query, WildcardQuery):
+        return isinstance(value, str) and fnmatch.fnmatchcase(value, query.value)
+    if isinstance(query, MatchPhraseQuery):
+        return isinstance(value, str) and query.text in value
+    if isinstance(query, MatchQuery):
+        return isinstance(value, str) and bool(set(query.text.split()) & set(value.split()))
+    raise NotImplementedError(f'{type(query).__name__} is not supported by FakeOTSClient')
+
+
+def _aggregate(agg, table, keys):
+    """计算单个统计聚合"""
+    values = [_latest(table.rows[key], agg.field) for key in keys]
+    values = [value if value is not None else agg.missing for value in values]
+    values = [value for value in values if value is not None]
+    if isinstance(agg, Count):
+        value = len(values)
+    elif isinstance(agg, DistinctCount):
+        value = len(set(values))
+    elif isinstance(agg, Sum):
+        value = sum(values)
+    elif isinstance(agg, Avg):
+        value = sum(values) / len(values) if values else None
+    elif isinstance(agg, Max):
+        value = max(values) if values else None
+    elif isinstance(agg, Min):
+        value = min(values) if values else None
+    else:
+        raise NotImplementedError(f'{type(agg).__name__} is not supported by FakeOTSClient')
+    return AggResult(agg.name, value)
+
+
+def _group_by(group_by, table, keys):
+    """计算按列分组的统计结果"""
+    if not isinstance(group_by, GroupByField):
+        raise NotImplementedError(f'{type(group_by).__name__} is not supported by FakeOTSClient')
+    groups = {}
+    for key in keys:
+        value = _fields(table, key).get(group_by.field_name)
+        if value is not None:
+            groups.setdefault(str(value), []).append(key)
+    items = [GroupByFieldResultItem(group_key, len(group_keys),
+                                    [_aggregate(agg, table, group_keys) for agg in group_by.sub_aggs or []], [])
+             for group_key, group_keys in groups.items()]
+    sorters = group_by.group_by_sort or [RowCountSort(SortOrder.DESC)]
+    for sorter in reversed(sorters):
+        reverse = sorter.sort_order == SortOrder.DESC
+        if isinstance(sorter, RowCountSort):
+            items.sort(key=lambda item: item.row_count, reverse=reverse)
+        elif isinstance(sorter, GroupKeySort):
+            items.sort(key=lambda item: item.key, reverse=reverse)
+        elif isinstance(sorter, SubAggSort):
+            items.sort(key=lambda item: next(result.value for result in item.sub_aggs
+                                             if result.name == sorter.sub_agg_name), reverse=reverse)
+    return GroupByResult(group_by.name, items[:group_by.size or 10])
+
+
+def fake_table_client(backend=None, instance_name='fake', **kwargs):
+    """
+    创建使用``FakeOTSClient``的``TableClient``.
+
+    :param backend [FakeOTSClient]: 内存中的表格存储, 不指定则新建一个.
+    :param kwargs: 其它``TableClient``的参数.
+    """
+    from aliyun_table.client import TableClient
+
+    kwargs.setdefault('share_client', False)
+    client = TableClient(instance_name, end_point='http://fake.ots.aliyuncs.com', access_key_id='fake',
+                         access_key_secret='fake', **kwargs)
+    client.otsclient = backend if backend is not None else FakeOTSClient()
+    return client
@@ -0,0 +1,342 @@
+"""
+请求的指标统计和追踪.
+
+``TableClient(metrics=Metrics())``开启后, 每次请求表格存储都会生成一个``Span``, 记录:
+    耗时、每页的行数和字节数、消耗的读写服务能力单元(CU)、重试次数和异常类型,
+按(操作, 表名)汇总到``Metrics``中, 可以通过``to_prometheus``导出为Prometheus文本格式,
+或者通过``add_hook``注册回调函数, 在每次请求结束时获取``Span``.
+指定tracer(OpenTelemetry的Tracer, 或者提供相同``start_span``接口的对象)时, 每个Span会同时生成一个追踪的span.
+重试次数包括客户端批量写入的重试和tablestore SDK内部的重试, 后者由``aliyun_table.pool.ObservedRetryPolicy``
+通过``current_span``记录到当前线程正在进行的Span中.
+"""
+
+import bisect
+import threading
+import time
+
+from aliyun_table.my_logger import logger
+
+
+# 请求耗时的分桶, 单位为秒.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# 每页行数的分桶.
+PAGE_ROWS_BUCKETS = (1, 10, 50, 100, 200, 500, 1000, 2000, 5000)
+# 每页字节数的分桶.
+PAGE_BYTES_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+# 按页读取数据的操作, 会统计每页的行数和字节数.
+PAGE_OPS = ('get_range', 'search', 'parallel_scan', 'batch_get_row')
+
+# 每个线程正在进行的Span.
+_local = threading.local()
+
+
+def current_span():
+    """当前线程正在进行的Span, 没有时返回None"""
+    return getattr(_local, 'span', None)
+
+
+def error_class(exc):
+    """异常的类型, 服务端异常附带错误码, 例如'OTSServiceError/OTSServerBusy'"""
+    code = getattr(exc, 'code', None)
+    name = type(exc).__name__
+    return f'{name}/{code}' if code else name
+
+
+class Histogram(object):
+    """累计分桶的直方图"""
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Span(object):
+    """
+    一次请求的记录, 由``Metrics.span``生成, 作为上下文管理器使用.
+    退出时计算耗时, 记录异常类型, 并汇总到Metrics中.
+    metrics可以为None, 此时只通知limiter(``CapacityLimiter``).
+    """
+    __slots__ = ('metrics', 'limiter', 'op', 'table', 'start', 'latency', 'rows', 'nbytes', 'read_cu',
+                 'write_cu', 'retries', 'error', 'row_errors', 'attributes', '_trace_span', '_parent')
+
+    def __init__(self, metrics, op, table, limiter=None):
+        self.metrics = metrics
+        self.limiter = limiter
+        self.op = op
+        self.table = table
+        self.start = None
+        self.latency = None
+        self.rows = 0
+        self.nbytes = 0
+        self.read_cu = 0
+        self.write_cu = 0
+        self.retries = 0
+        self.error = None
+        # 批量请求中单行的异常类型 -> 次数
+        self.row_errors = {}
+        self.attributes = {}
+        self._trace_span = None
+        self._parent = None
+
+    def __enter__(self):
+        tracer = self.metrics.tracer if self.metrics is not None else None
+        if tracer is not None:
+            self._trace_span = tracer.start_span(f'tablestore.{self.op}',
+                                                 attributes={'tablestore.table': self.table})
+        self._parent = current_span()
+        _local.span = self
+        self.start = time.monotonic()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.latency = time.monotonic() - self.start
+        _local.span = self._parent
+        self._parent = None
+        if exc_val is not None:
+            self.error = error_class(exc_val)
+        trace_span = self._trace_span
+        if trace_span is not None:
+            for key, value in self._trace_attributes().items():
+                trace_span.set_attribute(key, value)
+            if exc_val is not None:
+                trace_span.record_exception(exc_val)
+            trace_span.end()
+        if self.metrics is not None:
+            self.metrics.observe(self)
+        if self.limiter is not None:
+            self.limiter.observe(self)
+        return False
+
+    def _trace_attributes(self):
+        attributes = {
+            'tablestore.rows': self.rows,
+            'tablestore.bytes': self.nbytes,
+            'tablestore.read_cu': self.read_cu,
+            'tablestore.write_cu': self.write_cu,
+            'tablestore.retries': self.retries,
+        }
+        if self.error:
+            attributes['tablestore.error'] = self.error
+        attributes.update(self.attributes)
+        return attributes
+
+    def record(self, rows=0, nbytes=0, consumed=None, retries=0):
+        """
+        记录请求的结果.
+
+        :param rows [int]: 读取或写入的行数.
+        :param nbytes [int]: 读取的字节数.
+        :param consumed: 服务端返回的``CapacityUnit``, 或者CapacityUnit的列表.
+        :param retries [int]: 客户端的重试次数, SDK内部的重试通过``retried``记录.
+        """
+        self.rows += rows
+        self.nbytes += nbytes
+        self.retries += retries
+        if consumed is not None:
+            for cu in consumed if isinstance(consumed, (list, tuple)) else (consumed,):
+                if cu is not None:
+                    self.read_cu += cu.read or 0
+                    self.write_cu += cu.write or 0
+
+    def record_error(self, error, count=1):
+        """记录批量请求中单行的错误, error为错误码"""
+        self.row_errors[error] = self.row_errors.get(error, 0) + count
+
+    def retried(self, error):
+        """SDK内部重试了一次请求, error为导致重试的错误码, 被限流时立即通知limiter"""
+        self.retries += 1
+        if self.limiter is not None:
+            self.limiter.retried(self.op, error)
+
+    def set_attribute(self, key, value):
+        """附加的属性, 只用于追踪和回调"""
+        self.attributes[key] = value
+
+
+class _NullSpan(object):
+    """未开启统计时使用的空Span"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+    def record(self, rows=0, nbytes=0, consumed=None, retries=0):
+        pass
+
+    def record_error(self, error, count=1):
+        pass
+
+    def set_attribute(self, key, value):
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+class _OpStats(object):
+    """单个(操作, 表名)的汇总数据"""
+    __slots__ = ('latency', 'page_rows', 'page_bytes', 'requests', 'rows', 'nbytes', 'read_cu', 'write_cu',
+                 'retries', 'errors')
+
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.page_rows = Histogram(PAGE_ROWS_BUCKETS)
+        self.page_bytes = Histogram(PAGE_BYTES_BUCKETS)
+        self.requests = 0
+        self.rows = 0
+        self.nbytes = 0
+        self.read_cu = 0
+        self.write_cu = 0
+        self.retries = 0
+        # 异常类型 -> 次数
+        self.errors = {}
+
+
+class Metrics(object):
+    """
+    线程安全的请求指标汇总.
+
+    e.g.
+        metrics = Metrics()
+        metrics.add_hook(lambda span: span.latency > 1 and print('slow', span.op, span.table, span.latency))
+        table_cli = TableClient(instance_name='实例名', metrics=metrics)
+        ...
+        print(metrics.to_prometheus())
+
+    :param tracer: OpenTelemetry的Tracer(``opentelemetry.trace.get_tracer(__name__)``), 不指定则不生成追踪的span.
+    :param prefix [str]: Prometheus指标名称的前缀.
+    """
+
+    def __init__(self, tracer=None, prefix='aliyun_table'):
+        self.tracer = tracer
+        self.prefix = prefix
+        self.hooks = []
+        # (op, table) -> _OpStats
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def span(self, op, table):
+        """开始记录一次请求"""
+        return Span(self, op, table)
+
+    def add_hook(self, hook):
+        """注册回调函数, 每次请求结束时以Span为参数调用"""
+        self.hooks.append(hook)
+
+    def remove_hook(self, hook):
+        self.hooks.remove(hook)
+
+    def observe(self, span):
+        """汇总一次请求的记录, 由Span退出时调用"""
+        with self._lock:
+            stats = self._stats.get((span.op, span.table))
+            if stats is None:
+                stats = self._stats[(span.op, span.table)] = _OpStats()
+            stats.requests += 1
+            stats.latency.observe(span.latency)
+            stats.rows += span.rows
+            stats.nbytes += span.nbytes
+            stats.read_cu += span.read_cu
+            stats.write_cu += span.write_cu
+            stats.retries += span.retries
+            if span.error is not None:
+                stats.errors[span.error] = stats.errors.get(span.error, 0) + 1
+            elif span.op in PAGE_OPS:
+                stats.page_rows.observe(span.rows)
+                stats.page_bytes.observe(span.nbytes)
+            for error, count in span.row_errors.items():
+                stats.errors[error] = stats.errors.get(error, 0) + count
+        for hook in self.hooks:
+            try:
+                hook(span)
+            except Exception as e:
+                logger.error(f'Metrics hook error, {e}')
+
+    def snapshot(self):
+        """
+        返回汇总数据的字典, 键为(op, table).
+        值包括requests, rows, bytes, read_cu, write_cu, retries, errors和latency(sum, count).
+        """
+        with self._lock:
+            return {key: {
+                'requests': stats.requests,
+                'rows': stats.rows,
+                'bytes': stats.nbytes,
+                'read_cu': stats.read_cu,
+                'write_cu': stats.write_cu,
+                'retries': stats.retries,
+                'errors': dict(stats.errors),
+                'latency_sum': stats.latency.sum,
+                'latency_count': stats.latency.count,
+            } for key, stats in self._stats.items()}
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+    def to_prometheus(self):
+        """导出为Prometheus文本格式"""
+        with self._lock:
+            items = sorted(self._stats.items())
+            lines = []
+            self._histogram(lines, 'request_duration_seconds', 'Request latency in seconds.',
+                            [(key, stats.latency) for key, stats in items])
+            self._histogram(lines, 'page_rows', 'Rows per page.',
+                            [(key, stats.page_rows) for key, stats in items if stats.page_rows.count])
+            self._histogram(lines, 'page_bytes', 'Estimated bytes per page.',
+                            [(key, stats.page_bytes) for key, stats in items if stats.page_bytes.count])
+            self._counter(lines, 'requests_total', 'Requests.',
+                          [(_labels(key), stats.requests) for key, stats in items])
+            self._counter(lines, 'rows_total', 'Rows read or written.',
+                          [(_labels(key), stats.rows) for key, stats in items])
+            self._counter(lines, 'bytes_total', 'Estimated bytes read.',
+                          [(_labels(key), stats.nbytes) for key, stats in items])
+            self._counter(lines, 'capacity_units_total', 'Consumed capacity units.',
+                          [(_labels(key, type=cu_type), value) for key, stats in items
+                           for cu_type, value in (('read', stats.read_cu), ('write', stats.write_cu))])
+            self._counter(lines, 'retries_total', 'Retries.',
+                          [(_labels(key), stats.retries) for key, stats in items])
+            self._counter(lines, 'errors_total', 'Errors by class.',
+                          [(_labels(key, error=error), count) for key, stats in items
+                           for error, count in sorted(stats.errors.items())])
+        return '\n'.join(lines) + '\n'
+
+    def _counter(self, lines, name, help_text, samples):
+        name = f'{self.prefix}_{name}'
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} counter')
+        for labels, value in samples:
+            lines.append(f'{name}{{{labels}}} {value}')
+
+    def _histogram(self, lines, name, help_text, samples):
+        name = f'{self.prefix}_{name}'
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} histogram')
+        for key, histogram in samples:
+            cumulative = 0
+            for bound, count in zip(histogram.buckets + (float('inf'),), histogram.counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'{name}_bucket{{{_labels(key, le=le)}}} {cumulative}')
+            lines.append(f'{name}_sum{{{_labels(key)}}} {histogram.sum}')
+            lines.append(f'{name}_count{{{_labels(key)}}} {histogram.count}')
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(key, **extra):
+    op, table = key
+    labels = [('op', op), ('table', table)] + list(extra.items())
+    return ','.join(f'{name}="{_escape(value)}"' for name, value in labels)
@@ -0,0 +1,277 @@
+"""
+表的本地镜像.
+
+``LocalMirror``把一张表保存到本地的SQLite文件中, 按主键建立索引, 提供``get``、``range``和``prefix``查询,
+服务重启和热点读取都不需要请求表格存储. ``refresh``增量同步自上次同步以来变化的行:
+    指定updated_column时: 只读取该列 >= 上次同步的最大值的行(服务端过滤), 读到的行整行替换.
+    不指定时: 按数据版本(写入时间, 毫秒)读取上次同步之后写入的列, 合并到本地的行中.
+增量同步无法发现被删除的行和列, 需要定期``refresh(full=True)``全量同步.
+"""
+
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from tablestore import INF_MAX, INF_MIN, ComparatorType, SingleColumnCondition
+
+from aliyun_table.records import _split_row
+
+
+# 按版本增量同步时time_range的结束时间.
+MAX_VERSION = 2 ** 63 - 1
+
+
+def _prefix_end(prefix):
+    """大于所有以prefix开头的值的最小值, 不存在时返回None"""
+    if isinstance(prefix, str):
+        chars = list(prefix)
+        while chars and ord(chars[-1]) == 0x10FFFF:
+            chars.pop()
+        if not chars:
+            return None
+        return ''.join(chars[:-1]) + chr(ord(chars[-1]) + 1)
+    data = bytearray(prefix)
+    while data and data[-1] == 0xFF:
+        data.pop()
+    if not data:
+        return None
+    data[-1] += 1
+    return bytes(data)
+
+
+def _sql_value(value):
+    """主键值在SQLite中的表示, 二进制统一为bytes以便与BLOB比较"""
+    return bytes(value) if isinstance(value, bytearray) else value
+
+
+class LocalMirror(object):
+    """
+    表的本地镜像, 通过``TableClient.local_mirror``获取. 读写线程安全, 可以在同步的同时读取.
+
+    e.g.
+        mirror = table_cli.local_mirror('city', 'city.db', ['city_id'], updated_column='updated_at')
+        mirror.refresh()                # 第一次为全量同步, 之后为增量同步
+        mirror.get(1001)                # {'city_id': 1001, 'name': ...}
+        list(mirror.prefix('hz_'))      # 第一个主键列以'hz_'开头的行
+
+    :param client [TableClient]: 用于同步的客户端.
+    :param table_name [str]: 表名.
+    :param path [str]: SQLite文件路径.
+    :param pk_list [list]: primary key name list. e.g. ['pk1', 'pk2']
+    :param updated_column [str]: 行的更新时间(或版本号)列, 写入时需要维护该列. 不指定则按数据版本增量同步.
+    :param overlap: 增量同步时向前多读取的范围, 用于容忍时钟误差和同时进行的写入.
+        单位与updated_column相同, 不指定updated_column时为毫秒.
+        只支持数值类型的updated_column, 字符串或二进制(例如ISO格式的时间)需要为0.
+    :param columns_to_get [list]: 只保存这些属性列, 不指定则保存全部列.
+    :param page_size: 每页的行数, 见``query_all``.
+    """
+
+    def __init__(self, client, table_name, path, pk_list, updated_column=None, overlap=0,
+                 columns_to_get=None, page_size=None):
+        self.client = client
+        self.table_name = table_name
+        self.path = os.path.abspath(path)
+        self.pk_list = list(pk_list)
+        self.updated_column = updated_column
+        if not isinstance(overlap, (int, float)) or isinstance(overlap, bool) or overlap < 0:
+            raise TypeError(f'overlap should be a non-negative number, not {overlap!r}')
+        self.overlap = overlap
+        self.columns_to_get = list(columns_to_get) if columns_to_get is not None else None
+        if self.columns_to_get is not None and updated_column and updated_column not in self.columns_to_get:
+            self.columns_to_get.append(updated_column)
+        self.page_size = page_size
+        self._pk_columns = [f'pk{i}' for i in range(len(self.pk_list))]
+        self._lock = threading.Lock()
+        # 保证同一时间只有一个同步.
+        self._refresh_lock = threading.Lock()
+        self._conn = self._connect()
+        self._init_schema()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM rows').fetchone()[0]
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def _init_schema(self):
+        columns = ', '.join(self._pk_columns)
+        with self._lock:
+            self._conn.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+            self._conn.execute(f'CREATE TABLE IF NOT EXISTS rows ({columns}, data BLOB, '
+                               f'PRIMARY KEY ({columns})) WITHOUT ROWID')
+            meta = dict(self._conn.execute('SELECT key, value FROM meta').fetchall())
+        expected = {'table_name': self.table_name, 'pk_list': json.dumps(self.pk_list),
+                    'updated_column': json.dumps(self.updated_column)}
+        if not meta:
+            self._set_meta(self._conn, expected)
+            return
+        for key, value in expected.items():
+            if meta.get(key) != value:
+                raise ValueError(f'Mirror file does not match: {key} is {meta.get(key)!r}, expected {value!r}')
+
+    def _set_meta(self, conn, items):
+        conn.executemany('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', list(items.items()))
+
+    def _get_meta(self, key):
+        with self._lock:
+            row = self._conn.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    @property
+    def watermark(self):
+        """上次同步的位置: updated_column的最大值, 或者开始同步的毫秒时间戳. 没有同步过时为None"""
+        return self._get_meta('watermark')
+
+    @property
+    def last_sync(self):
+        """上次同步完成的时间戳(秒), 没有同步过时为None"""
+        return self._get_meta('last_sync')
+
+    def refresh(self, full=False):
+        """
+        同步表中的数据, 没有同步过或者full为True时全量同步, 否则增量同步.
+
+        :return: 本次写入本地的行数.
+        """
+        with self._refresh_lock:
+            watermark = None if full else self.watermark
+            incremental = watermark is not None
+            scan_options = {'columns_to_get': self.columns_to_get, 'page_size': self.page_size}
+            if self.updated_column:
+                if incremental:
+                    scan_options['column_filter'] = SingleColumnCondition(
+                        self.updated_column, self._sync_from(watermark), ComparatorType.GREATER_EQUAL,
+                        pass_if_missing=False)
+            else:
+                new_watermark = int(time.time() * 1000)
+                if incremental:
+                    scan_options['time_range'] = (max(0, watermark - self.overlap), MAX_VERSION)
+            merge = incremental and not self.updated_column
+            decoder = self.client._page_decoder(self.table_name)
+            pages = self.client._range_pages(self.table_name, self.pk_list, INF_MIN, INF_MAX, **scan_options)
+
+            # 在单独的连接中同步, 整个同步是一个事务, 提交前读取到的都是同步前的数据.
+            conn = self._connect()
+            count = 0
+            try:
+                conn.execute('BEGIN IMMEDIATE')
+                if not incremental:
+                    conn.execute('DELETE FROM rows')
+                for row_list, _ in pages:
+                    rows = decoder(row_list) if decoder is not None else [_split_row(row) for row in row_list]
+                    for pkvs, ckvs in rows:
+                        key = [_sql_value(value) for _, value in pkvs]
+                        data = {name: value for name, value, *_ in ckvs}
+                        if merge:
+                            data = {**(self._select(conn, key) or {}), **data}
+                        if self.updated_column:
+                            updated = data.get(self.updated_column)
+                            if updated is not None and (watermark is None or updated > watermark):
+                                watermark = updated
+                        self._upsert(conn, key, data)
+                        count += 1
+                if not self.updated_column:
+                    watermark = new_watermark
+                self._set_meta(conn, {'watermark': json.dumps(watermark), 'last_sync': json.dumps(time.time())})
+                conn.execute('COMMIT')
+            except BaseException:
+                if conn.in_transaction:
+                    conn.execute('ROLLBACK')
+                raise
+            finally:
+                pages.close()
+                conn.close()
+            return count
+
+    def _sync_from(self, watermark):
+        """增量同步的起始值, overlap只能用于数值类型的updated_column"""
+        if not self.overlap:
+            return watermark
+        if not isinstance(watermark, (int, float)) or isinstance(watermark, bool):
+            raise ValueError(f'overlap is only supported for numeric {self.updated_column!r} values, '
+                             f'got {type(watermark).__name__}; use overlap=0')
+        return watermark - self.overlap
+
+    def _select(self, conn, key):
+        where = ' AND '.join(f'{column} = ?' for column in self._pk_columns)
+        row = conn.execute(f'SELECT data FROM rows WHERE {where}', key).fetchone()
+        return pickle.loads(row[0]) if row else None
+
+    def _upsert(self, conn, key, data):
+        columns = ', '.join(self._pk_columns)
+        placeholders = ', '.join('?' * (len(key) + 1))
+        conn.execute(f'INSERT OR REPLACE INTO rows ({columns}, data) VALUES ({placeholders})',
+                     key + [pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)])
+
+    def _to_dict(self, key, data):
+        d = dict(zip(self.pk_list, key))
+        d.update(pickle.loads(data))
+        return d
+
+    def get(self, *pk_values):
+        """
+        按主键读取一行, 不存在时返回None.
+
+        e.g.
+            mirror.get(1001)
+            mirror.get('hz', 1001)      # 多个主键列
+        """
+        if len(pk_values) != len(self.pk_list):
+            raise ValueError(f'get() needs {len(self.pk_list)} primary key values, got {len(pk_values)}')
+        key = [_sql_value(value) for value in pk_values]
+        with self._lock:
+            data = self._select(self._conn, key)
+        if data is None:
+            return None
+        return {**dict(zip(self.pk_list, pk_values)), **data}
+
+    def range(self, start=None, end=None, limit=None):
+        """
+        按主键顺序返回第一个主键列在[start, end)内的行, start或end为None表示不限制.
+        """
+        conditions, params = [], []
+        if start is not None:
+            conditions.append('pk0 >= ?')
+            params.append(_sql_value(start))
+        if end is not None:
+            conditions.append('pk0 < ?')
+            params.append(_sql_value(end))
+        return self._iter_rows(conditions, params, limit)
+
+    def prefix(self, prefix, limit=None):
+        """按主键顺序返回第一个主键列(字符串或二进制)以prefix开头的行"""
+        return self.range(prefix, _prefix_end(prefix), limit)
+
+    def _iter_rows(self, conditions, params, limit=None):
+        columns = ', '.join(self._pk_columns)
+        sql = f'SELECT {columns}, data FROM rows'
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        sql += f' ORDER BY {columns}'
+        if limit is not None:
+            sql += ' LIMIT ?'
+            params = params + [limit]
+        # 每次遍历使用单独的连接, 不阻塞其它读取和同步.
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        try:
+            for row in conn.execute(sql, params):
+                yield self._to_dict(row[:-1], row[-1])
+        finally:
+            conn.close()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
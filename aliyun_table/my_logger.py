@@ -1,13 +1,7 @@
 import logging
 
-# 日志配置，输出日志同时写入文件
-logging.basicConfig(
-    #level=logging.DEBUG,
-    level=logging.INFO,
-    format="%(asctime)s [%(threadName)-12.12s] [%(levelname)-5.5s]  %(message)s",
-    handlers=[
-        #logging.FileHandler("{}.log".format('toutiao_log')),
-        logging.StreamHandler()
-    ])
-
-logger = logging.getLogger()
+# 包内使用的logger, 不修改root logger的配置, 由使用者决定日志的输出方式, 例如:
+# logging.basicConfig(level=logging.INFO,
+#                     format="%(asctime)s [%(threadName)-12.12s] [%(levelname)-5.5s]  %(message)s")
+# 未配置时WARNING以上的日志仍会输出到stderr.
+logger = logging.getLogger('aliyun_table')
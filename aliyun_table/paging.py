@@ -0,0 +1,78 @@
+"""
+自适应的分页大小.
+
+扫描时根据每页的行数、数据量和请求耗时调整下一页请求的行数:
+耗时超过target_latency时减半, 否则加倍, 同时保证每页的数据量不超过target_bytes, 并限制在[min_size, max_size]之间.
+"""
+
+
+# get_range 每页的行数范围.
+RANGE_PAGE_SIZE = (100, 5000)
+# search 每页的行数范围.
+SEARCH_PAGE_SIZE = (10, 100)
+# 每个读服务能力单元对应的数据量.
+READ_CU_BYTES = 4 * 1024
+
+
+class FixedPageSize(object):
+    """固定的分页大小"""
+
+    def __init__(self, size):
+        self.size = size
+
+    def observe(self, row_count, nbytes, latency):
+        pass
+
+
+class AdaptivePageSize(object):
+    """
+    根据观测到的行大小和耗时调整分页大小.
+
+    :param min_size [int]: 最小行数.
+    :param max_size [int]: 最大行数.
+    :param initial [int]: 第一页的行数, 默认为100(限制在min_size和max_size之间).
+    :param target_bytes [int]: 每页的目标数据量.
+    :param target_latency [float]: 每页的目标耗时, 单位为秒.
+    """
+
+    def __init__(self, min_size, max_size, initial=100, target_bytes=2 * 1024 * 1024, target_latency=0.5):
+        self.min_size = min_size
+        self.max_size = max_size
+        self.target_bytes = target_bytes
+        self.target_latency = target_latency
+        self.size = self._clamp(initial)
+        # 平均行大小的指数移动平均.
+        self.row_bytes = None
+
+    def _clamp(self, size):
+        return max(self.min_size, min(self.max_size, int(size)))
+
+    def observe(self, row_count, nbytes, latency):
+        """记录一页的行数、数据量和耗时, 计算下一页的行数"""
+        if row_count:
+            row_bytes = nbytes / row_count
+            self.row_bytes = row_bytes if self.row_bytes is None else 0.7 * self.row_bytes + 0.3 * row_bytes
+        if latency > self.target_latency:
+            size = self.size // 2
+        elif row_count < self.size:
+            # 返回的数据不满一页(最后一页或者被过滤), 不能说明更大的页是否合适.
+            size = self.size
+        else:
+            size = self.size * 2
+        if self.row_bytes:
+            size = min(size, self.target_bytes / self.row_bytes)
+        self.size = self._clamp(size)
+
+
+def page_sizer(page_size, default_range):
+    """
+    根据page_size参数构造分页大小.
+
+    :param page_size: 整数表示固定的行数; (min, max)元组表示在该范围内自适应; None表示在default_range内自适应.
+    """
+    if page_size is None:
+        page_size = default_range
+    if isinstance(page_size, int):
+        return FixedPageSize(page_size)
+    min_size, max_size = page_size
+    return AdaptivePageSize(min_size, max_size)
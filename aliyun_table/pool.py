@@ -0,0 +1,182 @@
+"""
+进程内共享的OTSClient.
+
+相同(end_point, instance_name, 访问密钥, max_connection, socket_timeout)的``TableClient``共享同一个``OTSClient``,
+也就共享同一个连接池, 避免重复建立连接和TLS握手.
+fork之后子进程不会使用父进程的连接, 第一次使用时重新创建OTSClient.
+OTSClient使用``ObservedRetryPolicy``, SDK内部的每次重试都会通知当前线程正在进行的``Span``.
+连接池空闲超过idle_timeout秒时由后台线程关闭其中的空闲连接, 下次请求时重新建立.
+"""
+
+import hashlib
+import os
+import threading
+import time
+
+from tablestore import OTSClient, WriteRetryPolicy
+
+from aliyun_table.metrics import current_span
+from aliyun_table.my_logger import logger
+
+
+# 默认的连接池大小和socket超时(秒).
+DEFAULT_MAX_CONNECTION = 300
+DEFAULT_SOCKET_TIMEOUT = 2
+
+
+class ObservedRetryPolicy(WriteRetryPolicy):
+    """
+    与``WriteRetryPolicy``的重试策略相同, 每次决定重试时通知当前线程正在进行的``Span``,
+    使重试次数和限流在SDK重试的过程中就能被统计.
+    """
+
+    def should_retry(self, retry_times, exception, api_name):
+        retry = super().should_retry(retry_times, exception, api_name)
+        if retry:
+            span = current_span()
+            if span is not None:
+                span.retried(getattr(exception, 'code', None))
+        return retry
+
+
+def new_client(end_point, access_key_id, access_key_secret, instance_name,
+               max_connection=DEFAULT_MAX_CONNECTION, socket_timeout=DEFAULT_SOCKET_TIMEOUT):
+    """创建不共享的OTSClient"""
+    return OTSClient(end_point=end_point,
+                     access_key_id=access_key_id,
+                     access_key_secret=access_key_secret,
+                     instance_name=instance_name,
+                     max_connection=max_connection,
+                     socket_timeout=socket_timeout,
+                     retry_policy=ObservedRetryPolicy())
+
+
+def client_key(end_point, access_key_id, access_key_secret, instance_name,
+               max_connection=DEFAULT_MAX_CONNECTION, socket_timeout=DEFAULT_SOCKET_TIMEOUT):
+    """OTSClient在注册表中的键, 不直接保存密钥"""
+    secret = hashlib.sha256(f'{access_key_id}:{access_key_secret}'.encode('utf-8')).hexdigest()
+    return (end_point, instance_name, access_key_id, secret, max_connection, socket_timeout)
+
+
+class _Entry(object):
+    """注册表中的一个OTSClient, 记录进行中的请求数和最后一次使用的时间"""
+
+    def __init__(self, client):
+        self.client = client
+        self.in_flight = 0
+        self.last_used = time.monotonic()
+        self.reaped = 0
+        self._lock = threading.Lock()
+        connection = client.connection
+        send_receive = connection.send_receive
+
+        def tracked_send_receive(*args, **kwargs):
+            with self._lock:
+                self.in_flight += 1
+            try:
+                return send_receive(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self.in_flight -= 1
+                    self.last_used = time.monotonic()
+
+        connection.send_receive = tracked_send_receive
+
+    def reap(self, idle_timeout):
+        """空闲超过idle_timeout秒时关闭空闲连接, 返回是否关闭"""
+        with self._lock:
+            if self.in_flight or time.monotonic() - self.last_used < idle_timeout:
+                return False
+            # 避免在下次使用前重复关闭.
+            self.last_used = float('inf')
+        self.close()
+        self.reaped += 1
+        return True
+
+    def close(self):
+        self.client.connection.pool.clear()
+
+
+class ClientRegistry(object):
+    """
+    OTSClient的注册表, 线程安全.
+
+    e.g.
+        table_cli = TableClient(instance_name='实例名', max_connection=100, socket_timeout=5)
+        # 参数相同的客户端共享连接池
+        other_cli = TableClient(instance_name='实例名', max_connection=100, socket_timeout=5)
+
+    :param idle_timeout [float]: 连接池空闲超过idle_timeout秒时关闭其中的连接, 为None时不关闭.
+    """
+
+    def __init__(self, idle_timeout=60):
+        self.idle_timeout = idle_timeout
+        # client_key -> _Entry
+        self._entries = {}
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._reaper = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, end_point, access_key_id, access_key_secret, instance_name,
+            max_connection=DEFAULT_MAX_CONNECTION, socket_timeout=DEFAULT_SOCKET_TIMEOUT):
+        """获取参数对应的共享OTSClient, 不存在或者在fork之后则创建"""
+        key = client_key(end_point, access_key_id, access_key_secret, instance_name, max_connection, socket_timeout)
+        with self._lock:
+            self._check_fork()
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = _Entry(new_client(end_point, access_key_id, access_key_secret,
+                                                               instance_name, max_connection, socket_timeout))
+                self._start_reaper()
+            return entry.client
+
+    def _check_fork(self):
+        """fork之后丢弃父进程的连接池, 不关闭其中的连接, 以免影响父进程"""
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._entries = {}
+            self._reaper = None
+
+    def _start_reaper(self):
+        if self.idle_timeout is None or self._reaper is not None:
+            return
+        self._reaper = threading.Thread(target=self._run_reaper, name='ClientRegistry-reaper', daemon=True)
+        self._reaper.start()
+
+    def _run_reaper(self):
+        """后台线程, 定期关闭空闲的连接池"""
+        me = threading.current_thread()
+        while self._reaper is me:
+            time.sleep(self.idle_timeout / 2)
+            try:
+                self.reap_idle()
+            except Exception as e:
+                logger.error(f'Reap idle connections error, {e}')
+
+    def reap_idle(self, idle_timeout=None):
+        """
+        关闭空闲超过idle_timeout秒的连接池中的连接, 返回关闭的连接池数量.
+
+        :param idle_timeout [float]: 空闲时间, 默认为注册表的idle_timeout.
+        """
+        if idle_timeout is None:
+            idle_timeout = self.idle_timeout
+        with self._lock:
+            self._check_fork()
+            entries = list(self._entries.values())
+        return sum(entry.reap(idle_timeout) for entry in entries)
+
+    def clear(self):
+        """关闭并移除全部的OTSClient, 已经获取到的OTSClient在下次请求时重新建立连接"""
+        with self._lock:
+            self._check_fork()
+            entries, self._entries = list(self._entries.values()), {}
+        for entry in entries:
+            entry.close()
+
+
+# 默认的注册表, 所有TableClient共享.
+client_registry = ClientRegistry()
@@ -0,0 +1,263 @@
+"""
+查询条件的解析和预编译.
+
+``compile_query``把用户的查询条件一次性解析为阿里云查询对象, 生成可以重复使用的``QueryPlan``,
+相同的查询条件会直接从缓存中返回已编译的计划.
+"""
+
+import ast
+
+from tablestore import (BoolQuery, ColumnReturnType, ColumnsToGet, FieldSort, MatchAllQuery,
+                        MatchPhraseQuery, PrefixQuery, RangeQuery, Sort, SortOrder, TermQuery,
+                        TermsQuery)
+
+from aliyun_table.cache import LRUCache
+from aliyun_table.my_logger import logger
+
+
+class QueryTypeNotExistError(Exception):
+    def __init__(self, msg=None):
+        self.msg = msg
+
+    def __str__(self):
+        s = '查询类型不存在 '
+        if self.msg:
+            s = s + str(self.msg)
+        return s
+
+
+class QuerySyntaxError(Exception):
+    def __init__(self, msg=None):
+        self.msg = msg
+
+    def __str__(self):
+        s = '查询格式错误 '
+        if self.msg:
+            s = s + str(self.msg)
+        return s
+
+
+# 与其它类型的值可能相等的类型(1 == True == 1.0), 作为键时需要带上类型.
+_NUMBER_TYPES = (bool, int, float)
+
+
+def _freeze(obj):
+    """
+    将列表等可变对象递归转换为可哈希的对象, 用于构造缓存的键.
+    数值带上类型, 1、True和1.0相等但查询的类型不同, 不能共用同一个键.
+    字典和集合转换为frozenset, 不需要排序.
+    """
+    cls = type(obj)
+    if cls is str or obj is None:
+        return obj
+    if cls is tuple or cls is list:
+        return tuple(map(_freeze, obj))
+    if cls in _NUMBER_TYPES:
+        return (cls, obj)
+    if isinstance(obj, dict):
+        return frozenset((_freeze(k), _freeze(v)) for k, v in obj.items())
+    if isinstance(obj, (set, frozenset)):
+        return frozenset(map(_freeze, obj))
+    if isinstance(obj, (list, tuple)):
+        return tuple(map(_freeze, obj))
+    return (cls, obj)
+
+
+def _stable(obj):
+    """
+    把键中的frozenset递归转换为排序后的元组.
+    frozenset的遍历顺序随进程的哈希种子变化, 转换后的repr在不同进程中相同, 可以用于``DiskCache``的键.
+    """
+    if isinstance(obj, frozenset):
+        return tuple(sorted(map(_stable, obj), key=repr))
+    if isinstance(obj, tuple):
+        return tuple(map(_stable, obj))
+    return obj
+
+
+def _split_range_bounds(s):
+    """在引号外的第一个逗号处把区间内容拆分为上下限两部分"""
+    quote = None
+    for i, c in enumerate(s):
+        if quote:
+            if c == quote:
+                quote = None
+        elif c in '\'"':
+            quote = c
+        elif c == ',':
+            return s[:i], s[i + 1:]
+    raise QuerySyntaxError(s)
+
+
+def _parse_range_bound(s):
+    """解析区间的上限或下限, 只接受字面量, 为空时表示不限制"""
+    s = s.strip()
+    if not s:
+        return None
+    try:
+        return ast.literal_eval(s)
+    except (ValueError, SyntaxError):
+        raise QuerySyntaxError(s)
+
+
+def parse_range(query_content):
+    """
+    解析区间字符串.
+    e.g.
+        parse_range('(100, 200]')  # (100, 200, False, True)
+        parse_range('[1570778199000, )')  # (1570778199000, None, True, False)
+
+    :return: (lower, upper, include_lower, include_upper), 上限或下限为空时为None, 表示不限制.
+    """
+    s = query_content.strip()
+    if len(s) < 2 or s[0] not in '([' or s[-1] not in ')]':
+        raise QuerySyntaxError(query_content)
+    # 判断上限和下限的开闭区间.
+    include_lower = s[0] == '['
+    include_upper = s[-1] == ']'
+    lower, upper = _split_range_bounds(s[1:-1])
+    return _parse_range_bound(lower), _parse_range_bound(upper), include_lower, include_upper
+
+
+def build_query(query_type, column_name, query_content):
+    """
+    根据用户输入的查询条件构造单个简单阿里云查询, 支持的查询类型见``TableClient._construct_query_object``.
+    """
+    # 如果是精确查询
+    if query_type == 'term':
+        query = TermQuery(column_name, query_content)
+    elif query_type == 'terms':
+        query = TermsQuery(column_name, list(query_content))
+    # 如果是范围查询
+    elif query_type == 'range':
+        lower, upper, include_lower, include_upper = parse_range(query_content)
+        # 构造单个查询对象
+        query = RangeQuery(column_name, range_from=lower, range_to=upper, include_lower=include_lower, include_upper=include_upper)
+    elif query_type == 'phrase':
+        query = MatchPhraseQuery(column_name, query_content)
+    elif query_type == 'matchall':
+        query = MatchAllQuery()
+    elif query_type == 'prefix':
+        query = PrefixQuery(column_name, query_content)
+    else:
+        logger.error('查询类型 {} 出错,请输入正确的查询类型'.format(query_type))
+        raise QueryTypeNotExistError(query_type)
+    return query
+
+
+def build_query_list(user_query_list):
+    """将用户的输入的查询列表构造为阿里云查询对象列表."""
+    aliyun_query_list = []
+    for user_query in user_query_list or []:
+        if len(user_query) != 3:
+            raise QuerySyntaxError(user_query)
+        # 获取每个查询的查询类型，列名称，查询条件
+        query_type, col_name, query_content = user_query
+        aliyun_query_list.append(build_query(query_type, col_name, query_content))
+    return aliyun_query_list
+
+
+def build_sort(sort_list):
+    """根据用户的排序列表构造排序对象, 未指定时返回None"""
+    if not sort_list:
+        return None
+    sort_obj_list = []
+    for sort_item in sort_list:
+        if len(sort_item) != 2:
+            raise QuerySyntaxError(sort_item)
+        sort_col, sort_num = sort_item
+        # 构造升降序
+        sort_order = SortOrder.DESC if sort_num < 0 else SortOrder.ASC
+        sort_obj_list.append(FieldSort(sort_col, sort_order))
+    return Sort(sorters=sort_obj_list)
+
+
+class QueryPlan(object):
+    """
+    预编译的查询计划, 由``compile_query``生成, 可以传给``TableClient.query``和``TableClient.scan_index``重复使用.
+    相同查询条件生成的计划相等, 哈希值也相同, 可以作为字典的键.
+    """
+    __slots__ = ('key', 'bool_query', 'sort', 'column_to_get', 'columns_to_get', '_stable_key')
+
+    def __init__(self, key, bool_query, sort, column_to_get):
+        self.key = key
+        self._stable_key = None
+        self.bool_query = bool_query
+        self.sort = sort
+        self.column_to_get = column_to_get
+        # 构造返回指定的列
+        if column_to_get is None:
+            self.columns_to_get = ColumnsToGet(return_type=ColumnReturnType.ALL)
+        else:
+            self.columns_to_get = ColumnsToGet(list(column_to_get), ColumnReturnType.SPECIFIED)
+
+    @property
+    def stable_key(self):
+        """与key对应, repr在不同进程中相同的键, 用于``DiskCache``等跨进程的缓存"""
+        if self._stable_key is None:
+            self._stable_key = _stable(self.key)
+        return self._stable_key
+
+    def __eq__(self, other):
+        return isinstance(other, QueryPlan) and self.key == other.key
+
+    def __hash__(self):
+        return hash(self.key)
+
+    def __repr__(self):
+        return 'QueryPlan(%r)' % (self.key,)
+
+
+def _plan_key(must_query_list, must_not_query_list, should_query_list, sort_list, column_to_get):
+    """
+    根据查询条件构造查询计划的键, 每次query都会调用, 需要比构造查询对象快.
+    条件列表内部的顺序不影响查询结果, 因此转换为frozenset作为键; 排序列表的顺序有意义, 保持原样.
+    """
+    return (
+        frozenset(map(_freeze, must_query_list)) if must_query_list else None,
+        frozenset(map(_freeze, must_not_query_list)) if must_not_query_list else None,
+        frozenset(map(_freeze, should_query_list)) if should_query_list else None,
+        _freeze(sort_list) if sort_list else None,
+        tuple(sorted(column_to_get)) if column_to_get is not None else None,
+    )
+
+
+# 已编译的查询计划.
+_plan_cache = LRUCache(maxsize=1024, ttl=None)
+
+
+def compile_query(must_query_list=None,
+                  must_not_query_list=None,
+                  should_query_list=None,
+                  sort_list=None,
+                  column_to_get=None):
+    """
+    校验并编译查询条件, 参数格式同``TableClient.query``.
+    相同的查询条件(条件列表内部顺序无关)返回缓存中的同一个计划.
+
+    e.g.
+        plan = compile_query(must_query_list=[('range', 'like_count', '(100, 200]')],
+                             sort_list=[('datetime', -1)])
+        for row in table_cli.query('table_name', plan=plan):
+            print(row)
+
+    :return: QueryPlan
+    """
+    key = _plan_key(must_query_list, must_not_query_list, should_query_list, sort_list, column_to_get)
+    plan = _plan_cache.get(key)
+    if plan is not None:
+        return plan
+
+    # 将用户查询分别构造为阿里云的查询对象, 并组合为布尔查询.
+    must_queries = build_query_list(must_query_list)
+    must_not_queries = build_query_list(must_not_query_list)
+    should_queries = build_query_list(should_query_list)
+    if should_queries:
+        must_queries.append(BoolQuery(should_queries=should_queries))
+    if must_not_queries:
+        must_queries.append(BoolQuery(must_queries=must_not_queries))
+    bool_query = BoolQuery(must_queries=must_queries)
+
+    plan = QueryPlan(key, bool_query, build_sort(sort_list), key[-1])
+    _plan_cache.set(key, plan)
+    return plan
@@ -0,0 +1,140 @@
+"""
+按读写服务能力单元(CU)限速.
+
+``CapacityLimiter``为读和写各维护一个令牌桶, 每秒补充rate个CU.
+发送请求前等待桶中有剩余的CU, 请求完成后按服务端返回的实际消耗扣除, 因此不需要预先估算请求的大小.
+遇到服务端限流时速率乘以decrease, 之后每次成功的请求速率增加初始速率的increase倍, 直到恢复初始速率.
+同一个限速器可以被多个线程、生成器和``TableClient``共享.
+tablestore SDK内部遇到限流会自动重试, 每次重试前通过``retried``降低速率并等待令牌,
+不需要等到SDK的重试全部失败才降速(需要使用``aliyun_table.pool``创建的OTSClient).
+"""
+
+import threading
+import time
+
+
+# 写操作, 其它操作都按读操作限速.
+WRITE_OPS = frozenset(('put_row', 'update_row', 'batch_write_row'))
+# 服务端限流的错误码.
+THROTTLING_ERRORS = frozenset(('OTSServerBusy', 'OTSNotEnoughCapacityUnit', 'OTSOperationThrottled',
+                               'OTSCapacityUnitExhausted'))
+
+
+class TokenBucket(object):
+    """
+    单个令牌桶.
+
+    :param rate [float]: 每秒补充的CU.
+    :param burst [float]: 桶的容量, 为rate的倍数.
+    :param min_ratio [float]: 限流时速率的下限, 为初始速率的倍数.
+    :param decrease [float]: 限流时速率乘以的系数.
+    :param increase [float]: 每次成功时速率增加初始速率的倍数.
+    """
+
+    def __init__(self, rate, burst=1.0, min_ratio=0.1, decrease=0.7, increase=0.05):
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = rate * min_ratio
+        self.decrease = decrease
+        self.increase = increase
+        self.tokens = rate * burst
+        self.throttled_count = 0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.rate * self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait(self):
+        """等待桶中有剩余的CU, 返回等待的秒数"""
+        waited = 0
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens > 0:
+                    return waited
+                delay = -self.tokens / self.rate + 0.001
+            delay = min(delay, 1.0)
+            time.sleep(delay)
+            waited += delay
+
+    def consume(self, cu):
+        """扣除实际消耗的CU, 桶中的CU可以为负数, 之后的请求需要等待补充"""
+        if cu:
+            with self._lock:
+                self._refill()
+                self.tokens -= cu
+
+    def throttled(self):
+        """服务端限流, 降低速率并清空桶"""
+        with self._lock:
+            self._refill()
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+            self.tokens = min(self.tokens, 0)
+            self.throttled_count += 1
+
+    def succeeded(self):
+        """请求成功, 逐步恢复速率"""
+        if self.rate < self.max_rate:
+            with self._lock:
+                self._refill()
+                self.rate = min(self.max_rate, self.rate + self.max_rate * self.increase)
+
+
+class CapacityLimiter(object):
+    """
+    读写CU的限速器.
+
+    e.g.
+        limiter = CapacityLimiter(read_cu=2000, write_cu=500)
+        table_cli = TableClient(instance_name='实例名', rate_limiter=limiter)
+
+    :param read_cu [float]: 每秒最多消耗的读CU, 为None时不限制读.
+    :param write_cu [float]: 每秒最多消耗的写CU, 为None时不限制写.
+    :param burst [float]: 允许的突发量, 为每秒CU的倍数.
+    :param min_ratio [float]: 限流时速率的下限, 为初始速率的倍数.
+    :param decrease [float]: 限流时速率乘以的系数.
+    :param increase [float]: 每次成功时速率增加初始速率的倍数.
+    """
+
+    def __init__(self, read_cu=None, write_cu=None, burst=1.0, min_ratio=0.1, decrease=0.7, increase=0.05):
+        options = {'burst': burst, 'min_ratio': min_ratio, 'decrease': decrease, 'increase': increase}
+        self.read = TokenBucket(read_cu, **options) if read_cu else None
+        self.write = TokenBucket(write_cu, **options) if write_cu else None
+
+    def _bucket(self, op):
+        return self.write if op in WRITE_OPS else self.read
+
+    def acquire(self, op):
+        """发送请求前调用, 等待对应的桶中有剩余的CU"""
+        bucket = self._bucket(op)
+        if bucket is not None:
+            bucket.wait()
+
+    def retried(self, op, error):
+        """SDK内部重试前调用, 被限流时降低速率, 并等待桶中有剩余的CU后再重试"""
+        bucket = self._bucket(op)
+        if bucket is None or error not in THROTTLING_ERRORS:
+            return
+        bucket.throttled()
+        bucket.wait()
+
+    def observe(self, span):
+        """请求完成后调用, 按实际消耗扣除CU, 并根据是否被限流调整速率"""
+        if self.read is not None:
+            self.read.consume(span.read_cu)
+        if self.write is not None:
+            self.write.consume(span.write_cu)
+        bucket = self._bucket(span.op)
+        if bucket is None:
+            return
+        errors = list(span.row_errors)
+        if span.error is not None:
+            errors.append(span.error.rsplit('/', 1)[-1])
+        if any(error in THROTTLING_ERRORS for error in errors):
+            bucket.throttled()
+        else:
+            bucket.succeeded()
@@ -0,0 +1,179 @@
+"""
+轻量的行记录格式.
+
+``query``/``query_all``的``row_format``参数:
+    'dict':  每行一个字典(默认, 同``item2dict``).
+    'tuple': 每行一个``RowTuple``(tuple的子类), 不可变, 占用内存最少.
+    'slots': 每行一个``RowRecord``(使用__slots__), 可以修改已有的列.
+    'raw':   每行一个(主键列, 属性列)元组, 即tablestore返回的原始数据, 不做任何转换.
+RowTuple和RowRecord都可以通过列名(row['col'])、属性(row.col)或者``get``访问, 缺失的列为None.
+同一页的数据共享一个由列集合生成的记录类型, 列的下标只计算一次.
+"""
+
+from tablestore import Row
+
+from aliyun_table.cache import LRUCache
+
+
+ROW_FORMATS = ('dict', 'tuple', 'slots', 'raw')
+
+
+def _split_row(row):
+    """返回行的主键列和属性列, 兼容Row对象和search返回的(主键, 属性)元组"""
+    if isinstance(row, Row):
+        return row.primary_key, row.attribute_columns
+    return row
+
+
+class RowTuple(tuple):
+    """不可变的行记录, 字段由所在页的列集合决定."""
+    __slots__ = ()
+    _fields = ()
+    _index = {}
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return tuple.__getitem__(self, self._index[key])
+        return tuple.__getitem__(self, key)
+
+    def __getattr__(self, name):
+        try:
+            return tuple.__getitem__(self, self._index[name])
+        except KeyError:
+            raise AttributeError(name)
+
+    def __reduce__(self):
+        return _rebuild_record, ('tuple', self._fields, tuple(self))
+
+    def __repr__(self):
+        return 'RowTuple(%s)' % ', '.join('%s=%r' % item for item in zip(self._fields, self))
+
+    def get(self, name, default=None):
+        ind = self._index.get(name)
+        return default if ind is None else tuple.__getitem__(self, ind)
+
+    def keys(self):
+        return self._fields
+
+    def _asdict(self):
+        return dict(zip(self._fields, self))
+
+
+class RowRecord(object):
+    """使用__slots__的行记录, 字段由所在页的列集合决定, 可以修改已有的列."""
+    __slots__ = ('_values',)
+    _fields = ()
+    _index = {}
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return self._values[self._index[key]]
+        return self._values[key]
+
+    def __setitem__(self, key, value):
+        if isinstance(key, str):
+            key = self._index[key]
+        self._values[key] = value
+
+    def __getattr__(self, name):
+        try:
+            return self._values[self._index[name]]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __iter__(self):
+        return iter(self._values)
+
+    def __len__(self):
+        return len(self._values)
+
+    def __eq__(self, other):
+        if isinstance(other, RowRecord):
+            return self._fields == other._fields and self._values == other._values
+        return NotImplemented
+
+    def __reduce__(self):
+        return _rebuild_record, ('slots', self._fields, tuple(self._values))
+
+    def __repr__(self):
+        return 'RowRecord(%s)' % ', '.join('%s=%r' % item for item in zip(self._fields, self._values))
+
+    def get(self, name, default=None):
+        ind = self._index.get(name)
+        return default if ind is None else self._values[ind]
+
+    def keys(self):
+        return self._fields
+
+    def _asdict(self):
+        return dict(zip(self._fields, self._values))
+
+
+# (row_format, fields) -> 记录类型
+_record_classes = LRUCache(maxsize=1024, ttl=None)
+
+
+def record_class(row_format, fields):
+    """获取列集合对应的记录类型, 相同的列集合复用同一个类型"""
+    key = (row_format, fields)
+    cls = _record_classes.get(key)
+    if cls is None:
+        base = RowTuple if row_format == 'tuple' else RowRecord
+        index = {name: i for i, name in enumerate(fields)}
+        cls = type(base.__name__, (base,), {'__slots__': (), '_fields': fields, '_index': index})
+        _record_classes.set(key, cls)
+    return cls
+
+
+def _rebuild_record(row_format, fields, values):
+    """pickle时重建记录"""
+    cls = record_class(row_format, fields)
+    if row_format == 'tuple':
+        return tuple.__new__(cls, values)
+    record = object.__new__(cls)
+    record._values = list(values)
+    return record
+
+
+def page_fields(rows):
+    """按出现顺序返回一页数据中的全部列名, 主键列在前. rows为(主键, 属性)元组的列表"""
+    fields = {}
+    for pkvs, ckvs in rows:
+        for pk, _ in pkvs:
+            fields[pk] = None
+        for column in ckvs:
+            fields[column[0]] = None
+    return tuple(fields)
+
+
+def page_records(rows, row_format):
+    """将一页数据转换为row_format格式的记录列表"""
+    if not rows:
+        return []
+    rows = [_split_row(row) for row in rows]
+    cls = record_class(row_format, page_fields(rows))
+    index = cls._index
+    field_count = len(cls._fields)
+    records = []
+    append = records.append
+    if row_format == 'tuple':
+        new = tuple.__new__
+        for pkvs, ckvs in rows:
+            values = [None] * field_count
+            for pk, pv in pkvs:
+                values[index[pk]] = pv
+            for ck, cv, _ in ckvs:
+                values[index[ck]] = cv
+            append(new(cls, values))
+    else:
+        new = object.__new__
+        for pkvs, ckvs in rows:
+            values = [None] * field_count
+            for pk, pv in pkvs:
+                values[index[pk]] = pv
+            for ck, cv, _ in ckvs:
+                values[index[ck]] = cv
+            record = new(cls)
+            record._values = values
+            append(record)
+    return records
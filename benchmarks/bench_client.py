@@ -0,0 +1,150 @@
+"""
+TableClient的性能测试, 使用内存中的表格存储(``aliyun_table.fake``), 不需要网络和账号.
+输出不同表大小下query_all、query、put_row、update_row、put_rows每秒处理的行数、每行的CPU时间和内存峰值.
+CPU时间和内存包括内存表格存储本身的开销, 用于对比客户端改动前后的结果, 不代表线上的绝对性能.
+
+    python -m benchmarks.bench_client
+    python -m benchmarks.bench_client --sizes 1000 100000 --latency 0.002 --json result.json
+    # 1%的请求被限流, 按SDK的重试策略等待后重试
+    python -m benchmarks.bench_client --throttle-rate 0.01
+    # 与之前的结果对比, 任意一项的行数/秒下降超过20%时返回非0
+    python -m benchmarks.bench_client --compare result.json --threshold 0.2
+"""
+
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+
+from aliyun_table.fake import FakeOTSClient, fake_table_client
+
+
+TABLE = 'bench'
+PK_LIST = ['id']
+# 写入操作的行数上限, 避免大表时单行写入耗时过长.
+MAX_WRITE_ROWS = 2000
+
+
+def make_row(i):
+    return {'id': i,
+            'title': f'This is test article {i}.',
+            'user': f'user{i % 100}',
+            'like_count': i % 1000,
+            'tags': ['tag%d' % (i % 7), 'tag%d' % (i % 11)]}
+
+
+def query_all(client, size):
+    return sum(1 for _ in client.query_all(TABLE, primary_key='id'))
+
+
+def query(client, size):
+    return sum(1 for _ in client.query(TABLE, [('range', 'like_count', '[0, 1000)')]))
+
+
+def put_row(client, size):
+    n = min(size, MAX_WRITE_ROWS)
+    for i in range(n):
+        client.put_row(TABLE, PK_LIST, make_row(size + i))
+    return n
+
+
+def update_row(client, size):
+    n = min(size, MAX_WRITE_ROWS)
+    for i in range(n):
+        client.update_row(TABLE, PK_LIST, {'id': i, 'like_count': i % 1000 + 1})
+    return n
+
+
+def put_rows(client, size):
+    client.put_rows(TABLE, PK_LIST, (make_row(size + i) for i in range(size)))
+    return size
+
+
+OPS = {
+    'query_all': query_all,
+    'query': query,
+    'put_row': put_row,
+    'update_row': update_row,
+    'put_rows': put_rows,
+}
+
+
+def new_client(size, latency, throttle_rate=0.0):
+    backend = FakeOTSClient(latency=latency, throttle_rate=throttle_rate)
+    backend.load(TABLE, PK_LIST, (make_row(i) for i in range(size)))
+    return fake_table_client(backend)
+
+
+def run(op, size, latency=0, repeat=3, throttle_rate=0.0):
+    """
+    运行一项测试, 每次使用新的数据, 取最快的一次.
+
+    :return: {'rows_per_sec', 'cpu_us_per_row', 'peak_kb'}
+    """
+    func = OPS[op]
+    best = None
+    for _ in range(repeat):
+        client = new_client(size, latency, throttle_rate)
+        start, cpu_start = time.perf_counter(), time.process_time()
+        rows = func(client, size)
+        elapsed, cpu = time.perf_counter() - start, time.process_time() - cpu_start
+        result = {'rows_per_sec': rows / elapsed, 'cpu_us_per_row': cpu / rows * 1e6}
+        if best is None or result['rows_per_sec'] > best['rows_per_sec']:
+            best = result
+    # tracemalloc会拖慢运行, 单独运行一次统计内存峰值, 不包括准备的数据.
+    client = new_client(size, latency, throttle_rate)
+    tracemalloc.start()
+    try:
+        func(client, size)
+        best['peak_kb'] = tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+    return best
+
+
+def compare(results, baseline, threshold):
+    """返回行数/秒相对baseline下降超过threshold的测试项"""
+    regressions = []
+    for key, result in results.items():
+        base = baseline.get(key)
+        if base and result['rows_per_sec'] < base['rows_per_sec'] * (1 - threshold):
+            regressions.append((key, base['rows_per_sec'], result['rows_per_sec']))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000], help='表的行数')
+    parser.add_argument('--ops', nargs='+', choices=list(OPS), default=list(OPS), help='测试的操作')
+    parser.add_argument('--latency', type=float, default=0, help='每次请求的延迟(秒)')
+    parser.add_argument('--throttle-rate', type=float, default=0.0,
+                        help='请求被限流的概率, 被限流的请求按SDK的重试策略等待后重试')
+    parser.add_argument('--repeat', type=int, default=3, help='每项测试的运行次数, 取最快的一次')
+    parser.add_argument('--json', help='把结果保存为json文件')
+    parser.add_argument('--compare', help='与之前保存的json结果对比')
+    parser.add_argument('--threshold', type=float, default=0.2, help='行数/秒下降超过该比例时视为性能退化')
+    args = parser.parse_args(argv)
+
+    results = {}
+    print('%-12s %10s %14s %14s %12s' % ('op', 'size', 'rows/s', 'cpu(us)/row', 'peak(KB)'))
+    for size in args.sizes:
+        for op in args.ops:
+            result = results[f'{op}:{size}'] = run(op, size, args.latency, args.repeat, args.throttle_rate)
+            print('%-12s %10d %14.0f %14.2f %12.0f' % (op, size, result['rows_per_sec'],
+                                                       result['cpu_us_per_row'], result['peak_kb']))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        for key, before, after in regressions:
+            print(f'{key} regressed: {before:.0f} -> {after:.0f} rows/s')
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,39 @@
+"""
+嵌套列编解码器的性能测试, 输出每行数据编码和解码的耗时.
+
+    python -m benchmarks.bench_codec
+"""
+
+import json
+import time
+from copy import deepcopy
+
+from aliyun_table.codec import benchmark
+
+
+SAMPLE = {
+    'id': 1,
+    'title': 'This is a test article.',
+    'payload': {'tags': ['tag%d' % i for i in range(50)],
+                'scores': [i * 0.5 for i in range(100)],
+                'author': {'name': '用户9523', 'followers': 12345}},
+    'comments': [{'user': 'u%d' % i, 'text': 'comment ' * 10} for i in range(20)],
+}
+
+
+def deepcopy_json(data, number=10000):
+    """之前的写入方式: 复制整个字典后用json编码dict/list类型的值"""
+    start = time.perf_counter()
+    for _ in range(number):
+        new_data = deepcopy(data)
+        for item in new_data:
+            if isinstance(new_data[item], (dict, list)):
+                new_data[item] = json.dumps(new_data[item])
+    return (time.perf_counter() - start) / number * 1e6
+
+
+if __name__ == '__main__':
+    print('%-16s %12s %12s' % ('codec', 'encode(us)', 'decode(us)'))
+    print('%-16s %12.2f %12s' % ('deepcopy+json', deepcopy_json(SAMPLE), '-'))
+    for name, (encode_cost, decode_cost) in benchmark(SAMPLE).items():
+        print('%-16s %12.2f %12.2f' % (name, encode_cost, decode_cost))
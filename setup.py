@@ -35,7 +35,12 @@ setup(
         "License :: OSI Approved :: MIT License",
         "Operating System :: OS Independent",
     ],
-    python_requires='>=3.6',
-    install_requires=['pprint', 'tablestore', 'prettytable']
+    python_requires='>=3.7',
+    install_requires=['pprint', 'tablestore', 'prettytable'],
+    extras_require={
+        'columnar': ['numpy', 'pandas'],
+        'parquet': ['pyarrow'],
+        'codec': ['orjson', 'msgpack'],
+    },
 
 )
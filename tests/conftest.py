@@ -0,0 +1,13 @@
+import pytest
+
+from aliyun_table.fake import FakeOTSClient, fake_table_client
+
+
+@pytest.fixture
+def backend():
+    return FakeOTSClient()
+
+
+@pytest.fixture
+def client(backend):
+    return fake_table_client(backend)
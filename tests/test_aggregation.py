@@ -0,0 +1,53 @@
+import pytest
+
+from aliyun_table.aggregation import agg_name, build_agg_list
+from aliyun_table.query_plan import QuerySyntaxError, QueryTypeNotExistError
+
+
+def load(backend):
+    """用户u0..u3, 用户ui有10 * (i + 1)行, like从0开始递增"""
+    rows = [{'user': f'u{i}', 'like': j} for i in range(4) for j in range(10 * (i + 1))]
+    backend.load('t', ['id'], ({'id': n, **row} for n, row in enumerate(rows)))
+
+
+def test_count(backend, client):
+    load(backend)
+    assert client.count('t') == 100
+    assert client.count('t', [('term', 'user', 'u1')]) == 20
+    assert client.count('t', [('range', 'like', '[30, )')]) == 10
+    assert backend.requests['search'] == 3
+
+
+def test_aggregate(backend, client):
+    load(backend)
+    result = client.aggregate('t', [('sum', 'like'), ('max', 'like', 'top'), ('min', 'like'), ('avg', 'like'),
+                                    ('distinct_count', 'user'), ('count', 'like')],
+                              must_query_list=[('term', 'user', 'u1')])
+    assert result == {'sum_like': 190, 'top': 19, 'min_like': 0, 'avg_like': 9.5, 'distinct_count_user': 1,
+                      'count_like': 20, '_count': 20}
+    assert backend.requests['search'] == 1
+
+
+def test_group_by(backend, client):
+    load(backend)
+    groups = client.group_by('t', 'user', aggs=[('max', 'like', 'top')])
+    assert [(group['key'], group['count'], group['top']) for group in groups] == [
+        ('u3', 40, 39), ('u2', 30, 29), ('u1', 20, 19), ('u0', 10, 9)]
+    groups = client.group_by('t', 'user', size=2, sort_list=[('_key', 1)],
+                             must_query_list=[('range', 'like', '[10, )')])
+    assert [group['key'] for group in groups] == ['u1', 'u2']
+
+
+def test_invalid_aggregations():
+    assert agg_name(('sum', 'like')) == 'sum_like'
+    with pytest.raises(QueryTypeNotExistError):
+        build_agg_list([('median', 'like')])
+    with pytest.raises(QuerySyntaxError):
+        build_agg_list([('sum', 'like'), ('max', 'like', 'sum_like')])
+    with pytest.raises(QuerySyntaxError):
+        build_agg_list([('sum',)])
+
+
+def test_group_by_size_limit(client):
+    with pytest.raises(QuerySyntaxError):
+        client.group_by('t', 'user', size=2001)
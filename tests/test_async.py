@@ -0,0 +1,80 @@
+import asyncio
+import time
+
+from aliyun_table.async_client import AsyncTableClient
+from aliyun_table.fake import FakeOTSClient, fake_table_client
+
+
+def test_cancel_while_fetching():
+    backend = FakeOTSClient(latency=0.02)
+    backend.load('t', ['id'], ({'id': i} for i in range(5000)))
+    client = fake_table_client(backend)
+
+    async def consume(async_client):
+        async for _ in async_client.query_all('t', primary_key='id', page_size=(100, 100)):
+            pass
+
+    async def main():
+        async with AsyncTableClient(table_client=client, chunk_size=10) as async_client:
+            assert await async_client.put_row('t', ['id'], {'id': -1, 'v': 1}) == {'id': -1}
+            task = asyncio.ensure_future(consume(async_client))
+            await asyncio.sleep(0.05)
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+            rows = async_client.query_all('t', primary_key='id')
+            first = await rows.__anext__()
+            await rows.aclose()
+            return first
+
+    assert asyncio.run(main()) == {'id': -1, 'v': 1}
+
+
+def test_exit_does_not_block_the_event_loop():
+    client = fake_table_client(FakeOTSClient(latency=0.3))
+    ticks = []
+
+    async def ticker():
+        while True:
+            ticks.append(time.monotonic())
+            await asyncio.sleep(0.01)
+
+    async def main():
+        tick_task = asyncio.ensure_future(ticker())
+        async with AsyncTableClient(table_client=client) as async_client:
+            write = asyncio.ensure_future(async_client.put_row('t', ['id'], {'id': 1, 'v': 1}))
+            await asyncio.sleep(0.05)
+        # 退出时等待在途的写入完成, 同时事件循环中的其它任务继续运行.
+        assert write.done()
+        tick_task.cancel()
+        return max(b - a for a, b in zip(ticks, ticks[1:]))
+
+    assert asyncio.run(main()) < 0.2
+
+
+def test_concurrency_is_bounded():
+    backend = FakeOTSClient(latency=0.02)
+    client = fake_table_client(backend)
+    running = []
+    peak = 0
+    put_row = backend.put_row
+
+    def observed_put_row(*args, **kwargs):
+        nonlocal peak
+        running.append(1)
+        peak = max(peak, len(running))
+        try:
+            return put_row(*args, **kwargs)
+        finally:
+            running.pop()
+
+    backend.put_row = observed_put_row
+
+    async def main():
+        async with AsyncTableClient(table_client=client, concurrency=4) as async_client:
+            return await asyncio.gather(*(async_client.put_row('t', ['id'], {'id': i, 'v': i}) for i in range(20)))
+
+    assert asyncio.run(main()) == [{'id': i} for i in range(20)]
+    assert peak <= 4
@@ -0,0 +1,68 @@
+import pytest
+
+from aliyun_table.fake import FakeOTSClient, fake_table_client
+
+
+@pytest.fixture(autouse=True)
+def no_retry_delay(monkeypatch):
+    monkeypatch.setattr('aliyun_table.client.time.sleep', lambda seconds: None)
+
+
+def test_writes_are_coalesced(backend, client):
+    with client.buffered_writer('t', ['id'], max_rows=1000, flush_interval=60) as writer:
+        writer.update_row({'id': 1, 'a': 1})
+        writer.update_row({'id': 1, 'b': 2})
+        writer.put_row({'id': 2, 'a': 1, 'b': 1})
+        writer.put_row({'id': 2, 'a': 2})
+        writer.put_row({'id': 3, 'a': 1})
+        writer.update_row({'id': 3, 'b': 2})
+        assert len(writer) == 3
+    assert writer.submitted == 6
+    assert writer.coalesced == 3
+    assert writer.written == 3
+    assert backend.requests['batch_write_row'] == 1
+    assert client.get_rows('t', [{'id': 1}, {'id': 2}, {'id': 3}]) == [
+        {'id': 1, 'a': 1, 'b': 2}, {'id': 2, 'a': 2}, {'id': 3, 'a': 1, 'b': 2}]
+
+
+def test_flush_writes_immediately(backend, client):
+    writer = client.buffered_writer('t', ['id'], max_rows=1000, flush_interval=60)
+    writer.put_row({'id': 1, 'v': 1})
+    assert client.get_rows('t', [{'id': 1}]) == [None]
+    writer.flush()
+    assert len(writer) == 0
+    assert client.get_rows('t', [{'id': 1}]) == [{'id': 1, 'v': 1}]
+    writer.close()
+    assert writer.flushes == 1
+    with pytest.raises(RuntimeError, match='closed'):
+        writer.put_row({'id': 2, 'v': 2})
+
+
+def test_failed_rows_are_passed_to_on_error():
+    backend = FakeOTSClient(row_error_rate=1.0)
+    client = fake_table_client(backend)
+    errors = []
+    with client.buffered_writer('t', ['id'], on_error=lambda *args: errors.append(args), max_retry=1) as writer:
+        writer.update_row({'id': 1, 'v': 1})
+        writer.update_row({'id': 1, 'w': 2})
+    assert writer.failed == 1
+    assert [(op, data) for op, data, _ in errors] == [('update', {'id': 1, 'v': 1, 'w': 2})]
+
+
+def test_buffered_writer_bounds_in_flight_rows():
+    backend = FakeOTSClient(latency=0.01)
+    client = fake_table_client(backend)
+    peak = 0
+    batch_write_row = backend.batch_write_row
+
+    def observed(request):
+        nonlocal peak
+        peak = max(peak, len(writer) + writer._in_flight)
+        return batch_write_row(request)
+
+    backend.batch_write_row = observed
+    with client.buffered_writer('t', ['id'], max_rows=50, max_buffer=100, flush_interval=0.01) as writer:
+        for i in range(1000):
+            writer.put_row({'id': i, 'v': i})
+    assert writer.written == 1000
+    assert peak <= 100
@@ -0,0 +1,82 @@
+import pickle
+
+import pytest
+
+from aliyun_table.codec import encode_columns, get_codec, page_decoder
+from aliyun_table.fake import fake_table_client
+
+PAYLOAD = {'tags': ['a', 'b'], 'scores': [1, 2.5], 'name': '新闻'}
+
+
+def stored(backend, table_name, pk, column):
+    return backend._tables[table_name].rows[(pk,)][column][0][0]
+
+
+@pytest.mark.parametrize('name', ['json', 'orjson', 'msgpack'])
+def test_round_trip(name):
+    if name != 'json':
+        pytest.importorskip(name)
+    codec = get_codec(name)
+    _, attribute_columns = encode_columns({'id': 1, 'payload': PAYLOAD, 'title': 'x'}, ['id'], codec)
+    assert attribute_columns[1] == ('title', 'x')
+    decode_page = pickle.loads(pickle.dumps(page_decoder(codec, ['payload'])))
+    [(pkvs, ckvs)] = decode_page([([], [(k, v, 0) for k, v in attribute_columns])])
+    assert ckvs == [('payload', PAYLOAD, 0), ('title', 'x', 0)]
+
+
+def test_json_and_orjson_are_compatible():
+    pytest.importorskip('orjson')
+    json_codec, orjson_codec = get_codec('json'), get_codec('orjson')
+    assert orjson_codec.decode(json_codec.encode(PAYLOAD)) == PAYLOAD
+    assert json_codec.decode(orjson_codec.encode(PAYLOAD)) == PAYLOAD
+    # 普通字符串原样返回.
+    assert orjson_codec.decode('not json') == 'not json'
+
+
+def test_unknown_codec():
+    with pytest.raises(ValueError, match='codec should be one of'):
+        get_codec('yaml')
+
+
+def test_nested_columns_are_decoded_on_read(backend):
+    client = fake_table_client(backend, nested_columns={'t': ['payload']})
+    client.put_row('t', ['id'], {'id': 1, 'payload': PAYLOAD, 'note': '{"a": 1}'})
+    assert isinstance(stored(backend, 't', 1, 'payload'), str)
+    row = next(client.query_all('t', primary_key='id'))
+    assert row['payload'] == PAYLOAD
+    # 不在nested_columns中的列不解码.
+    assert row['note'] == '{"a": 1}'
+    assert client.get_rows('t', [{'id': 1}])[0]['payload'] == PAYLOAD
+
+
+def test_table_codecs(backend):
+    pytest.importorskip('msgpack')
+    client = fake_table_client(backend, table_codecs={'binary': 'msgpack'},
+                               nested_columns={'t': ['payload'], 'binary': ['payload']})
+    client.put_rows('t', ['id'], [{'id': 1, 'payload': PAYLOAD}])
+    client.put_rows('binary', ['id'], [{'id': 1, 'payload': PAYLOAD}])
+    assert isinstance(stored(backend, 't', 1, 'payload'), str)
+    assert isinstance(stored(backend, 'binary', 1, 'payload'), bytearray)
+    for table_name in ('t', 'binary'):
+        assert next(client.query_all(table_name, primary_key='id'))['payload'] == PAYLOAD
+
+
+class TaggedCodec(object):
+    """在json前加上标记的编解码器, 用于区分写入时使用的编解码器"""
+
+    def encode(self, value):
+        return 'tagged:' + get_codec('json').encode(value)
+
+    def decode(self, value):
+        return get_codec('json').decode(value[len('tagged:'):])
+
+
+def test_table_codecs_accept_codec_objects(backend):
+    client = fake_table_client(backend, table_codecs={'tagged': TaggedCodec()},
+                               nested_columns={'t': ['payload'], 'tagged': ['payload']})
+    client.put_rows('t', ['id'], [{'id': 1, 'payload': PAYLOAD}])
+    client.put_rows('tagged', ['id'], [{'id': 1, 'payload': PAYLOAD}])
+    assert stored(backend, 't', 1, 'payload').startswith('{')
+    assert stored(backend, 'tagged', 1, 'payload').startswith('tagged:')
+    for table_name in ('t', 'tagged'):
+        assert next(client.query_all(table_name, primary_key='id'))['payload'] == PAYLOAD
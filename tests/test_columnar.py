@@ -0,0 +1,46 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+
+
+@pytest.fixture
+def client(backend, client):
+    backend.load('t', ['id'], ({'id': i, 'like': i * 10, 'user': f'u{i}'} if i % 3 else {'id': i, 'user': f'u{i}'}
+                               for i in range(25)))
+    return client
+
+
+def test_iter_batches(backend, client):
+    batches = list(client.iter_batches('t', batch_size=10, primary_key='id'))
+    assert [len(batch['id']) for batch in batches] == [10, 10, 5]
+    first = batches[0]
+    assert first['id'].dtype == np.int64
+    assert first['user'].dtype == object
+    # 有缺失值的整数列转为float64, 缺失值为nan.
+    assert first['like'].dtype == np.float64
+    assert np.isnan(first['like'][0]) and first['like'][1] == 10
+
+
+def test_columns_dtypes_and_fill_values(backend, client):
+    batch = next(client.iter_batches('t', batch_size=100, columns=['id', 'like', 'missing'],
+                                     dtypes={'like': 'int32'}, fill_values={'like': -1}, primary_key='id'))
+    assert list(batch) == ['id', 'like', 'missing']
+    assert batch['like'].dtype == np.int32
+    assert batch['like'][:3].tolist() == [-1, 10, 20]
+    assert batch['missing'].tolist() == [None] * 25
+    with pytest.raises(ValueError):
+        next(client.iter_batches('t', columns=['id', 'like'], dtypes={'like': 'int64'}, primary_key='id'))
+
+
+def test_iter_batches_with_index(backend, client):
+    batches = list(client.iter_batches('t', batch_size=4, use_index=True, columns=['id', 'user'],
+                                       must_query_list=[('range', 'id', '[0, 10)')]))
+    assert sum(len(batch['id']) for batch in batches) == 10
+    assert batches[0]['user'][0] == 'u0'
+
+
+def test_dataframe(backend, client):
+    pytest.importorskip('pandas')
+    frame = next(client.iter_batches('t', batch_size=100, as_dataframe=True, primary_key='id'))
+    assert list(frame.columns) == ['id', 'like', 'user']
+    assert len(frame) == 25
@@ -0,0 +1,91 @@
+import json
+
+import pytest
+
+import aliyun_table.client
+
+
+@pytest.fixture
+def client(backend, client):
+    backend.load('c', ['a', 'b'], ({'a': a, 'b': b, 'v': a * 1000 + b} for a in range(3) for b in range(300)))
+    return client
+
+
+def read_jsonl(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_export_resumes_composite_primary_key(client, tmp_path, monkeypatch):
+    path, checkpoint = str(tmp_path / 'c.jsonl'), str(tmp_path / 'c.ckpt')
+    write_pages = aliyun_table.client.write_pages
+
+    def interrupted(pages, *args):
+        def first_page():
+            for i, page in enumerate(pages):
+                if i == 1:
+                    raise KeyboardInterrupt
+                yield page
+        return write_pages(first_page(), *args)
+
+    monkeypatch.setattr(aliyun_table.client, 'write_pages', interrupted)
+    options = {'checkpoint': checkpoint, 'chunk_size': 100, 'primary_key': ['a', 'b'], 'page_size': (100, 100),
+               'prefetch': 0}
+    with pytest.raises(KeyboardInterrupt):
+        client.export_table('c', path, **options)
+    monkeypatch.setattr(aliyun_table.client, 'write_pages', write_pages)
+
+    state = client.export_table('c', path, **options)
+    rows = read_jsonl(path)
+    assert state['rows'] == 900
+    assert [(row['a'], row['b']) for row in rows] == [(a, b) for a in range(3) for b in range(300)]
+
+
+def test_export_rejects_query_kwargs_without_index(client, tmp_path):
+    with pytest.raises(TypeError):
+        client.export_table('c', str(tmp_path / 'c.jsonl'), primary_key=['a', 'b'],
+                            must_query_list=[('term', 'v', 1)])
+
+
+def test_export_passes_column_filter(client, tmp_path):
+    from tablestore import ComparatorType, SingleColumnCondition
+
+    path = str(tmp_path / 'c.jsonl')
+    state = client.export_table('c', path, primary_key=['a', 'b'],
+                                column_filter=SingleColumnCondition('v', 10, ComparatorType.LESS_THAN))
+    assert state['rows'] == 10
+    assert [row['v'] for row in read_jsonl(path)] == list(range(10))
+
+
+def test_export_with_index(client, tmp_path):
+    path = str(tmp_path / 'c.jsonl')
+    state = client.export_table('c', path, use_index=True, must_query_list=[('range', 'v', '[1000, 1010)')])
+    assert state['rows'] == 10
+
+
+def test_export_gzip_csv(client, tmp_path):
+    import csv
+    import gzip
+
+    path = str(tmp_path / 'c.csv.gz')
+    state = client.export_table('c', path, format='csv', compression='gzip', primary_key=['a', 'b'],
+                                columns=['a', 'b', 'v'], chunk_size=250, page_size=(100, 100))
+    assert state['rows'] == 900
+    # 每块在整页的边界结束.
+    assert state['chunks'] == 3
+    with gzip.open(path, 'rt', newline='') as f:
+        rows = list(csv.DictReader(f))
+    assert rows[0] == {'a': '0', 'b': '0', 'v': '0'}
+    assert len(rows) == 900
+
+
+def test_finished_export_is_not_repeated(backend, client, tmp_path):
+    path, checkpoint = str(tmp_path / 'c.jsonl'), str(tmp_path / 'c.ckpt')
+    client.export_table('c', path, checkpoint=checkpoint, primary_key=['a', 'b'])
+    requests = backend.requests['get_range']
+    state = client.export_table('c', path, checkpoint=checkpoint, primary_key=['a', 'b'])
+    assert state['done'] and state['rows'] == 900
+    assert backend.requests['get_range'] == requests
+    # 参数与checkpoint不一致时不继续.
+    with pytest.raises(ValueError):
+        client.export_table('c', str(tmp_path / 'other.jsonl'), checkpoint=checkpoint, primary_key=['a', 'b'])
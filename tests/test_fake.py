@@ -0,0 +1,65 @@
+import pytest
+from tablestore import (INF_MAX, INF_MIN, BatchWriteRowRequest, OTSServiceError, PutRowItem, Row,
+                        TableInBatchWriteRowItem)
+from tablestore.retry import NoRetryPolicy
+
+from aliyun_table.fake import FakeOTSClient, fake_table_client
+from aliyun_table.metrics import Metrics
+from aliyun_table.pool import ObservedRetryPolicy
+
+
+class ZeroDelayRetryPolicy(ObservedRetryPolicy):
+    """与默认的重试策略相同, 最多重试max_retry_times次, 不等待"""
+
+    def __init__(self, max_retry_times=20):
+        self.max_retry_times = max_retry_times
+
+    def get_retry_delay(self, retry_times, exception, api_name):
+        return 0
+
+
+def test_get_range_returns_primary_key_only_rows(backend):
+    backend.load('t', ['id'], ({'id': i, 'v': i} for i in range(10)))
+    _, _, rows, _ = backend.get_range('t', 'FORWARD', [('id', INF_MIN)], [('id', INF_MAX)], columns_to_get=['id'])
+    assert [row.primary_key for row in rows] == [[('id', i)] for i in range(10)]
+    assert all(row.attribute_columns == [] for row in rows)
+    # 指定的属性列都不存在时不返回该行.
+    _, _, rows, _ = backend.get_range('t', 'FORWARD', [('id', INF_MIN)], [('id', INF_MAX)], columns_to_get=['x'])
+    assert rows == []
+
+
+def test_throttled_requests_are_retried_by_the_retry_policy():
+    backend = FakeOTSClient(throttle_rate=0.5, retry_policy=ZeroDelayRetryPolicy())
+    metrics = Metrics()
+    client = fake_table_client(backend, metrics=metrics)
+    for i in range(20):
+        assert client.put_row('t', ['id'], {'id': i, 'v': i}) == {'id': i}
+    assert backend.requests['put_row'] > 20
+    assert metrics.snapshot()[('put_row', 't')]['retries'] == backend.requests['put_row'] - 20
+
+
+def test_errors_are_raised_when_the_retry_policy_gives_up():
+    backend = FakeOTSClient(throttle_rate=1.0, retry_policy=ZeroDelayRetryPolicy(max_retry_times=3))
+    with pytest.raises(OTSServiceError) as excinfo:
+        backend.list_table()
+    assert excinfo.value.code == 'OTSServerBusy'
+    assert backend.requests['list_table'] == 4
+
+    backend = FakeOTSClient(throttle_rate=1.0, retry_policy=NoRetryPolicy())
+    with pytest.raises(OTSServiceError):
+        backend.list_table()
+    assert backend.requests['list_table'] == 1
+
+
+def test_batch_write_rejects_duplicate_primary_keys(backend):
+    request = BatchWriteRowRequest()
+    request.add(TableInBatchWriteRowItem('t', [PutRowItem(Row([('id', 1)], [('v', i)]), None) for i in range(2)]))
+    with pytest.raises(OTSServiceError) as excinfo:
+        backend.batch_write_row(request)
+    assert excinfo.value.code == 'OTSParameterInvalid'
+
+
+def test_term_query_matches_value_types(backend, client):
+    backend.load('t', ['id'], [{'id': 1, 'flag': 1}, {'id': 2, 'flag': True}, {'id': 3, 'flag': 1.0}])
+    for value, expected in [(1, 1), (True, 2), (1.0, 3)]:
+        assert [row['id'] for row in client.query('t', [('term', 'flag', value)])] == [expected]
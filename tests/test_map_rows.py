@@ -0,0 +1,78 @@
+import pytest
+
+from aliyun_table.client import _process_iter
+from aliyun_table.fake import fake_table_client
+
+
+def payload_size(row):
+    return row['id'], len(row['payload']['tags'])
+
+
+def fail_on_42(row):
+    if row['id'] == 42:
+        raise ValueError('row 42')
+    return row['id']
+
+
+def square(x):
+    return x * x
+
+
+def square_id(row):
+    return row['id'] * row['id']
+
+
+def load(backend, n=500):
+    backend.load('t', ['id'], ({'id': i, 'payload': '{"tags": [%s]}' % ', '.join(['1'] * (i % 7))}
+                               for i in range(n)))
+
+
+def test_map_rows_decodes_in_subprocesses(backend):
+    load(backend)
+    client = fake_table_client(backend, nested_columns={'t': ['payload']})
+    results = list(client.map_rows('t', payload_size, processes=2, primary_key='id', page_size=100))
+    assert results == [(i, i % 7) for i in range(500)]
+
+
+def test_map_rows_without_func_returns_records(backend, client):
+    load(backend, 10)
+    rows = list(client.map_rows('t', processes=1, primary_key='id', row_format='tuple'))
+    assert [row[0] for row in rows] == list(range(10))
+
+
+def test_map_rows_parallel_unordered(backend, client):
+    load(backend)
+    results = client.map_rows('t', square_id, processes=2, ordered=False,
+                              primary_key='id', split_points=[100, 300], page_size=50)
+    assert sorted(results) == [i * i for i in range(500)]
+
+
+def test_map_rows_raises_func_errors(backend, client):
+    load(backend)
+    with pytest.raises(ValueError, match='row 42'):
+        list(client.map_rows('t', fail_on_42, processes=2, primary_key='id', page_size=10))
+
+
+def test_process_iter_bounds_in_flight_items():
+    consumed = []
+
+    def items():
+        for i in range(20):
+            consumed.append(i)
+            yield (i,)
+
+    results = _process_iter(square, items(), processes=2, max_in_flight=3)
+    assert next(results) == 0
+    assert len(consumed) == 3
+    assert list(results) == [i * i for i in range(1, 20)]
+
+
+def test_export_decodes_in_subprocesses(backend, tmp_path):
+    load(backend)
+    client = fake_table_client(backend, nested_columns={'t': ['payload']})
+    paths = [str(tmp_path / 'serial.jsonl'), str(tmp_path / 'processes.jsonl')]
+    client.export_table('t', paths[0], primary_key='id', page_size=100)
+    client.export_table('t', paths[1], primary_key='id', page_size=100, processes=2)
+    serial, processes = (open(path).read() for path in paths)
+    assert processes == serial
+    assert '"tags": [1, 1]' in serial
@@ -0,0 +1,42 @@
+import os
+import subprocess
+import sys
+import time
+
+from aliyun_table.fake import fake_table_client
+
+
+def test_import_does_not_load_tablestore():
+    code = ('import sys, aliyun_table\n'
+            'assert "tablestore" not in sys.modules\n'
+            'aliyun_table.TableClient\n'
+            'assert "tablestore" in sys.modules\n')
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    subprocess.run([sys.executable, '-c', code], check=True, cwd=root)
+
+
+def test_construction_sends_no_requests(backend, client):
+    assert sum(backend.requests.values()) == 0
+
+
+def test_table_list_is_cached(backend, client):
+    backend.load('a', ['id'], [{'id': 1}])
+    assert client.table_list == ['a']
+    backend.load('b', ['id'], [{'id': 1}])
+    assert client.table_list == ['a']
+    assert backend.requests['list_table'] == 1
+    assert sorted(client.get_table_list(refresh=True)) == ['a', 'b']
+    client.refresh_metadata()
+    assert sorted(client.table_list) == ['a', 'b']
+    assert backend.requests['list_table'] == 3
+
+
+def test_describe_table_expires(backend):
+    client = fake_table_client(backend, metadata_ttl=0.05)
+    backend.load('a', ['id'], [{'id': 1}])
+    first = client.describe_table('a')
+    assert client.describe_table('a') is first
+    assert backend.requests['describe_table'] == 1
+    time.sleep(0.06)
+    client.describe_table('a')
+    assert backend.requests['describe_table'] == 2
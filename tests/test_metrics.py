@@ -0,0 +1,124 @@
+import pytest
+from tablestore import OTSServiceError
+
+from aliyun_table import TableClient
+from aliyun_table.fake import fake_table_client
+from aliyun_table.metrics import Metrics
+
+
+def sdk_client(**kwargs):
+    """使用真实OTSClient的客户端, 请求前两次被限流, 之后返回参数错误"""
+    client = TableClient('fake', end_point='http://fake.ots.aliyuncs.com', access_key_id='fake',
+                         access_key_secret='fake', share_client=False, **kwargs)
+    otsclient = client.otsclient
+    otsclient.retry_policy.get_retry_delay = lambda *args: 0
+    attempts = []
+
+    def send_receive(*args, **kwargs):
+        attempts.append(1)
+        if len(attempts) <= 2:
+            raise OTSServiceError(503, 'OTSServerBusy', 'Server is busy.')
+        raise OTSServiceError(400, 'OTSParameterInvalid', 'The input parameter is invalid.')
+
+    otsclient.connection.send_receive = send_receive
+    return client, attempts
+
+
+def test_sdk_retries_are_counted():
+    metrics = Metrics()
+    client, attempts = sdk_client(metrics=metrics)
+    assert client.put_row('t', ['id'], {'id': 1, 'v': 1}) is None
+    assert len(attempts) == 3
+    stats = metrics.snapshot()[('put_row', 't')]
+    assert stats['retries'] == 2
+    assert stats['errors'] == {'OTSServiceError/OTSParameterInvalid': 1}
+
+
+def test_snapshot_counts_rows_and_capacity(backend):
+    metrics = Metrics()
+    client = fake_table_client(backend, metrics=metrics)
+    client.put_rows('t', ['id'], [{'id': i, 'v': 'x' * 100} for i in range(250)])
+    assert len(list(client.query_all('t', primary_key='id', page_size=100))) == 250
+    snapshot = metrics.snapshot()
+    write = snapshot[('batch_write_row', 't')]
+    # 每批最多200行.
+    assert (write['requests'], write['rows'], write['errors']) == (2, 250, {})
+    assert write['write_cu'] >= 250
+    read = snapshot[('get_range', 't')]
+    assert (read['requests'], read['rows']) == (3, 250)
+    assert read['bytes'] > 250 * 100
+    assert read['read_cu'] > 0
+    assert read['latency_count'] == 3
+    metrics.reset()
+    assert metrics.snapshot() == {}
+
+
+def test_hooks_receive_spans(backend):
+    metrics = Metrics()
+    client = fake_table_client(backend, metrics=metrics)
+    spans = []
+
+    def failing_hook(span):
+        raise ValueError('hook failed')
+
+    metrics.add_hook(spans.append)
+    metrics.add_hook(failing_hook)
+    client.put_row('t', ['id'], {'id': 1, 'v': 1})
+    with pytest.raises(OTSServiceError):
+        list(client.query_all('missing', primary_key='id'))
+    assert [(span.op, span.table, span.error) for span in spans] == [
+        ('put_row', 't', None), ('get_range', 'missing', 'OTSServiceError/OTSObjectNotExist')]
+    metrics.remove_hook(spans.append)
+    client.put_row('t', ['id'], {'id': 2, 'v': 2})
+    assert len(spans) == 2
+
+
+def test_to_prometheus(backend):
+    metrics = Metrics(prefix='ots')
+    client = fake_table_client(backend, metrics=metrics)
+    client.put_rows('t"1', ['id'], [{'id': i} for i in range(10)])
+    list(client.query_all('t"1', primary_key='id'))
+    text = metrics.to_prometheus()
+    assert '# TYPE ots_requests_total counter' in text
+    assert 'ots_rows_total{op="get_range",table="t\\"1"} 10' in text
+    assert 'ots_page_rows_bucket{op="get_range",table="t\\"1",le="+Inf"} 1' in text
+    assert 'ots_request_duration_seconds_count{op="batch_write_row",table="t\\"1"} 1' in text
+    # 写入不统计每页的行数.
+    assert 'ots_page_rows_count{op="batch_write_row"' not in text
+
+
+class RecordingTracer(object):
+    def __init__(self):
+        self.spans = []
+
+    def start_span(self, name, attributes=None):
+        span = RecordingSpan(name, attributes)
+        self.spans.append(span)
+        return span
+
+
+class RecordingSpan(object):
+    def __init__(self, name, attributes):
+        self.name = name
+        self.attributes = dict(attributes)
+        self.ended = False
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def record_exception(self, exc):
+        pass
+
+    def end(self):
+        self.ended = True
+
+
+def test_tracer_spans(backend):
+    tracer = RecordingTracer()
+    client = fake_table_client(backend, metrics=Metrics(tracer=tracer))
+    client.put_rows('t', ['id'], [{'id': i} for i in range(5)])
+    [span] = tracer.spans
+    assert span.name == 'tablestore.batch_write_row'
+    assert span.ended
+    assert span.attributes['tablestore.table'] == 't'
+    assert span.attributes['tablestore.rows'] == 5
@@ -0,0 +1,76 @@
+import time
+
+import pytest
+from tablestore import Row
+
+
+def test_mirror_incremental_refresh(backend, client, tmp_path):
+    backend.load('c', ['id'], ({'id': i, 'u': i} for i in range(5)))
+    mirror = client.local_mirror('c', str(tmp_path / 'c.db'), ['id'], updated_column='u', overlap=1)
+    assert mirror.refresh() == 5
+    client.put_row('c', ['id'], {'id': 9, 'u': 10})
+    # 读取u >= 4 - overlap的行: 3, 4和9.
+    assert mirror.refresh() == 3
+    assert mirror.get(9) == {'id': 9, 'u': 10}
+    assert len(mirror) == 6
+
+
+def test_mirror_string_watermark(backend, client, tmp_path):
+    backend.load('c', ['id'], ({'id': i, 'u': f'2024-01-0{i}T00:00:00'} for i in range(1, 6)))
+    mirror = client.local_mirror('c', str(tmp_path / 'c.db'), ['id'], updated_column='u')
+    assert mirror.refresh() == 5
+    client.put_row('c', ['id'], {'id': 9, 'u': '2024-02-01T00:00:00'})
+    assert mirror.refresh() == 2
+    assert mirror.watermark == '2024-02-01T00:00:00'
+
+
+def test_mirror_rejects_overlap_for_strings(backend, client, tmp_path):
+    backend.load('c', ['id'], [{'id': 1, 'u': '2024-01-01'}])
+    mirror = client.local_mirror('c', str(tmp_path / 'c.db'), ['id'], updated_column='u', overlap=5)
+    mirror.refresh()
+    with pytest.raises(ValueError):
+        mirror.refresh()
+    with pytest.raises(TypeError):
+        client.local_mirror('c', str(tmp_path / 'd.db'), ['id'], updated_column='u', overlap='1')
+
+
+def test_mirror_version_refresh_merges_columns(backend, client, tmp_path):
+    backend.load('c', ['id'], ({'id': i, 'a': i} for i in range(5)))
+    time.sleep(0.01)
+    mirror = client.local_mirror('c', str(tmp_path / 'c.db'), ['id'])
+    assert mirror.refresh() == 5
+    time.sleep(0.01)
+    client.update_row('c', ['id'], {'id': 1, 'b': 'new'})
+    # 只读取上次同步之后写入的列, 并与本地的行合并.
+    assert mirror.refresh() == 1
+    assert mirror.get(1) == {'id': 1, 'a': 1, 'b': 'new'}
+
+
+def test_mirror_range_prefix_and_reopen(backend, client, tmp_path):
+    backend.load('c', ['city', 'id'], ({'city': city, 'id': i, 'v': i} for city in ('bj', 'hz_1', 'hz_2')
+                                        for i in range(3)))
+    path = str(tmp_path / 'c.db')
+    with client.local_mirror('c', path, ['city', 'id'], updated_column='v') as mirror:
+        mirror.refresh()
+        assert mirror.get('hz_1', 2) == {'city': 'hz_1', 'id': 2, 'v': 2}
+        assert [(row['city'], row['id']) for row in mirror.prefix('hz_', limit=4)] == [
+            ('hz_1', 0), ('hz_1', 1), ('hz_1', 2), ('hz_2', 0)]
+        assert len(list(mirror.range('bj', 'hz_2'))) == 6
+        with pytest.raises(ValueError):
+            mirror.get('bj')
+    # 重新打开时保留数据和同步进度.
+    mirror = client.local_mirror('c', path, ['city', 'id'], updated_column='v')
+    assert len(mirror) == 9
+    assert mirror.watermark == 2
+    assert mirror.last_sync is not None
+
+
+def test_mirror_full_refresh_removes_deleted_rows(backend, client, tmp_path):
+    backend.load('c', ['id'], ({'id': i, 'u': i} for i in range(5)))
+    mirror = client.local_mirror('c', str(tmp_path / 'c.db'), ['id'], updated_column='u')
+    mirror.refresh()
+    backend.delete_row('c', Row([('id', 0)]), None)
+    mirror.refresh()
+    assert mirror.get(0) is not None
+    assert mirror.refresh(full=True) == 4
+    assert mirror.get(0) is None
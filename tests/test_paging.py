@@ -0,0 +1,59 @@
+from tablestore import ComparatorType, SingleColumnCondition
+
+from aliyun_table.paging import AdaptivePageSize, FixedPageSize, page_sizer
+
+
+def test_page_sizer():
+    assert isinstance(page_sizer(500, (100, 5000)), FixedPageSize)
+    sizer = page_sizer(None, (100, 5000))
+    assert (sizer.min_size, sizer.max_size, sizer.size) == (100, 5000, 100)
+    assert page_sizer((10, 20), (100, 5000)).size == 20
+
+
+def test_adaptive_page_size_grows_and_shrinks():
+    sizer = AdaptivePageSize(100, 5000, target_bytes=1024 * 1024, target_latency=0.5)
+    sizer.observe(100, 100 * 100, 0.01)
+    assert sizer.size == 200
+    # 不满一页时不调整.
+    sizer.observe(50, 50 * 100, 0.01)
+    assert sizer.size == 200
+    sizer.observe(200, 200 * 100, 1.0)
+    assert sizer.size == 100
+    for _ in range(10):
+        sizer.observe(sizer.size, sizer.size * 100, 0.01)
+    assert sizer.size == 5000
+
+
+def test_adaptive_page_size_limits_bytes():
+    sizer = AdaptivePageSize(10, 5000, initial=1000, target_bytes=100 * 1024)
+    sizer.observe(1000, 1000 * 1024, 0.01)
+    assert sizer.size == 100
+    sizer.observe(1, 10 * 1024 * 1024, 0.01)
+    assert sizer.size == 10
+
+
+def test_range_page_size_grows_until_fixed(backend, client):
+    backend.load('t', ['id'], ({'id': i, 'v': i} for i in range(3000)))
+    limits = []
+    get_range = backend.get_range
+
+    def observed(*args, **kwargs):
+        limits.append(kwargs['limit'])
+        return get_range(*args, **kwargs)
+
+    backend.get_range = observed
+    assert len(list(client.query_all('t', primary_key='id'))) == 3000
+    assert limits[:4] == [100, 200, 400, 800]
+    limits.clear()
+    list(client.query_all('t', primary_key='id', page_size=1000))
+    assert limits == [1000] * 3
+
+
+def test_columns_to_get_and_column_filter_are_pushed_down(backend, client):
+    backend.load('t', ['id'], ({'id': i, 'v': i, 'payload': 'x' * 100} for i in range(100)))
+    rows = list(client.query_all('t', primary_key='id', columns_to_get=['v'],
+                                 column_filter=SingleColumnCondition('v', 90, ComparatorType.GREATER_EQUAL)))
+    assert rows == [{'id': i, 'v': i} for i in range(90, 100)]
+    # 只读取主键列.
+    rows = list(client.query_all('t', primary_key='id', columns_to_get=['id'], limit=3))
+    assert rows == [{'id': 0}, {'id': 1}, {'id': 2}]
@@ -0,0 +1,64 @@
+import time
+
+import pytest
+
+from aliyun_table.fake import FakeOTSClient, fake_table_client
+
+
+def load(backend, n=1000):
+    backend.load('t', ['id'], ({'id': i, 'v': i} for i in range(n)))
+
+
+def test_compute_split_points(backend, client):
+    load(backend)
+    assert client.compute_split_points('t', 'id', 4) == [249, 499, 749]
+    backend.load('s', ['id'], ({'id': str(i)} for i in range(10)))
+    assert client.compute_split_points('s', 'id', 4) == []
+
+
+def test_parallel_scan_uses_computed_split_points(backend, client):
+    load(backend)
+    rows = list(client.query_all('t', primary_key='id', parallel=4, page_size=1000))
+    assert sorted(row['id'] for row in rows) == list(range(1000))
+    # 2次请求计算切分点, 每段1次请求.
+    assert backend.requests['get_range'] == 2 + 4
+
+
+def test_ordered_merge(backend, client):
+    load(backend)
+    rows = client.query_all('t', primary_key='id', split_points=[100, 500, 900], parallel=4, ordered=True,
+                            page_size=50)
+    assert [row['id'] for row in rows] == list(range(1000))
+
+
+def test_start_primary_key_and_limit(backend, client):
+    load(backend)
+    rows = list(client.query_all('t', primary_key='id', start_primary_key=300, split_points=[100, 500],
+                                 ordered=True, limit=250))
+    assert [row['id'] for row in rows] == list(range(300, 550))
+
+
+def test_close_stops_queued_shards():
+    backend = FakeOTSClient(latency=0.01)
+    load(backend)
+    client = fake_table_client(backend)
+    rows = client.query_all('t', primary_key='id', split_points=list(range(30, 900, 30)), parallel=2)
+    next(rows)
+    rows.close()
+    # 等待工作线程退出, 30段中只有正在运行的两段发送了请求.
+    time.sleep(0.5)
+    assert backend.requests['get_range'] <= 4
+
+
+def test_worker_errors_are_raised(backend, client):
+    load(backend)
+    get_range = backend.get_range
+
+    def failing_get_range(table_name, direction, start, *args, **kwargs):
+        if start[0][1] == 500:
+            raise ValueError('shard failed')
+        return get_range(table_name, direction, start, *args, **kwargs)
+
+    backend.get_range = failing_get_range
+    with pytest.raises(ValueError, match='shard failed'):
+        list(client.query_all('t', primary_key='id', split_points=[500], ordered=True))
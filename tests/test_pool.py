@@ -0,0 +1,92 @@
+import threading
+import time
+
+import pytest
+
+from aliyun_table import TableClient
+from aliyun_table.pool import ClientRegistry, _Entry, new_client
+
+OPTIONS = {'end_point': 'http://fake.ots.aliyuncs.com', 'access_key_id': 'id', 'access_key_secret': 'secret',
+           'instance_name': 'fake'}
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    registry = ClientRegistry(idle_timeout=None)
+    monkeypatch.setattr('aliyun_table.client.client_registry', registry)
+    return registry
+
+
+def cleared(otsclient):
+    """记录连接池被清空的次数"""
+    calls = []
+    otsclient.connection.pool.clear = lambda: calls.append(1)
+    return calls
+
+
+def test_clients_with_same_options_share_otsclient(registry):
+    first = TableClient('fake', OPTIONS['end_point'], 'id', 'secret', socket_timeout=5)
+    second = TableClient('fake', OPTIONS['end_point'], 'id', 'secret', socket_timeout=5)
+    other = TableClient('fake', OPTIONS['end_point'], 'id', 'secret', socket_timeout=10)
+    unshared = TableClient('fake', OPTIONS['end_point'], 'id', 'secret', socket_timeout=5, share_client=False)
+    assert first.otsclient is second.otsclient
+    assert other.otsclient is not first.otsclient
+    assert unshared.otsclient is not first.otsclient
+    assert len(registry) == 2
+    # 注册表的键不包含明文密钥.
+    assert all('secret' not in key for key in registry._entries)
+
+
+def test_fork_discards_parent_clients(registry):
+    otsclient = registry.get(**OPTIONS)
+    calls = cleared(otsclient)
+    # 模拟fork之后的子进程.
+    registry._pid = -1
+    assert registry.get(**OPTIONS) is not otsclient
+    assert len(registry) == 1
+    # 不关闭父进程的连接.
+    assert calls == []
+
+
+def test_reap_skips_busy_clients():
+    otsclient = new_client(**OPTIONS)
+    started, release = threading.Event(), threading.Event()
+
+    def send_receive(*args, **kwargs):
+        started.set()
+        release.wait()
+
+    otsclient.connection.send_receive = send_receive
+    entry = _Entry(otsclient)
+    calls = cleared(otsclient)
+    thread = threading.Thread(target=otsclient.connection.send_receive)
+    thread.start()
+    started.wait()
+    assert entry.in_flight == 1
+    assert not entry.reap(0)
+    release.set()
+    thread.join()
+    assert entry.reap(0)
+    assert calls == [1]
+    # 再次使用之前不会重复关闭.
+    assert not entry.reap(0)
+    assert entry.reaped == 1
+
+
+def test_clear(registry):
+    otsclient = registry.get(**OPTIONS)
+    calls = cleared(otsclient)
+    registry.clear()
+    assert len(registry) == 0
+    assert calls == [1]
+    assert registry.get(**OPTIONS) is not otsclient
+
+
+def test_background_reaper():
+    registry = ClientRegistry(idle_timeout=0.05)
+    otsclient = registry.get(**OPTIONS)
+    calls = cleared(otsclient)
+    time.sleep(0.2)
+    assert calls == [1]
+    [entry] = registry._entries.values()
+    assert entry.reaped == 1
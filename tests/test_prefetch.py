@@ -0,0 +1,48 @@
+import time
+
+import pytest
+
+from aliyun_table.fake import FakeOTSClient, fake_table_client
+
+
+def load(backend, n=1000):
+    backend.load('t', ['id'], ({'id': i, 'like': i} for i in range(n)))
+
+
+def test_prefetch_keeps_order(backend, client):
+    load(backend)
+    rows = client.query_all('t', primary_key='id', prefetch=2, page_size=100)
+    assert [row['id'] for row in rows] == list(range(1000))
+    rows = client.query('t', [('range', 'like', '[0, 300)')], sort_list=[('like', -1)], prefetch=2)
+    assert [row['id'] for row in rows] == list(reversed(range(300)))
+
+
+def test_close_stops_prefetching():
+    backend = FakeOTSClient(latency=0.01)
+    load(backend, 5000)
+    client = fake_table_client(backend)
+    rows = client.query_all('t', primary_key='id', prefetch=2, page_size=100)
+    next(rows)
+    rows.close()
+    time.sleep(0.2)
+    # 当前页, 队列中的2页和正在请求的1页.
+    assert backend.requests['get_range'] <= 4
+
+
+def test_errors_are_raised_to_the_consumer(backend, client):
+    load(backend)
+    get_range = backend.get_range
+
+    def failing_get_range(*args, **kwargs):
+        if backend.requests['get_range'] >= 3:
+            raise ValueError('page failed')
+        return get_range(*args, **kwargs)
+
+    backend.get_range = failing_get_range
+    rows = client.query_all('t', primary_key='id', prefetch=2, page_size=100)
+    received = []
+    with pytest.raises(ValueError, match='page failed'):
+        for row in rows:
+            received.append(row['id'])
+    # 出错之前的页都已返回.
+    assert received == list(range(300))
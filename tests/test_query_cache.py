@@ -0,0 +1,72 @@
+from aliyun_table.cache import DiskCache, LRUCache
+from aliyun_table.fake import fake_table_client
+
+
+def load(backend, n=250):
+    backend.load('t', ['id'], ({'id': i, 'like': i} for i in range(n)))
+
+
+def test_query_cache_does_not_mix_value_types(backend):
+    client = fake_table_client(backend, query_cache=LRUCache(maxsize=100, ttl=None))
+    client.put_rows('t', ['id'], [{'id': 1, 'flag': 1}, {'id': 2, 'flag': True}])
+    assert list(client.query('t', [('term', 'flag', 1)])) == [{'id': 1, 'flag': 1}]
+    assert list(client.query('t', [('term', 'flag', True)])) == [{'id': 2, 'flag': True}]
+    assert backend.requests['search'] == 2
+    # 相同的查询命中缓存.
+    assert list(client.query('t', [('term', 'flag', True)])) == [{'id': 2, 'flag': True}]
+    assert backend.requests['search'] == 2
+
+
+
+def test_complete_results_are_cached(backend):
+    client = fake_table_client(backend, query_cache=LRUCache(maxsize=100, ttl=None))
+    load(backend)
+    query = [('range', 'like', '[0, 200)')]
+    first = list(client.query('t', query))
+    requests = backend.requests['search']
+    assert list(client.query('t', list(reversed(query)))) == first
+    assert backend.requests['search'] == requests
+    # use_cache=False时不读缓存.
+    assert list(client.query('t', query, use_cache=False)) == first
+    assert backend.requests['search'] > requests
+
+
+def test_partial_results_are_used_for_smaller_limits(backend):
+    client = fake_table_client(backend, query_cache=LRUCache(maxsize=100, ttl=None))
+    load(backend)
+    query = [('range', 'like', '[0, 250)')]
+    assert len(list(client.query('t', query, limit=30))) == 30
+    requests = backend.requests['search']
+    assert [row['id'] for row in client.query('t', query, limit=20)] == list(range(20))
+    assert backend.requests['search'] == requests
+    # 缓存的部分结果不够时重新查询.
+    assert len(list(client.query('t', query))) == 250
+    assert backend.requests['search'] > requests
+
+
+def test_errors_are_not_cached(backend):
+    client = fake_table_client(backend, query_cache=LRUCache(maxsize=100, ttl=None))
+    load(backend)
+    search = backend.search
+
+    def failing_search(*args, **kwargs):
+        raise ValueError('search failed')
+
+    backend.search = failing_search
+    try:
+        list(client.query('t'))
+    except ValueError:
+        pass
+    backend.search = search
+    assert len(list(client.query('t'))) == 250
+
+
+def test_disk_cache_is_shared_between_clients(backend, tmp_path):
+    load(backend)
+    query = [('term', 'like', 7), ('range', 'id', '[0, 100)')]
+    first = fake_table_client(backend, query_cache=DiskCache(str(tmp_path), ttl=None))
+    assert list(first.query('t', query)) == [{'id': 7, 'like': 7}]
+    requests = backend.requests['search']
+    second = fake_table_client(backend, query_cache=DiskCache(str(tmp_path), ttl=None))
+    assert list(second.query('t', list(reversed(query)))) == [{'id': 7, 'like': 7}]
+    assert backend.requests['search'] == requests
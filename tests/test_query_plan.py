@@ -0,0 +1,67 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from aliyun_table.query_plan import QuerySyntaxError, QueryTypeNotExistError, compile_query, parse_range
+
+
+def test_plan_cache_keeps_value_types():
+    int_plan = compile_query([('term', 'flag', 1)])
+    bool_plan = compile_query([('term', 'flag', True)])
+    float_plan = compile_query([('term', 'flag', 1.0)])
+    assert len({int_plan.key, bool_plan.key, float_plan.key}) == 3
+    assert bool_plan.bool_query.must_queries[0].column_value is True
+    assert compile_query([('term', 'flag', 1)]) is int_plan
+
+
+def test_plan_cache_ignores_condition_order():
+    a = compile_query([('term', 'user', 'u1'), ('range', 'like', '[1, 10)')])
+    b = compile_query([('range', 'like', '[1, 10)'), ('term', 'user', 'u1')])
+    assert a is b
+
+
+
+def test_sort_order_is_part_of_the_key():
+    a = compile_query(sort_list=[('like', -1), ('id', 1)])
+    b = compile_query(sort_list=[('id', 1), ('like', -1)])
+    assert a is not b
+    assert [sorter.field_name for sorter in a.sort.sorters] == ['like', 'id']
+
+
+def test_unhashable_contents():
+    a = compile_query([('terms', 'tag', ['a', 'b'])], column_to_get=['b', 'a'])
+    assert compile_query([('terms', 'tag', ('a', 'b'))], column_to_get=['a', 'b']) is a
+    assert a.bool_query.must_queries[0].column_values == ['a', 'b']
+    assert a.columns_to_get.column_names == ['a', 'b']
+
+
+def test_invalid_conditions():
+    with pytest.raises(QuerySyntaxError):
+        compile_query([('term', 'user')])
+    with pytest.raises(QueryTypeNotExistError):
+        compile_query([('fuzzy', 'user', 'u1')])
+    with pytest.raises(QuerySyntaxError):
+        compile_query([('range', 'like', '[1, 10')])
+
+
+def test_parse_range():
+    assert parse_range('(100, 200]') == (100, 200, False, True)
+    assert parse_range('[1570778199000, )') == (1570778199000, None, True, False)
+    assert parse_range("['a,b', 'c']") == ('a,b', 'c', True, True)
+    with pytest.raises(QuerySyntaxError):
+        parse_range('[__import__("os"), 1]')
+
+
+def test_stable_key_does_not_depend_on_the_hash_seed():
+    code = ('from aliyun_table.query_plan import compile_query; '
+            "print(repr(compile_query([('term', 'a', 1), ('terms', 'b', {'x', 'y', 'z'}), ('prefix', 'c', 'p')],"
+            " [('term', 'd', True)]).stable_key))")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    outputs = set()
+    for seed in ('1', '2', '3'):
+        env = dict(os.environ, PYTHONHASHSEED=seed, PYTHONPATH=root)
+        outputs.add(subprocess.run([sys.executable, '-c', code], env=env, check=True,
+                                   stdout=subprocess.PIPE).stdout)
+    assert len(outputs) == 1
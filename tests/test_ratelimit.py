@@ -0,0 +1,83 @@
+import time
+
+from tablestore import OTSServiceError
+
+from aliyun_table import TableClient
+from aliyun_table.fake import FakeOTSClient, fake_table_client
+from aliyun_table.pool import ObservedRetryPolicy
+from aliyun_table.ratelimit import CapacityLimiter, TokenBucket
+
+
+class ZeroDelayRetryPolicy(ObservedRetryPolicy):
+    def get_retry_delay(self, retry_times, exception, api_name):
+        return 0
+
+
+def test_token_bucket_waits_for_consumed_capacity():
+    bucket = TokenBucket(100)
+    assert bucket.wait() == 0
+    bucket.consume(110)
+    start = time.monotonic()
+    waited = bucket.wait()
+    # 欠下的10个CU需要0.1秒补充.
+    assert 0.09 <= waited <= 0.2
+    assert time.monotonic() - start >= 0.09
+
+
+def test_token_bucket_backs_off_and_recovers():
+    bucket = TokenBucket(1000, min_ratio=0.2, decrease=0.5, increase=0.1)
+    bucket.throttled()
+    assert bucket.rate == 500
+    assert bucket.tokens <= 0
+    for _ in range(3):
+        bucket.throttled()
+    assert bucket.rate == 200
+    assert bucket.throttled_count == 4
+    bucket.succeeded()
+    assert bucket.rate == 300
+    for _ in range(20):
+        bucket.succeeded()
+    assert bucket.rate == 1000
+
+
+def test_reads_and_writes_use_separate_buckets(backend):
+    limiter = CapacityLimiter(read_cu=100)
+    client = fake_table_client(backend, rate_limiter=limiter)
+    assert limiter.write is None
+    client.put_rows('t', ['id'], [{'id': i, 'v': 'x' * 4000} for i in range(10)])
+    assert limiter.read.tokens == 100
+    list(client.query_all('t', primary_key='id'))
+    # 10行共40KB, 消耗10个读CU.
+    assert limiter.read.tokens < 95
+
+
+def test_limiter_slows_down_on_throttled_requests():
+    limiter = CapacityLimiter(write_cu=1000)
+    backend = FakeOTSClient(throttle_rate=0.5, retry_policy=ZeroDelayRetryPolicy())
+    client = fake_table_client(backend, rate_limiter=limiter)
+    for i in range(20):
+        client.put_row('t', ['id'], {'id': i, 'v': i})
+    retries = backend.requests['put_row'] - 20
+    assert retries > 0
+    assert limiter.write.throttled_count == retries
+    assert len(list(client.query_all('t', primary_key='id'))) == 20
+
+
+def test_limiter_slows_down_on_sdk_retries():
+    limiter = CapacityLimiter(write_cu=1000)
+    client = TableClient('fake', end_point='http://fake.ots.aliyuncs.com', access_key_id='fake',
+                         access_key_secret='fake', share_client=False, rate_limiter=limiter)
+    otsclient = client.otsclient
+    otsclient.retry_policy.get_retry_delay = lambda *args: 0
+    attempts = []
+
+    def send_receive(*args, **kwargs):
+        attempts.append(1)
+        if len(attempts) <= 2:
+            raise OTSServiceError(503, 'OTSServerBusy', 'Server is busy.')
+        raise OTSServiceError(400, 'OTSParameterInvalid', 'The input parameter is invalid.')
+
+    otsclient.connection.send_receive = send_receive
+    client.put_row('t', ['id'], {'id': 1, 'v': 1})
+    assert limiter.write.throttled_count == 2
+    assert limiter.write.rate < 1000 * 0.7
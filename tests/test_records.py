@@ -0,0 +1,51 @@
+import pickle
+
+import pytest
+
+from aliyun_table.records import RowRecord, RowTuple
+
+
+@pytest.fixture
+def client(backend, client):
+    backend.load('t', ['id'], [{'id': 1, 'a': 'x', 'b': 2}, {'id': 2, 'a': 'y'}])
+    return client
+
+
+def test_dict_and_raw(client):
+    assert list(client.query_all('t', primary_key='id')) == [{'id': 1, 'a': 'x', 'b': 2}, {'id': 2, 'a': 'y'}]
+    pkvs, ckvs = next(client.query_all('t', primary_key='id', row_format='raw'))
+    assert pkvs == [('id', 1)]
+    assert [column[:2] for column in ckvs] == [('a', 'x'), ('b', 2)]
+
+
+def test_tuple_records(client):
+    first, second = client.query_all('t', primary_key='id', row_format='tuple')
+    assert isinstance(first, RowTuple)
+    assert tuple(first) == (1, 'x', 2)
+    assert first['a'] == first.a == first.get('a') == 'x'
+    # 同一页的记录使用相同的列, 缺失的列为None.
+    assert second.keys() == ('id', 'a', 'b')
+    assert second.b is None
+    assert second.get('c', 0) == 0
+    assert first._asdict() == {'id': 1, 'a': 'x', 'b': 2}
+    with pytest.raises(AttributeError):
+        first.c
+    assert pickle.loads(pickle.dumps(first)) == first
+
+
+def test_slots_records(client):
+    first, second = client.query('t', row_format='slots')
+    assert isinstance(first, RowRecord)
+    first['b'] = 3
+    assert first.b == 3
+    assert list(first) == [1, 'x', 3]
+    assert len(second) == 3
+    assert type(first) is type(second)
+    copied = pickle.loads(pickle.dumps(second))
+    assert copied == second
+    assert copied._asdict() == {'id': 2, 'a': 'y', 'b': None}
+
+
+def test_unknown_format(client):
+    with pytest.raises(ValueError):
+        list(client.query_all('t', primary_key='id', row_format='list'))
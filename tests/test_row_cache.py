@@ -0,0 +1,58 @@
+from aliyun_table.fake import fake_table_client
+
+
+def test_get_rows_keeps_input_order(backend, client):
+    backend.load('t', ['id'], ({'id': i, 'v': i, 'w': -i} for i in range(250)))
+    keys = [{'id': i} for i in reversed(range(260))]
+    rows = client.get_rows('t', keys)
+    assert rows[:10] == [None] * 10
+    assert rows[10:] == [{'id': i, 'v': i, 'w': -i} for i in reversed(range(250))]
+    # 每批最多100个主键.
+    assert backend.requests['batch_get_row'] == 3
+    assert client.get_rows('t', [{'id': 3}], columns=['w']) == [{'id': 3, 'w': -3}]
+
+
+def test_cached_rows_are_not_requested_again(backend):
+    client = fake_table_client(backend, row_cache_size=100)
+    backend.load('t', ['id'], ({'id': i, 'v': i} for i in range(10)))
+    assert client.get_rows('t', [{'id': 1}, {'id': 2}]) == [{'id': 1, 'v': 1}, {'id': 2, 'v': 2}]
+    assert client.get_rows('t', [{'id': 2}, {'id': 3}], columns=['v']) == [{'id': 2, 'v': 2}, {'id': 3, 'v': 3}]
+    assert backend.requests['batch_get_row'] == 2
+    # 指定列时读取的行不缓存.
+    assert client.get_rows('t', [{'id': 3}]) == [{'id': 3, 'v': 3}]
+    assert backend.requests['batch_get_row'] == 3
+    assert client.row_cache.hits == 1
+
+
+def test_writes_invalidate_cached_rows(backend):
+    client = fake_table_client(backend, row_cache_size=100)
+    client.put_rows('t', ['id'], [{'id': i, 'v': i} for i in range(3)])
+    client.get_rows('t', [{'id': i} for i in range(3)])
+    client.put_row('t', ['id'], {'id': 0, 'v': 10})
+    client.update_row('t', ['id'], {'id': 1, 'w': 11})
+    client.put_rows('t', ['id'], [{'id': 2, 'v': 12}])
+    assert client.get_rows('t', [{'id': i} for i in range(3)]) == [
+        {'id': 0, 'v': 10}, {'id': 1, 'v': 1, 'w': 11}, {'id': 2, 'v': 12}]
+def test_row_cache_returns_copies(backend):
+    client = fake_table_client(backend, row_cache_size=100)
+    client.put_row('t', ['id'], {'id': 1, 'v': 1})
+    client.get_rows('t', [{'id': 1}])[0]['v'] = 99
+    client.get_rows('t', [{'id': 1}])[0]['v'] = 98
+    assert client.get_rows('t', [{'id': 1}]) == [{'id': 1, 'v': 1}]
+    assert backend.requests['batch_get_row'] == 1
+
+
+def test_row_cache_invalidated_after_write(backend):
+    client = fake_table_client(backend, row_cache_size=100)
+    client.put_row('t', ['id'], {'id': 1, 'v': 1})
+    put_row = backend.put_row
+
+    def racing_put_row(*args, **kwargs):
+        # 写入请求期间并发的读取缓存了旧数据.
+        client.get_rows('t', [{'id': 1}])
+        return put_row(*args, **kwargs)
+
+    backend.put_row = racing_put_row
+    client.put_row('t', ['id'], {'id': 1, 'v': 2})
+    assert client.get_rows('t', [{'id': 1}]) == [{'id': 1, 'v': 2}]
+
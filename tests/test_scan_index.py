@@ -0,0 +1,48 @@
+import time
+
+from aliyun_table.fake import FakeOTSClient, fake_table_client
+
+
+def load(backend, n=250):
+    backend.load('t', ['id'], ({'id': i, 'like': i, 'user': f'u{i % 5}'} for i in range(n)))
+
+
+def test_query_pages_and_total_count(backend, client):
+    load(backend)
+    rows = list(client.query('t', [('range', 'like', '[10, 130)')], get_total_count=True))
+    assert len(rows) == 120
+    assert rows[0] == (120, {'id': 10, 'like': 10, 'user': 'u0'})
+
+
+def test_scan_index_returns_all_matching_rows(backend, client):
+    load(backend)
+    rows = list(client.scan_index('t', [('term', 'user', 'u1')], parallel=2))
+    assert sorted(row['id'] for row in rows) == list(range(1, 250, 5))
+    assert backend.requests['compute_splits'] == 1
+    assert backend.requests['parallel_scan'] == backend.parallel_splits
+
+
+def test_scan_index_columns_and_limit(backend, client):
+    load(backend)
+    rows = list(client.scan_index('t', column_to_get=['like'], limit=7))
+    assert len(rows) == 7
+    assert all(set(row) == {'id', 'like'} for row in rows)
+
+
+def test_parallel_query(backend, client):
+    load(backend)
+    rows = list(client.query('t', [('range', 'like', '[0, 100)')], get_total_count=True, parallel=3))
+    assert sorted(row['id'] for _, row in rows) == list(range(100))
+    assert {total for total, _ in rows} == {100}
+    assert len(list(client.query('t', parallel=3))) == 250
+
+
+def test_close_stops_remaining_splits():
+    backend = FakeOTSClient(latency=0.01, parallel_splits=20)
+    load(backend)
+    client = fake_table_client(backend)
+    rows = client.scan_index('t', parallel=2)
+    next(rows)
+    rows.close()
+    time.sleep(0.5)
+    assert backend.requests['parallel_scan'] <= 4
@@ -0,0 +1,83 @@
+import pytest
+from tablestore import Condition, Row, RowExistenceExpectation, TableMeta, TableOptions
+
+
+@pytest.fixture
+def client(backend, client):
+    backend.load('c', ['a', 'b'], ({'a': a, 'b': b, 'v': f'{a}{b}'} for a in 'xyz' for b in range(5)))
+    return client
+
+
+def keys(rows):
+    return [(row['a'], row['b']) for row in rows]
+
+
+def test_prefix(client):
+    assert keys(client.scan_range('c', ['a', 'b'], prefix=['y'])) == [('y', b) for b in range(5)]
+
+
+def test_prefix_backward(client):
+    rows = client.scan_range('c', ['a', 'b'], prefix=['y'], direction='BACKWARD')
+    assert keys(rows) == [('y', b) for b in reversed(range(5))]
+
+
+def test_start_end(client):
+    rows = client.scan_range('c', ['a', 'b'], start=['x', 3], end={'a': 'z'})
+    assert keys(rows) == [('x', 3), ('x', 4)] + [('y', b) for b in range(5)]
+
+
+def test_backward_limit(client):
+    rows = client.scan_range('c', ['a', 'b'], start=['y', 2], end=['w'], direction='BACKWARD', limit=4)
+    assert keys(rows) == [('y', 2), ('y', 1), ('y', 0), ('x', 4)]
+
+
+def test_end_excludes_prefix(client):
+    rows = client.scan_range('c', ['a', 'b'], start=['y', 2], end=['x'], direction='BACKWARD')
+    assert keys(rows) == [('y', 2), ('y', 1), ('y', 0)]
+
+
+def test_invalid_arguments(client):
+    with pytest.raises(ValueError):
+        list(client.scan_range('c', ['a', 'b'], prefix=['y'], start=['x']))
+    with pytest.raises(ValueError):
+        list(client.scan_range('c', ['a', 'b'], prefix=['y', 1]))
+
+
+def test_limit_is_not_over_read(backend, client):
+    limits = []
+    get_range = backend.get_range
+
+    def observed(*args, **kwargs):
+        limits.append(kwargs['limit'])
+        return get_range(*args, **kwargs)
+
+    backend.get_range = observed
+    rows = client.scan_range('c', ['a', 'b'], limit=7, page_size=5)
+    assert keys(rows) == [('x', b) for b in range(5)] + [('y', 0), ('y', 1)]
+    assert limits == [5, 2]
+
+
+def test_columns_and_row_format(client):
+    rows = list(client.scan_range('c', ['a', 'b'], prefix=['z'], columns_to_get=['v'], row_format='tuple', limit=2))
+    assert [tuple(row) for row in rows] == [('z', 0, 'z0'), ('z', 1, 'z1')]
+    assert rows[0].v == 'z0'
+
+
+@pytest.fixture
+def versions(backend):
+    backend.create_table(TableMeta('versions', [('id', 'INTEGER')]), TableOptions(max_version=3))
+    for timestamp in (1000, 2000, 3000):
+        backend.update_row('versions', Row([('id', 1)], {'PUT': [('x', timestamp // 1000, timestamp)]}),
+                           Condition(RowExistenceExpectation.IGNORE))
+
+
+def test_max_versions(client, versions):
+    assert list(client.scan_range('versions', ['id'], max_versions=2, row_format='raw')) == [
+        ([('id', 1)], [('x', 3, 3000), ('x', 2, 2000)])]
+    assert list(client.scan_range('versions', ['id'])) == [{'id': 1, 'x': 3}]
+
+
+def test_time_range(client, versions):
+    assert list(client.scan_range('versions', ['id'], time_range=(1500, 2500))) == [{'id': 1, 'x': 2}]
+    assert list(client.scan_range('versions', ['id'], time_range=1000)) == [{'id': 1, 'x': 1}]
+    assert list(client.scan_range('versions', ['id'], time_range=(4000, 5000))) == []
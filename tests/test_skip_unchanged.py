@@ -0,0 +1,88 @@
+import os
+import threading
+
+from aliyun_table.cache import DiskCache, HashStore
+from aliyun_table.fake import fake_table_client
+
+
+def test_skip_unchanged_with_local_hashes(backend):
+    client = fake_table_client(backend, skip_unchanged={'t': None})
+    rows = [{'id': i, 'v': i} for i in range(10)]
+    client.put_rows('t', ['id'], rows)
+    assert client.put_rows('t', ['id'], rows) == [{'id': i} for i in range(10)]
+    assert client.put_row('t', ['id'], rows[0]) == {'id': 0}
+    assert backend.requests['batch_write_row'] == 1
+    assert backend.requests['put_row'] == 0
+    assert client.unchanged_rows == 11
+
+    client.put_rows('t', ['id'], [{'id': 0, 'v': 100}] + rows[1:])
+    assert backend.requests['batch_write_row'] == 2
+    assert client.get_rows('t', [{'id': 0}]) == [{'id': 0, 'v': 100}]
+
+
+def test_skip_unchanged_with_hash_column(backend):
+    rows = [{'id': i, 'v': i} for i in range(10)]
+    fake_table_client(backend, skip_unchanged={'t': '_hash'}).put_rows('t', ['id'], rows)
+    # 新的客户端没有本地哈希, 由服务端的哈希列条件跳过.
+    client = fake_table_client(backend, skip_unchanged={'t': '_hash'})
+    assert client.put_rows('t', ['id'], rows) == [{'id': i} for i in range(10)]
+    assert client.unchanged_rows == 10
+    assert client.update_row('t', ['id'], {'id': 3, 'v': 3}) == {'id': 3}
+
+
+def test_hash_store_is_reused_between_runs(backend, tmp_path):
+    path = str(tmp_path / 'hash.db')
+    rows = [{'id': i, 'v': i} for i in range(10)]
+    with HashStore(path) as store:
+        fake_table_client(backend, skip_unchanged={'t': None}, hash_store=store).put_rows('t', ['id'], rows)
+        assert len(store) == 10
+    with HashStore(path) as store:
+        client = fake_table_client(backend, skip_unchanged={'t': None}, hash_store=store)
+        client.put_rows('t', ['id'], rows)
+        assert client.unchanged_rows == 10
+        assert store.hits == 10
+    assert backend.requests['batch_write_row'] == 1
+
+
+def test_hash_store(tmp_path):
+    store = HashStore(str(tmp_path / 'hash.db'))
+    key = ('t', (('id', 1), ('name', b'\x00')))
+    assert store.get(key) is None
+    store.set(key, 'a')
+    store.set(key, 'b')
+    store.set(('t', (('id', 1.0),)), 'c')
+    assert store.get(key) == 'b'
+    # 1和1.0是不同的键.
+    assert store.get(('t', (('id', 1),))) is None
+    assert (store.hits, store.misses) == (1, 2)
+    store.delete(key)
+    assert len(store) == 1
+    store.clear()
+    assert len(store) == 0
+
+
+def test_unchanged_rows_count_is_thread_safe(backend):
+    client = fake_table_client(backend, skip_unchanged={'t': None})
+    rows = [{'id': i, 'v': i} for i in range(100)]
+    client.put_rows('t', ['id'], rows)
+
+    def write():
+        for row in rows:
+            client.put_row('t', ['id'], row)
+
+    threads = [threading.Thread(target=write) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert client.unchanged_rows == 800
+
+
+def test_disk_cache_evicts_periodically(tmp_path):
+    cache = DiskCache(str(tmp_path), maxsize=20, ttl=None)
+    assert cache.evict_interval == 2
+    for i in range(25):
+        cache.set(i, i)
+    # 条数可能暂时超出evict_interval条.
+    assert 20 <= len(os.listdir(str(tmp_path))) <= 21
+    assert cache.get(24) == 24
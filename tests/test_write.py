@@ -0,0 +1,103 @@
+import pytest
+from tablestore import (CapacityUnit, Condition, OTSClientError, PutRowItem, ReturnType, Row,
+                        RowExistenceExpectation)
+from tablestore.metadata import BatchWriteRowResponse, BatchWriteRowResponseItem
+
+from aliyun_table.fake import FakeOTSClient, fake_table_client
+
+
+@pytest.fixture(autouse=True)
+def no_retry_delay(monkeypatch):
+    monkeypatch.setattr('aliyun_table.client.time.sleep', lambda seconds: None)
+
+
+def test_put_rows_returns_primary_keys(backend, client):
+    result = client.put_rows('t', ['id'], ({'id': i, 'v': i} for i in range(450)))
+    assert result == [{'id': i} for i in range(450)]
+    # 按200行分批.
+    assert backend.requests['batch_write_row'] == 3
+    assert len(list(client.query_all('t', primary_key='id'))) == 450
+
+
+def test_put_rows_streams_batches(backend, client):
+    # 读取输入时记录已发送的批次数, 前面的批次应在读完全部输入之前写入.
+    sent = []
+
+    def data():
+        for i in range(1000):
+            sent.append(backend.requests['batch_write_row'])
+            yield {'id': i, 'v': i}
+
+    client.put_rows('t', ['id'], data())
+    assert sent[0] == 0
+    assert sent[-1] == 4
+    assert backend.requests['batch_write_row'] == 5
+
+
+def test_duplicate_keys_go_to_separate_batches(backend, client):
+    result = client.update_rows('t', ['id'], [{'id': 1, 'v': 1}, {'id': 2, 'v': 1}, {'id': 1, 'w': 2}])
+    assert result == [{'id': 1}, {'id': 2}, {'id': 1}]
+    assert backend.requests['batch_write_row'] == 2
+    assert client.get_rows('t', [{'id': 1}]) == [{'id': 1, 'v': 1, 'w': 2}]
+
+
+def test_non_retryable_errors_are_not_retried(backend, client):
+    client.put_row('t', ['id'], {'id': 1, 'v': 1})
+    # 主键与表结构不一致, 服务端返回OTSParameterInvalid.
+    assert client.put_rows('t', ['id', 'x'], [{'id': 2, 'x': 1, 'v': 1}]) == [None]
+    assert backend.requests['batch_write_row'] == 1
+
+
+def test_retryable_row_errors_are_retried():
+    backend = FakeOTSClient(row_error_rate=0.3, seed=1)
+    client = fake_table_client(backend)
+    result = client.put_rows('t', ['id'], ({'id': i, 'v': i} for i in range(100)), max_retry=10)
+    assert result == [{'id': i} for i in range(100)]
+    assert backend.requests['batch_write_row'] > 1
+
+
+
+def scripted_batch_write(backend, *responses):
+    """依次返回responses中的结果: 每行的错误码列表(None表示成功), 或者抛出的异常"""
+    calls = []
+
+    def batch_write_row(request):
+        calls.append(request)
+        response = responses[len(calls) - 1]
+        if isinstance(response, Exception):
+            raise response
+        row_items = next(iter(request.items.values())).row_items
+        items = [BatchWriteRowResponseItem(True, None, None, CapacityUnit(0, 1), row_item.row.primary_key)
+                 if code is None else BatchWriteRowResponseItem(False, code, 'failed', None, None)
+                 for row_item, code in zip(row_items, response)]
+        return BatchWriteRowResponse(request, {'t': items})
+
+    backend.batch_write_row = batch_write_row
+    return calls
+
+
+def row_items(n):
+    return [PutRowItem(Row([('id', i)], [('v', i)]), Condition(RowExistenceExpectation.IGNORE),
+                       return_type=ReturnType.RT_PK) for i in range(n)]
+
+
+def test_errors_of_given_up_rows_are_kept(backend, client):
+    calls = scripted_batch_write(backend, ['OTSParameterInvalid', 'OTSServerBusy', None],
+                                 OTSClientError('Invalid request.'))
+    errors = {}
+    result = client._batch_write_row('t', row_items(3), max_retry=3, errors=errors)
+    assert result == [None, None, {'id': 2}]
+    assert len(calls) == 2
+    assert errors == {0: 'OTSParameterInvalid: failed', 1: 'Client error, Invalid request.'}
+
+
+def test_client_errors_are_retried_only_for_server_side_failures(backend, client):
+    calls = scripted_batch_write(backend, OTSClientError('HTTP status: 502, reason: Bad Gateway.', 502), [None])
+    assert client._batch_write_row('t', row_items(1), max_retry=3) == [{'id': 0}]
+    assert len(calls) == 2
+
+    calls = scripted_batch_write(backend, *[OTSClientError('Invalid request.')] * 4)
+    errors = {}
+    assert client._batch_write_row('t', row_items(1), max_retry=3, errors=errors) == [None]
+    assert len(calls) == 1
+    assert errors == {0: 'Client error, Invalid request.'}